@@ -1,4 +1,5 @@
 from .integration import router as integration_router
+from .metrics import router as metrics_router
 from .organization import router as organization_router
 from .query import router as query_router
 from .sync import router as sync_router
@@ -6,6 +7,7 @@ from .user import router as user_router
 
 __all__ = [
     "integration_router",
+    "metrics_router",
     "organization_router",
     "query_router",
     "sync_router",
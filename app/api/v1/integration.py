@@ -1,7 +1,9 @@
 from http import HTTPStatus
 
+from cache import query_engine_cache, semantic_answer_cache
 from exceptions import (
     PrismDBException,
+    PrismDBExceptionCode,
     PrismException,
     PrismExceptionCode,
     PrismMergeException,
@@ -19,6 +21,7 @@ from models.ResponseModels import (
 from pipeline import DataIndexingService
 from storage import DynamoDBService, MergeService
 from tasks.IntegrationTask import initiate_file_processing
+from utils import run_blocking
 
 router = APIRouter()
 
@@ -63,11 +66,12 @@ async def integration(
 
     try:
         # Generate Merge account_token from public_token
-        account_token = merge_service.generate_account_token(
-            integration_request.public_token
+        account_token = await run_blocking(
+            merge_service.generate_account_token, integration_request.public_token
         )
         # Add account_token to organization's link_id_map
-        integration_item = dynamodb_service.add_integration(
+        integration_item = await run_blocking(
+            dynamodb_service.add_integration,
             org_id=integration_request.organization_id,
             org_admin_id=integration_request.organization_admin_id,
             account_token=account_token,
@@ -114,7 +118,7 @@ async def get_integration_detail(
     dynamodb_service = DynamoDBService()
 
     try:
-        organization = dynamodb_service.get_organization(org_id)
+        organization = await run_blocking(dynamodb_service.get_organization, org_id)
         link_id_map = organization.link_id_map
         logger.info("org_id={}, link_id_map={}", org_id, link_id_map)
 
@@ -159,11 +163,13 @@ async def remove_integration_detail(
     )
 
     dynamodb_service = DynamoDBService()
-    data_index_service = DataIndexingService(org_id=org_id)
     merge_service = MergeService(account_token=integration_account_token)
 
     try:
-        organization = dynamodb_service.get_organization(org_id=org_id)
+        data_index_service = await run_blocking(DataIndexingService, org_id=org_id)
+        organization = await run_blocking(
+            dynamodb_service.get_organization, org_id=org_id
+        )
 
         # Check if the user is an admin of the organization
         if organization.admin_id != remove_request.organization_admin_id:
@@ -179,26 +185,47 @@ async def remove_integration_detail(
             )
 
         # Remove data related to this integration from file database
-        related_file_ids = dynamodb_service.get_all_file_ids_for_integration(
-            account_token=integration_account_token
+        related_file_ids = await run_blocking(
+            dynamodb_service.get_all_file_ids_for_integration,
+            account_token=integration_account_token,
+        )
+        await run_blocking(
+            dynamodb_service.modify_file_in_batch,
+            file_ids=related_file_ids,
+            is_remove=True,
         )
-        dynamodb_service.modify_file_in_batch(file_ids=related_file_ids, is_remove=True)
 
         # Remove data related to this integration from vector store
-        data_index_service.delete_nodes(related_file_ids)
+        delete_results = await run_blocking(
+            data_index_service.delete_nodes, related_file_ids
+        )
+        query_engine_cache.invalidate(org_id)
+        semantic_answer_cache.invalidate(org_id)
+        await run_blocking(dynamodb_service.bump_index_version, org_id)
+
+        if not all(result.success for result in delete_results):
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_DELETE_VECTORS,
+                message="Could not remove the integration data from the vector store",
+            )
 
         # Remove data related to this integration from organization database
-        dynamodb_service.modify_organization_files(
-            org_id=org_id, file_ids=related_file_ids, is_remove=True
+        await run_blocking(
+            dynamodb_service.modify_organization_files,
+            org_id=org_id,
+            file_ids=related_file_ids,
+            is_remove=True,
         )
 
         # Remove organization's integration detail
-        dynamodb_service.remove_integration(
-            org_id=org_id, account_token=integration_account_token
+        await run_blocking(
+            dynamodb_service.remove_integration,
+            org_id=org_id,
+            account_token=integration_account_token,
         )
 
         # Remove link from Merge
-        merge_service.remove_integration()
+        await run_blocking(merge_service.remove_integration)
     except PrismException as e:
         logger.error(
             "org_id={}, integration_account_token={}, remove_request={}, error={}",
@@ -235,8 +262,9 @@ async def generate_link_token(org_id: str):
     merge_service = MergeService()
 
     try:
-        organization = dynamodb_service.get_organization(org_id)
-        link_token = merge_service.generate_link_token(
+        organization = await run_blocking(dynamodb_service.get_organization, org_id)
+        link_token = await run_blocking(
+            merge_service.generate_link_token,
             org_id,
             organization.name,
             organization.email,
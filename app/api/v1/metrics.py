@@ -0,0 +1,36 @@
+from http import HTTPStatus
+
+from fastapi import APIRouter
+from loguru import logger
+from metrics import metrics_registry
+from models.ResponseModels import ErrorDTO, GetMetricsResponse
+
+router = APIRouter()
+
+
+"""
+| Endpoint                  | Description                              | Method |
+|---------------------------|------------------------------------------|--------|
+| `/metrics`                | Query pipeline percentiles per stage     | GET    |
+"""
+
+
+@router.get(
+    "/metrics",
+    summary="Retrieve query pipeline latency percentiles per organization and stage",
+    tags=["Metrics"],
+    response_model=GetMetricsResponse,
+    responses={
+        200: {"model": GetMetricsResponse, "description": "OK"},
+        400: {"model": ErrorDTO, "message": "Error: Bad request"},
+    },
+)
+async def get_metrics(
+    org_id: str | None = None,
+):
+    logger.info("org_id={}", org_id)
+
+    return GetMetricsResponse(
+        status=HTTPStatus.OK.value,
+        metrics=metrics_registry.snapshot(org_id),
+    )
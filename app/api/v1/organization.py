@@ -1,6 +1,7 @@
 import uuid
 from http import HTTPStatus
 
+from cache import query_engine_cache, semantic_answer_cache
 from exceptions import PrismDBException, PrismException, PrismExceptionCode
 from fastapi import APIRouter
 from loguru import logger
@@ -23,6 +24,7 @@ from models.ResponseModels import (
 from pipeline import DataIndexingService
 from services import CognitoService, SESService
 from storage import DynamoDBService
+from utils import run_blocking
 
 router = APIRouter()
 
@@ -68,7 +70,8 @@ async def register_organization(
     dynamodb_service = DynamoDBService()
 
     try:
-        dynamodb_service.register_organization(
+        await run_blocking(
+            dynamodb_service.register_organization,
             org_id=org_id,
             org_name=register_request.organization_name,
             org_email=register_request.organization_email,
@@ -85,7 +88,8 @@ async def register_organization(
             ),
         )
 
-        dynamodb_service.change_org_admin(
+        await run_blocking(
+            dynamodb_service.change_org_admin,
             org_id=org_id,
             original_admin_id=register_request.organization_admin_email,
             new_admin_id=response.org_user_id,
@@ -121,27 +125,38 @@ async def remove_organization(
 
     dynamodb_service = DynamoDBService()
     cognito_service = CognitoService()
-    data_index_service = DataIndexingService(org_id=remove_request.organization_id)
 
     try:
-        organization = dynamodb_service.get_organization(
-            org_id=remove_request.organization_id
+        data_index_service = await run_blocking(
+            DataIndexingService, org_id=remove_request.organization_id
+        )
+        organization = await run_blocking(
+            dynamodb_service.get_organization, org_id=remove_request.organization_id
         )
 
         # Remove file data from the database
-        dynamodb_service.modify_file_in_batch(
-            file_ids=organization.document_list, is_remove=True
+        await run_blocking(
+            dynamodb_service.modify_file_in_batch,
+            file_ids=organization.document_list,
+            is_remove=True,
         )
 
         # Remove users
         for id in organization.user_list:
-            cognito_service.remove_user(user_id=id)
-            dynamodb_service.remove_user(user_id=id, org_admin_id=organization.admin_id)
+            await run_blocking(cognito_service.remove_user, user_id=id)
+            await run_blocking(
+                dynamodb_service.remove_user,
+                user_id=id,
+                org_admin_id=organization.admin_id,
+            )
 
         # Drop collection from the vector store
-        data_index_service.drop_collection()
+        await run_blocking(data_index_service.drop_collection)
+        query_engine_cache.invalidate(remove_request.organization_id)
+        semantic_answer_cache.invalidate(remove_request.organization_id)
 
-        response = dynamodb_service.remove_organization(
+        response = await run_blocking(
+            dynamodb_service.remove_organization,
             org_id=remove_request.organization_id,
             org_admin_id=remove_request.organization_admin_id,
         )
@@ -185,7 +200,7 @@ async def get_organization(
     dynamodb_service = DynamoDBService()
 
     try:
-        organization = dynamodb_service.get_organization(org_id)
+        organization = await run_blocking(dynamodb_service.get_organization, org_id)
     except PrismDBException as e:
         logger.error("org_id={}, error={}", org_id, e)
         raise
@@ -228,7 +243,8 @@ async def update_organization(org_id: str, update_request: UpdateOrganizationReq
     dynamodb_service = DynamoDBService()
 
     try:
-        dynamodb_service.change_org_admin(
+        await run_blocking(
+            dynamodb_service.change_org_admin,
             org_id=org_id,
             original_admin_id=update_request.original_organization_admin_id,
             new_admin_id=update_request.new_organization_admin_id,
@@ -274,20 +290,23 @@ async def invite_user_to_organization(
     org_user_id = str(uuid.uuid4())
 
     try:
-        dynamodb_service.modify_invited_users_list(
+        await run_blocking(
+            dynamodb_service.modify_invited_users_list,
             org_id=org_id,
             org_user_id=org_user_id,
             org_admin_id=invite_request.organization_admin_id,
             is_remove=False,
         )
-        dynamodb_service.modify_whitelist(
+        await run_blocking(
+            dynamodb_service.modify_whitelist,
             org_id=org_id,
             org_name=invite_request.organization_name,
             org_user_id=org_user_id,
             org_user_email=invite_request.organization_user_email,
             is_remove=False,
         )
-        ses_serivce.send_signup_email(
+        await run_blocking(
+            ses_serivce.send_signup_email,
             org_name=invite_request.organization_name,
             org_user_email=invite_request.organization_user_email,
             org_user_id=org_user_id,
@@ -333,14 +352,17 @@ async def cancel_pending_user_invite(
     dynamodb_service = DynamoDBService()
 
     try:
-        dynamodb_service.modify_invited_users_list(
+        await run_blocking(
+            dynamodb_service.modify_invited_users_list,
             org_id=org_id,
             org_user_id=cancel_request.organization_user_id,
             org_admin_id=cancel_request.organization_admin_id,
             is_remove=True,
         )
-        dynamodb_service.modify_whitelist(
-            org_user_id=cancel_request.organization_user_id, is_remove=True
+        await run_blocking(
+            dynamodb_service.modify_whitelist,
+            org_user_id=cancel_request.organization_user_id,
+            is_remove=True,
         )
     except PrismDBException as e:
         logger.error(
@@ -1,7 +1,19 @@
+import asyncio
 import json
+import os
+import sqlite3
+import time
+import uuid
 
+from cache import query_engine_cache, semantic_answer_cache
 from connection import ConnectionManager
-from constants import DYNAMODB_FILE_TABLE
+from constants import (
+    CHUNK_REFERENCE_DIR,
+    DYNAMODB_FILE_TABLE,
+    QUERY_SESSION_MAX_CONCURRENCY,
+    QUERY_SESSION_MAX_IN_FLIGHT,
+)
+from enums import QueryMessageType
 from exceptions import (
     PrismDBException,
     PrismDBExceptionCode,
@@ -9,11 +21,20 @@ from exceptions import (
     PrismExceptionCode,
 )
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from llama_index.schema import NodeRelationship
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from llama_index.callbacks import CallbackManager, TokenCountingHandler
+from llama_index.callbacks.schema import CBEventType, EventPayload
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.query_engine import RetrieverQueryEngine
+from llama_index.schema import NodeRelationship, NodeWithScore
 from loguru import logger
+from metrics import metrics_registry
 from models import to_file_model
-from pipeline import DataIndexingService
-from storage import DynamoDBService
+from models.RequestModels import QueryMessage
+from pydantic import ValidationError
+from storage import ChunkReferenceStore, DynamoDBService
+from storage.ChunkReferenceStore import CONTENT_HASH_KEY
+from utils import run_blocking
 
 router = APIRouter()
 
@@ -22,6 +43,13 @@ router = APIRouter()
 | Endpoint                  | Description                              | Method |
 |---------------------------|------------------------------------------|--------|
 | `/query`                  | Perform a search query on files          | SOCKET |
+
+Messages are either plain text or JSON such as
+`{"type": "query", "request_id": "1", "query": "..."}` and
+`{"type": "cancel", "request_id": "1"}`. Every reply to a JSON question carries its
+`request_id`, and a cancelled question replies with `{"type": "cancelled"}`.
+Questions with a `request_id` are answered concurrently, the others one after the
+other in the order they were sent, since their replies can't be told apart.
 """
 
 
@@ -30,6 +58,7 @@ async def query(
     websocket: WebSocket,
     org_id: str = "",
     user_id: str = "",
+    stream: bool = False,
 ):
     if not org_id or not user_id:
         raise PrismException(
@@ -37,13 +66,15 @@ async def query(
             message="Invalid Credentials",
         )
 
-    logger.info("org_id={}, user_id={}, Session Started", org_id, user_id)
+    logger.info(
+        "org_id={}, user_id={}, stream={}, Session Started", org_id, user_id, stream
+    )
 
     dynamodb_service = DynamoDBService()
 
     try:
         # Check whether the user belongs to the organization
-        organization = dynamodb_service.get_organization(org_id)
+        organization = await run_blocking(dynamodb_service.get_organization, org_id)
 
         if user_id not in organization.user_list:
             raise PrismDBException(
@@ -51,11 +82,14 @@ async def query(
                 message="User doesn't belong to this organization",
             )
 
-        # Create chat index that queries the given organization
-        data_index_service = DataIndexingService(org_id=org_id)
-
-        vector_index = data_index_service.load_vector_index()
-        query_engine = data_index_service.generate_query_engine(vector_index)
+        # Build or reuse the chat index that queries the given organization before
+        # the first question
+        await run_blocking(
+            query_engine_cache.get,
+            org_id,
+            streaming=stream,
+            version=organization.index_version,
+        )
 
     except PrismDBException as e:
         logger.error("org_id={}, user_id: {}, error={}", org_id, user_id, e)
@@ -64,43 +98,462 @@ async def query(
     manager = ConnectionManager()
     await manager.connect(websocket)
 
+    # Every question runs as its own task so that a slow answer doesn't hold back
+    # the following messages. The semaphore bounds how many are answered at once.
+    semaphore = asyncio.Semaphore(QUERY_SESSION_MAX_CONCURRENCY)
+    tasks: dict[str, asyncio.Task] = {}
+    # last question without a request_id, the next one waits for it
+    previous: asyncio.Task | None = None
+
     try:
         while True:
-            user_text = await websocket.receive_text()
-            payload = {}
-
-            try:
-                response = await query_engine.aquery(user_text)
-                payload["response"] = response.response
-            except Exception as e:
-                logger.error("user_text={}, error={}", user_text, e)
-                payload["response"] = "Please try again later"
-
             try:
-                source_node_ids = set(
-                    [
-                        i.node.relationships[NodeRelationship.SOURCE].node_id
-                        for i in response.source_nodes
-                    ]
+                message = to_query_message(await websocket.receive_text())
+            except ValidationError:
+                await send_payload(
+                    manager,
+                    websocket,
+                    None,
+                    {"type": "error", "error": "Invalid message"},
                 )
-                logger.info("source_node_ids={}", source_node_ids)
+                continue
+
+            if message.type == QueryMessageType.CANCEL:
+                task = tasks.get(message.request_id)
+
+                if task is not None:
+                    task.cancel()
+                else:
+                    await send_payload(
+                        manager,
+                        websocket,
+                        message.request_id,
+                        {"type": "error", "error": "Unknown request_id"},
+                    )
+
+                continue
 
-                batch_data = dynamodb_service.batch_get_item(
-                    table_name=DYNAMODB_FILE_TABLE,
-                    field_name="id",
-                    field_type="S",
-                    field_values=list(source_node_ids),
+            if not message.query.strip():
+                error = "The query is empty"
+            elif message.request_id in tasks:
+                error = "A question with this request_id is already in flight"
+            elif len(tasks) >= QUERY_SESSION_MAX_IN_FLIGHT:
+                error = "Too many questions in flight"
+            else:
+                error = None
+
+            if error is not None:
+                await send_payload(
+                    manager,
+                    websocket,
+                    message.request_id,
+                    {"type": "error", "error": error},
                 )
-                files = [to_file_model({"Item": i}) for i in batch_data]
-                file_mapping = [{"name": i.name, "url": i.file_url} for i in files]
-                payload["sources"] = file_mapping
-            except Exception as e:
-                logger.error(
-                    "user_text={}, response={}, error={}", user_text, response, e
+                continue
+
+            key = message.request_id or str(uuid.uuid4())
+            tasks[key] = asyncio.create_task(
+                answer(
+                    websocket,
+                    manager,
+                    semaphore,
+                    dynamodb_service,
+                    org_id,
+                    message,
+                    stream,
+                    previous if message.request_id is None else None,
                 )
+            )
+            tasks[key].add_done_callback(lambda _, key=key: tasks.pop(key, None))
 
-            await manager.send_message(json.dumps(payload), websocket)
+            if message.request_id is None:
+                previous = tasks[key]
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
 
     logger.info("org_id: {}, user_id: {}, Session Ended", org_id, user_id)
+
+
+async def answer(
+    websocket: WebSocket,
+    manager: ConnectionManager,
+    semaphore: asyncio.Semaphore,
+    dynamodb_service: DynamoDBService,
+    org_id: str,
+    message: QueryMessage,
+    stream: bool,
+    previous: asyncio.Task | None = None,
+) -> None:
+    request_id = message.request_id
+    started = time.perf_counter()
+
+    try:
+        if previous is not None:
+            # replies without a request_id have to come in the order of the questions
+            await asyncio.wait([previous])
+
+        async with semaphore:
+            # read for every question, the documents may change during the session
+            version = await run_blocking(dynamodb_service.get_index_version, org_id)
+            query_engine = await run_blocking(
+                query_engine_cache.get, org_id, streaming=stream, version=version
+            )
+            # One trace per question. Starting it resets the trace map of the shared
+            # engine, and ending it lets the handlers drop what the question left
+            # behind, such as the events of a cancelled stream.
+            callback_manager = query_engine.callback_manager
+            callback_manager.start_trace("query")
+
+            try:
+                query_bundle = await get_query_bundle(
+                    query_engine, org_id, message.query
+                )
+
+                if stream:
+                    await stream_answer(
+                        websocket,
+                        manager,
+                        dynamodb_service,
+                        query_engine,
+                        org_id,
+                        request_id,
+                        query_bundle,
+                        version,
+                    )
+                else:
+                    await send_answer(
+                        websocket,
+                        manager,
+                        dynamodb_service,
+                        query_engine,
+                        org_id,
+                        request_id,
+                        query_bundle,
+                        version,
+                    )
+            finally:
+                callback_manager.end_trace("query")
+                reset_token_counts(callback_manager)
+
+        # time the user waited for the whole answer, queueing included
+        metrics_registry.observe(
+            org_id, "latency_ms", "answer", (time.perf_counter() - started) * 1000
+        )
+    except asyncio.CancelledError:
+        logger.info("org_id={}, request_id={}, Question cancelled", org_id, request_id)
+
+        try:
+            await send_payload(manager, websocket, request_id, {"type": "cancelled"})
+        except Exception:
+            # the websocket is already closed when the session ended
+            pass
+    except Exception as e:
+        logger.error("org_id={}, request_id={}, error={}", org_id, request_id, e)
+
+
+async def send_answer(
+    websocket: WebSocket,
+    manager: ConnectionManager,
+    dynamodb_service: DynamoDBService,
+    query_engine: RetrieverQueryEngine,
+    org_id: str,
+    request_id: str | None,
+    query_bundle: QueryBundle,
+    version: int,
+) -> None:
+    user_text = query_bundle.query_str
+    cached_payload = get_cached_payload(org_id, query_bundle, version)
+
+    if cached_payload is not None:
+        await send_payload(manager, websocket, request_id, cached_payload)
+        return
+
+    payload = {}
+    is_answered = False
+
+    try:
+        # Retrieval, rerank and postprocessing are synchronous and run in the
+        # threadpool. The LLM call is awaited so that cancelling the question
+        # also aborts the OpenAI request.
+        nodes = await run_in_threadpool(retrieve_nodes, query_engine, query_bundle)
+        response = await query_engine.asynthesize(query_bundle, nodes)
+        payload["response"] = response.response
+        is_answered = True
+    except Exception as e:
+        logger.error("user_text={}, error={}", user_text, e)
+        payload["response"] = "Please try again later"
+        response = None
+
+    try:
+        payload["sources"] = await run_blocking(
+            get_sources, dynamodb_service, org_id, response.source_nodes
+        )
+    except Exception as e:
+        logger.error("user_text={}, response={}, error={}", user_text, response, e)
+        is_answered = False
+
+    if is_answered and query_bundle.embedding is not None:
+        semantic_answer_cache.store(
+            org_id, user_text, query_bundle.embedding, payload, version
+        )
+
+    payload["cache"] = {"hit": False}
+    await send_payload(manager, websocket, request_id, payload)
+
+
+async def stream_answer(
+    websocket: WebSocket,
+    manager: ConnectionManager,
+    dynamodb_service: DynamoDBService,
+    query_engine: RetrieverQueryEngine,
+    org_id: str,
+    request_id: str | None,
+    query_bundle: QueryBundle,
+    version: int,
+) -> None:
+    """
+    Push the answer as framed messages: start, delta (one per token), sources, end.
+    The source lookup runs while the LLM is streaming and is sent as soon as it is
+    ready, so it never delays the first token.
+    """
+    user_text = query_bundle.query_str
+    await send_payload(manager, websocket, request_id, {"type": "start"})
+
+    cached_payload = get_cached_payload(org_id, query_bundle, version)
+
+    if cached_payload is not None:
+        for message in [
+            {"type": "sources", "sources": cached_payload.get("sources", [])},
+            {"type": "delta", "delta": cached_payload["response"]},
+            {
+                "type": "end",
+                "response": cached_payload["response"],
+                "cache": cached_payload["cache"],
+            },
+        ]:
+            await send_payload(manager, websocket, request_id, message)
+
+        return
+
+    try:
+        # Retrieval and postprocessing finish here, the LLM call starts lazily
+        # when the first token is requested from the response generator.
+        response = await run_in_threadpool(query_engine.query, query_bundle)
+    except Exception as e:
+        logger.error("user_text={}, error={}", user_text, e)
+        await send_payload(
+            manager,
+            websocket,
+            request_id,
+            {"type": "end", "error": "Please try again later"},
+        )
+        return
+
+    sources_task = asyncio.create_task(
+        run_blocking(get_sources, dynamodb_service, org_id, response.source_nodes)
+    )
+    sources_sent = False
+    sources = None
+    tokens = []
+    started = time.perf_counter()
+
+    async def send_sources() -> None:
+        nonlocal sources
+
+        try:
+            sources = await sources_task
+        except Exception as e:
+            logger.error("user_text={}, error={}", user_text, e)
+
+        await send_payload(
+            manager,
+            websocket,
+            request_id,
+            {"type": "sources", "sources": sources or []},
+        )
+
+    try:
+        async for token in iterate_in_threadpool(response.response_gen):
+            if not tokens:
+                metrics_registry.observe(
+                    org_id,
+                    "latency_ms",
+                    "first_token",
+                    (time.perf_counter() - started) * 1000,
+                )
+
+            tokens.append(token)
+            await send_payload(
+                manager, websocket, request_id, {"type": "delta", "delta": token}
+            )
+
+            if not sources_sent and sources_task.done():
+                await send_sources()
+                sources_sent = True
+    except (asyncio.CancelledError, WebSocketDisconnect):
+        # Closing the token generator drops the streaming OpenAI request
+        sources_task.cancel()
+        await run_in_threadpool(response.response_gen.close)
+        raise
+    except Exception as e:
+        logger.error("user_text={}, error={}", user_text, e)
+        await send_payload(
+            manager,
+            websocket,
+            request_id,
+            {"type": "end", "error": "Please try again later"},
+        )
+        return
+
+    if not sources_sent:
+        await send_sources()
+
+    answer = "".join(tokens)
+
+    if sources is not None and query_bundle.embedding is not None:
+        semantic_answer_cache.store(
+            org_id,
+            user_text,
+            query_bundle.embedding,
+            {"response": answer, "sources": sources},
+            version,
+        )
+
+    await send_payload(
+        manager,
+        websocket,
+        request_id,
+        {"type": "end", "response": answer, "cache": {"hit": False}},
+    )
+
+
+def to_query_message(text: str) -> QueryMessage:
+    """
+    Parse an incoming websocket message. Plain text is still accepted as a question
+    without a request_id, which keeps existing clients working.
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+
+    if not isinstance(data, dict):
+        return QueryMessage(query=text)
+
+    return QueryMessage(**data)
+
+
+async def send_payload(
+    manager: ConnectionManager,
+    websocket: WebSocket,
+    request_id: str | None,
+    payload: dict,
+) -> None:
+    if request_id is not None:
+        payload = {"request_id": request_id, **payload}
+
+    await manager.send_message(json.dumps(payload), websocket)
+
+
+def reset_token_counts(callback_manager: CallbackManager) -> None:
+    """
+    The token counters of an engine otherwise keep the counts of every question for
+    as long as the engine is cached. The counts are only logged per event, so
+    resetting them while another question is answered loses nothing.
+    """
+    for handler in callback_manager.handlers:
+        if isinstance(handler, TokenCountingHandler):
+            handler.reset_counts()
+
+
+def retrieve_nodes(
+    query_engine: RetrieverQueryEngine, query_bundle: QueryBundle
+) -> list[NodeWithScore]:
+    """Same retrieve step and callback event as `RetrieverQueryEngine.query`."""
+    with query_engine.callback_manager.event(
+        CBEventType.RETRIEVE, payload={EventPayload.QUERY_STR: query_bundle.query_str}
+    ) as retrieve_event:
+        nodes = query_engine.retrieve(query_bundle)
+        retrieve_event.on_end(payload={EventPayload.NODES: nodes})
+
+    return nodes
+
+
+async def get_query_bundle(
+    query_engine: RetrieverQueryEngine, org_id: str, user_text: str
+) -> QueryBundle:
+    """Embed the question once so the answer cache and the retriever share it."""
+    query_bundle = QueryBundle(query_str=user_text)
+
+    try:
+        embed_model = query_engine.retriever.get_service_context().embed_model
+
+        with metrics_registry.timer(org_id, "query_embedding"):
+            query_bundle.embedding = await embed_model.aget_query_embedding(user_text)
+    except Exception as e:
+        logger.error("user_text={}, error={}", user_text, e)
+
+    return query_bundle
+
+
+def get_cached_payload(
+    org_id: str, query_bundle: QueryBundle, version: int
+) -> dict | None:
+    if query_bundle.embedding is None:
+        return None
+
+    cached = semantic_answer_cache.lookup(org_id, query_bundle.embedding, version)
+
+    if cached is None:
+        return None
+
+    payload, similarity = cached
+    payload["cache"] = {"hit": True, "similarity": similarity}
+
+    return payload
+
+
+def get_sources(
+    dynamodb_service: DynamoDBService,
+    org_id: str,
+    source_nodes: list[NodeWithScore],
+) -> list[dict]:
+    source_node_ids = set(
+        [i.node.relationships[NodeRelationship.SOURCE].node_id for i in source_nodes]
+    )
+
+    # a deduplicated chunk is stored once for every file containing it
+    content_hashes = [
+        i.node.metadata[CONTENT_HASH_KEY]
+        for i in source_nodes
+        if CONTENT_HASH_KEY in i.node.metadata
+    ]
+
+    if content_hashes:
+        try:
+            documents = ChunkReferenceStore(
+                os.path.join(CHUNK_REFERENCE_DIR, f"{org_id}.db")
+            ).documents(content_hashes)
+        except sqlite3.Error as e:
+            logger.error("org_id={}, error={}", org_id, e)
+            documents = {}
+
+        source_node_ids.update(
+            doc_id for doc_ids in documents.values() for doc_id in doc_ids
+        )
+
+    logger.info("source_node_ids={}", source_node_ids)
+
+    with metrics_registry.timer(org_id, "sources"):
+        batch_data = dynamodb_service.batch_get_item(
+            table_name=DYNAMODB_FILE_TABLE,
+            field_name="id",
+            field_type="S",
+            field_values=list(source_node_ids),
+        )
+    files = [to_file_model({"Item": i}) for i in batch_data]
+
+    return [{"name": i.name, "url": i.file_url} for i in files]
@@ -1,8 +1,15 @@
+import functools
 from http import HTTPStatus
 
+from cache import query_engine_cache, semantic_answer_cache
 from constants import DYNAMODB_FILE_TABLE
 from enums import FileOperation
-from exceptions import PrismException, PrismExceptionCode
+from exceptions import (
+    PrismDBException,
+    PrismDBExceptionCode,
+    PrismException,
+    PrismExceptionCode,
+)
 from fastapi import APIRouter
 from loguru import logger
 from merge.resources.filestorage.types import File
@@ -11,7 +18,7 @@ from models.RequestModels import SyncOrganizationDataRequest
 from models.ResponseModels import ErrorDTO, SyncOrganizationDataResponse
 from pipeline import DataIndexingService, DataPipelineService
 from storage import DynamoDBService
-from utils import divide_list
+from utils import divide_list, run_blocking, run_ingestion
 
 router = APIRouter()
 
@@ -46,9 +53,9 @@ async def sync_organization_data(
     logger.info("sync_request={}, org_id={}", sync_request, org_id)
 
     dynamodb_service = DynamoDBService()
-    data_index_service = DataIndexingService(org_id=org_id)
-    data_pipeline_service = DataPipelineService(
-        org_id=org_id, account_token=sync_request.account_token
+    data_index_service = await run_blocking(DataIndexingService, org_id=org_id)
+    data_pipeline_service = await run_blocking(
+        DataPipelineService, org_id=org_id, account_token=sync_request.account_token
     )
 
     id_batches = {
@@ -70,17 +77,29 @@ async def sync_organization_data(
         remove_ids = (
             id_batches[FileOperation.UPDATED] + id_batches[FileOperation.DELETED]
         )
-        data_index_service.delete_nodes(remove_ids)
+        delete_results = await run_blocking(data_index_service.delete_nodes, remove_ids)
+
+        if not all(result.success for result in delete_results):
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_DELETE_VECTORS,
+                message="Could not remove the old data from the vector store",
+            )
 
         # Remove file data from file table and organization
-        dynamodb_service.modify_organization_files(
-            org_id=org_id, file_ids=remove_ids, is_remove=True
+        await run_blocking(
+            dynamodb_service.modify_organization_files,
+            org_id=org_id,
+            file_ids=remove_ids,
+            is_remove=True,
+        )
+        await run_blocking(
+            dynamodb_service.modify_file_in_batch, file_ids=remove_ids, is_remove=True
         )
-        dynamodb_service.modify_file_in_batch(file_ids=remove_ids, is_remove=True)
 
         # Get files
         for batch in file_id_batch:
-            batch_data = dynamodb_service.batch_get_item(
+            batch_data = await run_blocking(
+                dynamodb_service.batch_get_item,
                 table_name=DYNAMODB_FILE_TABLE,
                 field_name="id",
                 field_type="S",
@@ -88,11 +107,23 @@ async def sync_organization_data(
             )
             files.extend([to_file_model({"Item": i}) for i in batch_data])
 
-        # Generate & add new data nodes
-        nodes = data_pipeline_service.get_embedded_nodes(all_files=files)
-        data_index_service.add_nodes(nodes)
+        # Generate & add new data nodes, storing every batch as soon as it's embedded.
+        # Stored batches are searchable right away, so the answers cached until then
+        # are stale in every API process.
+        await run_ingestion(
+            data_index_service.store_batches,
+            data_pipeline_service.get_embedded_batches(all_files=files),
+            on_batch_stored=functools.partial(
+                dynamodb_service.bump_index_version, org_id
+            ),
+        )
     except PrismException as e:
         logger.error("sync_request={}, error={}", sync_request, e)
         raise
+    finally:
+        query_engine_cache.invalidate(org_id)
+        semantic_answer_cache.invalidate(org_id)
+        # the other API processes drop theirs when they see the new version
+        await run_blocking(dynamodb_service.bump_index_version, org_id)
 
     return SyncOrganizationDataResponse(status=HTTPStatus.OK.value)
@@ -21,6 +21,7 @@ from models.ResponseModels import (
 )
 from services import CognitoService
 from storage import DynamoDBService
+from utils import run_blocking
 
 from .organization import cancel_pending_user_invite
 
@@ -70,14 +71,15 @@ async def register_user(
     cognito_service = CognitoService()
 
     try:
-        whitelist_user = dynamodb_service.get_whitelist_user_data(
-            user_id=register_request.id
+        whitelist_user = await run_blocking(
+            dynamodb_service.get_whitelist_user_data, user_id=register_request.id
         )
         logger.info(
             "register_request={}, whitelist_user={}", register_request, whitelist_user
         )
         # Add user to the cognito user pool
-        cognito_service.create_user(
+        await run_blocking(
+            cognito_service.create_user,
             user_id=register_request.id,
             user_email=register_request.email,
             first_name=register_request.first_name,
@@ -85,7 +87,8 @@ async def register_user(
             organization_id=whitelist_user.org_id,
         )
         # Add user to user table
-        dynamodb_service.register_user(
+        await run_blocking(
+            dynamodb_service.register_user,
             id=register_request.id,
             email=register_request.email,
             name=register_request.first_name + " " + register_request.last_name,
@@ -93,7 +96,9 @@ async def register_user(
         )
 
         # Get org admin id to use for cancel pending user invite
-        organization = dynamodb_service.get_organization(org_id=whitelist_user.org_id)
+        organization = await run_blocking(
+            dynamodb_service.get_organization, org_id=whitelist_user.org_id
+        )
         organization_admin_id = organization.admin_id
     except PrismException as e:
         logger.error(
@@ -137,7 +142,7 @@ async def get_user(user_id: str):
     dynamodb_service = DynamoDBService()
 
     try:
-        user = dynamodb_service.get_user(user_id=user_id)
+        user = await run_blocking(dynamodb_service.get_user, user_id=user_id)
     except PrismDBException as e:
         logger.error("user_id={}, error={}", user_id, e)
         raise
@@ -174,8 +179,10 @@ async def delete_user(user_id: str, org_admin_id: str = Header()):
     cognito_service = CognitoService()
 
     try:
-        cognito_service.remove_user(user_id=user_id)
-        dynamodb_service.remove_user(user_id=user_id, org_admin_id=org_admin_id)
+        await run_blocking(cognito_service.remove_user, user_id=user_id)
+        await run_blocking(
+            dynamodb_service.remove_user, user_id=user_id, org_admin_id=org_admin_id
+        )
     except PrismException as e:
         logger.error("user_id={}, org_admin_id={}, error={}", user_id, org_admin_id, e)
         raise
@@ -205,7 +212,9 @@ async def is_admin(user_id: str, organization_id: str = Header()):
     dynamodb_service = DynamoDBService()
 
     try:
-        organization = dynamodb_service.get_organization(org_id=organization_id)
+        organization = await run_blocking(
+            dynamodb_service.get_organization, org_id=organization_id
+        )
     except PrismDBException as e:
         logger.error(
             "user_id={}, organization_id={}, error={}", user_id, organization_id, e
@@ -239,7 +248,9 @@ async def get_invitation_data(user_id: str):
     dynamodb_service = DynamoDBService()
 
     try:
-        whitelist_user = dynamodb_service.get_whitelist_user_data(user_id=user_id)
+        whitelist_user = await run_blocking(
+            dynamodb_service.get_whitelist_user_data, user_id=user_id
+        )
     except PrismDBException as e:
         logger.error("user_id={}, error={}", user_id, e)
         raise
@@ -275,7 +286,8 @@ async def get_users(
     dynamodb_service = DynamoDBService()
 
     try:
-        user_data = dynamodb_service.batch_get_item(
+        user_data = await run_blocking(
+            dynamodb_service.batch_get_item,
             table_name=DYNAMODB_USER_TABLE,
             field_name="id",
             field_type="S",
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from connection import milvus_connection_manager
+from constants import QUERY_ENGINE_CACHE_MAX_SIZE, QUERY_ENGINE_CACHE_TTL
+from llama_index.indices.query.base import BaseQueryEngine
+from loguru import logger
+from pipeline import DataIndexingService
+
+
+class QueryEngineCache:
+    """
+    Process-wide LRU cache of query engines keyed by organization id.
+
+    Building a query engine loads the vector store collection and creates the LLM,
+    reranker and optimizer clients, so websocket sessions of the same organization
+    share one engine until it expires (ttl), gets evicted (max_size) or was built
+    for another index version of the organization. The version is shared by every
+    API process and instance (see DynamoDBService.bump_index_version), so an engine
+    is rebuilt wherever the organization's documents, vectors or index changed.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.engines: OrderedDict[
+            tuple[str, bool], tuple[float, int, BaseQueryEngine]
+        ] = OrderedDict()
+        # last index version seen of every organization
+        self.versions: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(
+        self, org_id: str, streaming: bool = False, version: int = 0
+    ) -> BaseQueryEngine:
+        key = (org_id, streaming)
+
+        with self.lock:
+            entry = self.engines.get(key)
+
+            if entry is not None:
+                created_at, engine_version, query_engine = entry
+
+                if (
+                    engine_version == version
+                    and time.monotonic() - created_at < self.ttl
+                ):
+                    self.engines.move_to_end(key)
+                    return query_engine
+
+                del self.engines[key]
+
+            changed = self.versions.get(org_id, version) != version
+            self.versions[org_id] = version
+
+        if changed:
+            # the collection may have been migrated or re-indexed elsewhere
+            milvus_connection_manager.invalidate(org_id)
+
+        logger.info(
+            "Building query engine. org_id={}, streaming={}, version={}",
+            org_id,
+            streaming,
+            version,
+        )
+
+        # Build outside of the lock since it requires network round trips
+        data_index_service = DataIndexingService(org_id=org_id)
+        vector_index = data_index_service.load_vector_index()
+        query_engine = data_index_service.generate_query_engine(
+            vector_index, streaming=streaming
+        )
+
+        with self.lock:
+            # not cached when a newer version was seen meanwhile
+            if self.versions.get(org_id) == version:
+                self.engines[key] = (time.monotonic(), version, query_engine)
+                self.engines.move_to_end(key)
+
+                while len(self.engines) > self.max_size:
+                    evicted_key, _ = self.engines.popitem(last=False)
+                    logger.info("Evicted query engine. key={}", evicted_key)
+
+        return query_engine
+
+    def invalidate(self, org_id: str) -> None:
+        logger.info("Invalidating query engine. org_id={}", org_id)
+
+        with self.lock:
+            for streaming in (False, True):
+                self.engines.pop((org_id, streaming), None)
+
+
+query_engine_cache = QueryEngineCache(
+    max_size=QUERY_ENGINE_CACHE_MAX_SIZE, ttl=QUERY_ENGINE_CACHE_TTL
+)
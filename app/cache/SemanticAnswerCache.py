@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from constants import (
+    ANSWER_CACHE_MAX_ENTRIES_PER_ORG,
+    ANSWER_CACHE_MAX_ORGS,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL,
+)
+from loguru import logger
+
+
+class OrganizationAnswers:
+    """Answers of a single organization, kept in least recently used order."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.entries: OrderedDict[str, tuple[float, np.ndarray, dict]] = OrderedDict()
+        self.matrix: np.ndarray | None = None
+        self.keys: list[str] = []
+
+    def get_matrix(self) -> np.ndarray:
+        # Stacked lazily so a lookup is a single matrix-vector product
+        if self.matrix is None:
+            self.keys = list(self.entries.keys())
+            self.matrix = np.stack([self.entries[k][1] for k in self.keys])
+
+        return self.matrix
+
+    def remove(self, key: str) -> None:
+        del self.entries[key]
+        self.matrix = None
+
+    def remove_expired(self, ttl: int) -> None:
+        now = time.monotonic()
+
+        for key in [k for k, entry in self.entries.items() if now - entry[0] >= ttl]:
+            self.remove(key)
+
+
+class SemanticAnswerCache:
+    """
+    Per-organization cache of answers keyed by query embedding.
+
+    A question is answered from the cache when the cosine similarity between its
+    embedding and a cached question's embedding reaches the threshold. Entries are
+    evicted per organization (max_entries_per_org), organizations are evicted in LRU
+    order (max_orgs), and the whole organization is invalidated when its documents
+    change. Every API process and instance keeps its own cache, so answers are
+    stored with the index version of the organization (see
+    DynamoDBService.bump_index_version) read before answering, and a lookup with
+    another version drops them.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float,
+        max_entries_per_org: int,
+        max_orgs: int,
+        ttl: int,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_org = max_entries_per_org
+        self.max_orgs = max_orgs
+        self.ttl = ttl
+        self.organizations: OrderedDict[str, OrganizationAnswers] = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, org_id: str, embedding: list[float], version: int
+    ) -> tuple[dict, float] | None:
+        """Return a copy of the most similar cached payload and its similarity."""
+        query_vector = self.normalize(embedding)
+
+        with self.lock:
+            answers = self.organizations.get(org_id)
+
+            if answers is None:
+                return None
+
+            if answers.version != version:
+                # the organization changed, possibly through another process
+                self.organizations.pop(org_id)
+                return None
+
+            answers.remove_expired(self.ttl)
+
+            if not answers.entries:
+                return None
+
+            self.organizations.move_to_end(org_id)
+
+            matrix = answers.get_matrix()
+
+            if matrix.shape[1] != query_vector.shape[0]:
+                return None
+
+            similarities = matrix @ query_vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+
+            if similarity < self.similarity_threshold:
+                return None
+
+            key = answers.keys[best]
+            _, _, payload = answers.entries[key]
+            answers.entries.move_to_end(key)
+
+        logger.info("org_id={}, similarity={}, Answer cache hit", org_id, similarity)
+
+        return dict(payload), similarity
+
+    def store(
+        self,
+        org_id: str,
+        query_str: str,
+        embedding: list[float],
+        payload: dict,
+        version: int,
+    ) -> None:
+        """Cache an answer computed with the index `version` of the organization."""
+        vector = self.normalize(embedding)
+
+        with self.lock:
+            answers = self.organizations.get(org_id)
+
+            if answers is not None and answers.version > version:
+                logger.info("org_id={}, Dropped answer of a stale version", org_id)
+                return
+
+            if answers is None or answers.version != version:
+                answers = OrganizationAnswers(version)
+                self.organizations[org_id] = answers
+
+            self.organizations.move_to_end(org_id)
+
+            answers.entries[query_str] = (time.monotonic(), vector, dict(payload))
+            answers.entries.move_to_end(query_str)
+            answers.matrix = None
+
+            while len(answers.entries) > self.max_entries_per_org:
+                answers.entries.popitem(last=False)
+
+            while len(self.organizations) > self.max_orgs:
+                self.organizations.popitem(last=False)
+
+    def invalidate(self, org_id: str) -> None:
+        logger.info("Invalidating answer cache. org_id={}", org_id)
+
+        with self.lock:
+            self.organizations.pop(org_id, None)
+
+
+semantic_answer_cache = SemanticAnswerCache(
+    similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    max_entries_per_org=ANSWER_CACHE_MAX_ENTRIES_PER_ORG,
+    max_orgs=ANSWER_CACHE_MAX_ORGS,
+    ttl=ANSWER_CACHE_TTL,
+)
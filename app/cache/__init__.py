@@ -0,0 +1,9 @@
+from .QueryEngineCache import QueryEngineCache, query_engine_cache
+from .SemanticAnswerCache import SemanticAnswerCache, semantic_answer_cache
+
+__all__ = [
+    "QueryEngineCache",
+    "SemanticAnswerCache",
+    "query_engine_cache",
+    "semantic_answer_cache",
+]
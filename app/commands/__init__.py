@@ -0,0 +1 @@
+"""Maintenance commands, run from the app directory with `python -m commands.<name>`."""
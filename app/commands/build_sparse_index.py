@@ -0,0 +1,93 @@
+"""
+Build the BM25 index of organizations from the nodes already in the vector store.
+
+New ingestions and syncs keep the index up to date, this fills it for organizations
+indexed before hybrid retrieval, reading the documents listed in DynamoDB in batches
+of `--batch-size` doc ids.
+
+The index is written under SPARSE_INDEX_DIR of the machine running the command.
+Unless the directory is shared by every instance of the API, run it on every
+instance, including new ones after a redeploy or a scale out, which otherwise only
+search with dense retrieval.
+
+    cd app
+    python -m commands.build_sparse_index --org-id [ORG_ID]
+"""
+import argparse
+import time
+
+from connection import milvus_connection_manager
+from llama_index.vector_stores.utils import metadata_dict_to_node
+from loguru import logger
+from pipeline import DataIndexingService
+from storage import DynamoDBService, LocalVectorStore, SharedMilvusVectorStore
+from utils import divide_list
+
+OUTPUT_FIELDS = ["id", "doc_id", "text", "node"]
+
+
+def to_node(row: dict):
+    node = metadata_dict_to_node({"_node_content": row["node"]})
+    node.text = row["text"]
+
+    return node
+
+
+def build_organization(
+    dynamodb_service: DynamoDBService, org_id: str, batch_size: int
+) -> None:
+    started = time.perf_counter()
+    data_indexing_service = DataIndexingService(org_id=org_id)
+    vector_store = data_indexing_service.storage_context.vector_store
+    document_list = dynamodb_service.get_organization(org_id).document_list
+    indexed = 0
+
+    data_indexing_service.sparse_index.drop()
+
+    for batch in divide_list(document_list, batch_size):
+        if isinstance(vector_store, LocalVectorStore):
+            doc_ids = set(batch)
+            rows = [row for row in vector_store.rows if row["doc_id"] in doc_ids]
+        elif vector_store.collection is None:
+            break
+        else:
+            rows = DataIndexingService.query_by_doc_ids(
+                vector_store.collection,
+                batch,
+                OUTPUT_FIELDS,
+                vector_store.scoped
+                if isinstance(vector_store, SharedMilvusVectorStore)
+                else None,
+            )
+
+        data_indexing_service.sparse_index.add([to_node(row) for row in rows])
+        indexed += len(rows)
+
+    milvus_connection_manager.invalidate(org_id)
+    dynamodb_service.bump_index_version(org_id)
+
+    logger.info(
+        "Built sparse index. org_id={}, documents={}, nodes={}, elapsed={:.1f}s",
+        org_id,
+        len(document_list),
+        indexed,
+        time.perf_counter() - started,
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    dynamodb_service = DynamoDBService()
+
+    for org_id in args.org_id:
+        try:
+            build_organization(dynamodb_service, org_id, args.batch_size)
+        except Exception as e:
+            logger.error("org_id={}, error={}", org_id, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--org-id", action="append", required=True)
+    parser.add_argument("--batch-size", type=int, default=50)
+
+    main(parser.parse_args())
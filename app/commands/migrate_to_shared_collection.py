@@ -0,0 +1,113 @@
+"""
+Copy per-organization collections into the shared multi-tenant collection.
+
+Rows are copied together with their stored embeddings, so nothing is re-embedded.
+The documents of an organization are read from its `document_list` in DynamoDB and
+copied in batches of `--batch-size` doc ids. Rows the organization already has in
+the shared collection are removed first, so the command can be re-run.
+
+    cd app
+    python -m commands.migrate_to_shared_collection --org-id [ORG_ID] [--drop-source]
+    python -m commands.migrate_to_shared_collection --all
+"""
+import argparse
+import time
+
+from connection import milvus_connection_manager
+from constants import SHARED_COLLECTION_NAME
+from loguru import logger
+from pipeline import DataIndexingService
+from pymilvus import Collection, utility
+from storage import DynamoDBService, SharedMilvusVectorStore
+from utils import divide_list
+
+OUTPUT_FIELDS = ["id", "doc_id", "text", "embedding", "node"]
+
+
+def copy_documents(
+    source: Collection, target: SharedMilvusVectorStore, doc_ids: list[str]
+) -> int:
+    rows = DataIndexingService.query_by_doc_ids(source, doc_ids, OUTPUT_FIELDS)
+
+    if rows:
+        target.collection.insert(
+            [[row[field] for row in rows] for field in OUTPUT_FIELDS]
+            + [[target.org_id] * len(rows)]
+        )
+
+    return len(rows)
+
+
+def migrate_organization(
+    dynamodb_service: DynamoDBService,
+    org_id: str,
+    batch_size: int,
+    drop_source: bool,
+) -> None:
+    started = time.perf_counter()
+    milvus_connection_manager.ensure_connection()
+
+    source_store = milvus_connection_manager.create_collection_vector_store(org_id)
+
+    if source_store.collection is None:
+        logger.warning("Collection does not exist. org_id={}", org_id)
+        return
+
+    target_store = milvus_connection_manager.create_shared_vector_store(org_id)
+    organization = dynamodb_service.get_organization(org_id)
+
+    DataIndexingService.delete_by_expr(target_store.collection, target_store.org_filter)
+
+    copied = 0
+
+    for batch in divide_list(organization.document_list, batch_size):
+        copied += copy_documents(source_store.collection, target_store, batch)
+
+    target_store.collection.flush()
+    milvus_connection_manager.invalidate(org_id)
+    # the API processes rebuild their query engines of the organization
+    dynamodb_service.bump_index_version(org_id)
+
+    logger.info(
+        "Migrated organization. org_id={}, documents={}, nodes={}, elapsed={:.1f}s",
+        org_id,
+        len(organization.document_list),
+        copied,
+        time.perf_counter() - started,
+    )
+
+    if drop_source:
+        source_store.collection.drop()
+        logger.info("Dropped source collection. org_id={}", org_id)
+
+
+def main(args: argparse.Namespace) -> None:
+    dynamodb_service = DynamoDBService()
+    org_ids = args.org_id
+
+    if args.all:
+        milvus_connection_manager.ensure_connection()
+        org_ids = [
+            name
+            for name in utility.list_collections(using=milvus_connection_manager.alias)
+            if name != SHARED_COLLECTION_NAME
+        ]
+
+    for org_id in org_ids:
+        try:
+            migrate_organization(
+                dynamodb_service, org_id, args.batch_size, args.drop_source
+            )
+        except Exception as e:
+            logger.error("org_id={}, error={}", org_id, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--org-id", action="append", default=[])
+    group.add_argument("--all", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--drop-source", action="store_true")
+
+    main(parser.parse_args())
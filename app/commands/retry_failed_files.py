@@ -0,0 +1,94 @@
+"""
+Process the files that failed in an ingestion run of an organization again.
+
+Reads the manifest of the run, `--manifest` or the latest one of the organization,
+and runs only the files that could not be downloaded or parsed through the pipeline
+again, with the account token of the run's integration from the organization.
+Files that a failed run never finished are processed again too, after removing the
+nodes that were stored of them. The retry writes a manifest of its own, so running
+the command again retries whatever still fails.
+
+    cd app
+    python -m commands.retry_failed_files --org-id [ORG_ID]
+"""
+import argparse
+
+from constants import INGESTION_MANIFEST_DIR
+from enums import FileProcessingStatus
+from loguru import logger
+from pipeline import DataIndexingService, DataPipelineService
+from storage import DynamoDBService, IngestionManifest
+
+
+def main(args: argparse.Namespace) -> None:
+    manifest = IngestionManifest(INGESTION_MANIFEST_DIR)
+    path = args.manifest or manifest.latest(args.org_id)
+
+    if path is None:
+        raise SystemExit(f"No ingestion manifest. org_id={args.org_id}")
+
+    run, outcomes = manifest.load(path)
+    files = manifest.failed_files(outcomes)
+    logger.info(
+        "manifest={}, complete={}, files={}, retrying={}",
+        path,
+        run.get("complete", True),
+        len(outcomes),
+        len(files),
+    )
+
+    if not files:
+        return
+
+    organization = DynamoDBService().get_organization(args.org_id)
+    account_token = next(
+        (
+            token
+            for token, integration in organization.link_id_map.items()
+            if run.get("link_id") and integration.get("id") == run["link_id"]
+        ),
+        None,
+    )
+
+    if account_token is None:
+        raise SystemExit(
+            f"No integration of the run. org_id={args.org_id}, "
+            f"link_id={run.get('link_id')}"
+        )
+
+    data_pipeline_service = DataPipelineService(
+        org_id=args.org_id, account_token=account_token
+    )
+    data_indexing_service = DataIndexingService(org_id=args.org_id)
+
+    # a run that failed partway may have stored some nodes of these files already
+    unfinished_file_ids = [
+        outcome.file_id
+        for outcome in outcomes
+        if outcome.status == FileProcessingStatus.NOT_PROCESSED
+    ]
+
+    if unfinished_file_ids:
+        delete_results = data_indexing_service.delete_nodes(unfinished_file_ids)
+
+        if not all(result.success for result in delete_results):
+            raise SystemExit(f"Could not remove the stored nodes. org_id={args.org_id}")
+
+    stored = data_indexing_service.store_batches(
+        data_pipeline_service.get_embedded_batches(files)
+    )
+
+    logger.info(
+        "org_id={}, stored_nodes={}, manifest={}",
+        args.org_id,
+        stored,
+        data_pipeline_service.manifest_path,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--org-id", required=True)
+    parser.add_argument("--manifest")
+
+    main(parser.parse_args())
@@ -0,0 +1,267 @@
+"""
+Measure recall@k and latency of an organization's vector index against exact search.
+
+Query vectors are sampled from the organization's own nodes. The exact top k is
+computed with NumPy over every stored vector of the organization, streamed in batches
+of `--batch-size` documents, and each query's own node is left out of both result
+lists. Every candidate ef (HNSW) or nprobe (IVF) is then searched through the same
+vector store the retriever uses, and recall@k and p50/p95 latency are printed. The
+derived value from VectorIndexPolicy is marked, as is the smallest value reaching
+`--target-recall`. `--rebuild` first replaces the index with the one recommended for
+the collection size, or with `--index-type`.
+
+    cd app
+    python -m commands.tune_vector_index --org-id [ORG_ID] --k 10 --output tuning.jsonl
+    python -m commands.tune_vector_index --org-id [ORG_ID] --rebuild \
+        --index-type HNSW --index-params '{"M": 16, "efConstruction": 200}'
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from connection import milvus_connection_manager
+from enums import VectorIndexType
+from llama_index.vector_stores import MilvusVectorStore
+from llama_index.vector_stores.types import VectorStoreQuery
+from pipeline import DataIndexingService
+from storage import DynamoDBService, SharedMilvusVectorStore, vector_index_policy
+from utils import divide_list
+
+HNSW_EF = [8, 16, 32, 64, 128, 256, 512]
+IVF_NPROBE = [1, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+def scope_of(vector_store: MilvusVectorStore):
+    if isinstance(vector_store, SharedMilvusVectorStore):
+        return vector_store.scoped
+
+    return None
+
+
+def sample_queries(
+    vector_store: MilvusVectorStore, doc_ids: list[str], count: int
+) -> tuple[list[str], np.ndarray]:
+    rows = []
+
+    for doc_id in random.sample(doc_ids, min(count, len(doc_ids))):
+        doc_rows = DataIndexingService.query_by_doc_ids(
+            vector_store.collection,
+            [doc_id],
+            ["id", "embedding"],
+            scope_of(vector_store),
+        )
+
+        if doc_rows:
+            rows.append(random.choice(doc_rows))
+
+    return [row["id"] for row in rows], np.array(
+        [row["embedding"] for row in rows], dtype=np.float32
+    )
+
+
+def exact_search(
+    vector_store: MilvusVectorStore,
+    doc_ids: list[str],
+    batch_size: int,
+    query_ids: list[str],
+    queries: np.ndarray,
+    k: int,
+) -> tuple[list[list[str]], int]:
+    """Exact inner product top k of every query, keeping only k candidates in memory."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), "", dtype=object)
+    num_vectors = 0
+
+    for batch in divide_list(doc_ids, batch_size):
+        rows = DataIndexingService.query_by_doc_ids(
+            vector_store.collection,
+            batch,
+            ["id", "embedding"],
+            scope_of(vector_store),
+        )
+
+        if not rows:
+            continue
+
+        num_vectors += len(rows)
+        ids = np.array([row["id"] for row in rows], dtype=object)
+        scores = queries @ np.array([row["embedding"] for row in rows]).T
+
+        # a query's own node is not a result
+        scores[np.array(query_ids, dtype=object)[:, None] == ids[None, :]] = -np.inf
+
+        scores = np.concatenate([best_scores, scores], axis=1)
+        candidates = np.concatenate([best_ids, np.tile(ids, (len(queries), 1))], axis=1)
+        top = np.argsort(-scores, axis=1)[:, :k]
+
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(candidates, top, axis=1)
+
+    return [
+        [node_id for node_id in ids if node_id] for ids in best_ids.tolist()
+    ], num_vectors
+
+
+def measure(
+    vector_store: MilvusVectorStore,
+    search_params: dict,
+    query_ids: list[str],
+    queries: np.ndarray,
+    exact: list[list[str]],
+    k: int,
+) -> dict:
+    vector_store.search_params = search_params
+    latencies = []
+    recalls = []
+
+    for query_id, query, expected in zip(query_ids, queries, exact):
+        started = time.perf_counter()
+        result = vector_store.query(
+            VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=k + 1)
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        found = [node_id for node_id in result.ids if node_id != query_id][:k]
+        recalls.append(len(set(found) & set(expected)) / max(len(expected), 1))
+
+    latencies.sort()
+
+    return {
+        "search_params": search_params,
+        "recall": sum(recalls) / len(recalls),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+    }
+
+
+def candidate_search_params(index_params: dict, k: int) -> list[dict]:
+    metric_type = index_params.get("metric_type", vector_index_policy.METRIC_TYPE)
+    index_type = index_params.get("index_type")
+
+    if index_type == VectorIndexType.HNSW.value:
+        return [
+            {"metric_type": metric_type, "params": {"ef": ef}}
+            for ef in HNSW_EF
+            if ef >= k + 1
+        ]
+
+    if index_type in [VectorIndexType.IVF_FLAT.value, VectorIndexType.IVF_SQ8.value]:
+        nlist = int(index_params.get("params", {}).get("nlist", 1024))
+        return [
+            {"metric_type": metric_type, "params": {"nprobe": nprobe}}
+            for nprobe in IVF_NPROBE
+            if nprobe <= nlist
+        ]
+
+    return []
+
+
+def main(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+
+    vector_store = milvus_connection_manager.get_vector_store(args.org_id)
+
+    if not isinstance(vector_store, MilvusVectorStore):
+        raise SystemExit("Only Milvus vector stores have an ANN index to tune")
+
+    if vector_store.collection is None:
+        raise SystemExit(f"Collection does not exist. org_id={args.org_id}")
+
+    if args.rebuild:
+        vector_index_policy.rebuild(
+            vector_store,
+            vector_index_policy.index_params(vector_store.collection.num_entities)
+            if args.index_type is None
+            else {
+                "metric_type": vector_index_policy.METRIC_TYPE,
+                "index_type": args.index_type,
+                "params": json.loads(args.index_params),
+            },
+        )
+        milvus_connection_manager.invalidate(args.org_id)
+        # the API processes rebuild their query engines of the organization
+        DynamoDBService().bump_index_version(args.org_id)
+
+    doc_ids = DynamoDBService().get_organization(args.org_id).document_list
+    index_params = vector_store.collection.indexes[0].params
+    num_entities = vector_store.collection.num_entities
+
+    query_ids, queries = sample_queries(vector_store, doc_ids, args.queries)
+    started = time.perf_counter()
+    exact, num_vectors = exact_search(
+        vector_store, doc_ids, args.batch_size, query_ids, queries, args.k
+    )
+    print(
+        f"org_id={args.org_id}, vectors={num_vectors}, "
+        f"collection_entities={num_entities}, queries={len(queries)}, "
+        f"exact_search={time.perf_counter() - started:.1f}s, "
+        f"index_params={index_params}"
+    )
+
+    # one more result is requested to leave out the query's own node
+    derived = vector_index_policy.search_params(index_params, num_entities, args.k + 1)
+    candidates = candidate_search_params(index_params, args.k)
+
+    if derived not in candidates:
+        candidates.append(derived)
+        candidates.sort(
+            key=lambda search_params: list(search_params["params"].values())
+        )
+
+    trials = [
+        measure(vector_store, search_params, query_ids, queries, exact, args.k)
+        for search_params in candidates
+    ]
+    reaching_target = [
+        trial for trial in trials if trial["recall"] >= args.target_recall
+    ]
+    recommended = reaching_target[0] if reaching_target else None
+
+    for trial in trials:
+        marks = []
+
+        if trial["search_params"] == derived:
+            marks.append("derived")
+
+        if trial is recommended:
+            marks.append(f"smallest with recall>={args.target_recall}")
+
+        print(
+            f"params={trial['search_params']['params']}: "
+            f"recall@{args.k}={trial['recall']:.3f}, "
+            f"p50={trial['p50_ms']:.1f}ms, p95={trial['p95_ms']:.1f}ms"
+            + (f"  <- {', '.join(marks)}" if marks else "")
+        )
+
+    if args.output:
+        with open(args.output, "a") as f:
+            record = {
+                "org_id": args.org_id,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "k": args.k,
+                "vectors": num_vectors,
+                "collection_entities": num_entities,
+                "index_params": index_params,
+                "derived_search_params": derived,
+                "trials": trials,
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--org-id", required=True)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--index-type", choices=VectorIndexType.list())
+    parser.add_argument("--index-params", default="{}")
+    parser.add_argument("--output")
+    parser.add_argument("--seed", type=int, default=0)
+
+    main(parser.parse_args())
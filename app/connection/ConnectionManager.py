@@ -1,9 +1,13 @@
+import asyncio
+
 from fastapi import WebSocket
 
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        # several questions may answer on the same websocket at once
+        self.send_lock = asyncio.Lock()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -13,4 +17,5 @@ class ConnectionManager:
         self.active_connections.remove(websocket)
 
     async def send_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        async with self.send_lock:
+            await websocket.send_text(message)
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from constants import (
+    EMBEDDING_DIM,
+    EMBEDDING_QUANTIZATION,
+    LOCAL_VECTOR_STORE_DIR,
+    MILVUS_COLLECTION_CACHE_SIZE,
+    MILVUS_CONNECT_MAX_RETRIES,
+    MILVUS_CONNECTION_ALIAS,
+    MILVUS_HEALTH_CHECK_INTERVAL,
+    PRISM_ENV,
+    SHARED_COLLECTION_NAME,
+    SHARED_COLLECTION_NUM_PARTITIONS,
+    VECTOR_STORE_MODE,
+    ZILLIZ_CLOUD_HOST,
+    ZILLIZ_CLOUD_PASSWORD,
+    ZILLIZ_CLOUD_PORT,
+    ZILLIZ_CLOUD_USER,
+)
+from enums import EmbeddingQuantization, VectorStoreMode
+from exceptions import PrismDBException, PrismDBExceptionCode
+from llama_index.vector_stores import MilvusVectorStore
+from llama_index.vector_stores.types import VectorStore
+from loguru import logger
+from pymilvus import connections, utility
+from pymilvus.exceptions import MilvusException
+from storage import LocalVectorStore, SharedMilvusVectorStore, vector_index_policy
+from storage.EmbeddingQuantizer import storage_dtype
+
+
+class MilvusConnectionManager:
+    """
+    Process-wide Milvus connection shared by every organization and request.
+
+    The gRPC connection is opened once under a fixed alias, which MilvusVectorStore
+    picks up since it reuses open connections to the same address and user.
+    The connection is health checked at most every `health_check_interval` seconds
+    and reopened with exponential backoff when the check fails.
+    Vector stores are cached per organization so that the collection lookup, index
+    description and load calls of MilvusVectorStore run once instead of per request.
+    In the "local" mode no connection is opened and the cached stores are
+    LocalVectorStore files on this machine.
+    """
+
+    def __init__(
+        self,
+        alias: str,
+        health_check_interval: int,
+        max_retries: int,
+        max_collections: int,
+    ):
+        self.alias = alias
+        self.health_check_interval = health_check_interval
+        self.max_retries = max_retries
+        self.max_collections = max_collections
+        self.vector_stores: OrderedDict[str, VectorStore] = OrderedDict()
+        self.last_health_check = 0.0
+        self.lock = threading.Lock()
+        self.connection_lock = threading.Lock()
+
+    def get_vector_store(self, org_id: str) -> VectorStore:
+        mode = VectorStoreMode(VECTOR_STORE_MODE)
+
+        if mode != VectorStoreMode.LOCAL:
+            self.ensure_connection()
+
+        with self.lock:
+            vector_store = self.vector_stores.get(org_id)
+
+            if vector_store is not None:
+                self.vector_stores.move_to_end(org_id)
+                return vector_store
+
+        if mode == VectorStoreMode.LOCAL:
+            vector_store = self.create_local_vector_store(org_id)
+        elif mode == VectorStoreMode.SHARED:
+            vector_store = self.create_shared_vector_store(org_id)
+        else:
+            vector_store = self.create_collection_vector_store(org_id)
+
+        if isinstance(vector_store, MilvusVectorStore):
+            # search parameters follow the index type and the number of vectors
+            vector_index_policy.tune(vector_store)
+
+        # Only cache existing collections, another worker may create the others
+        if (
+            isinstance(vector_store, LocalVectorStore)
+            or vector_store.collection is not None
+        ):
+            with self.lock:
+                self.vector_stores[org_id] = vector_store
+                self.vector_stores.move_to_end(org_id)
+
+                while len(self.vector_stores) > self.max_collections:
+                    self.vector_stores.popitem(last=False)
+
+        return vector_store
+
+    def create_collection_vector_store(self, org_id: str) -> MilvusVectorStore:
+        return MilvusVectorStore(
+            # collection name can only contain numbers, letters and underscores
+            collection_name=org_id,
+            # new collections start with the index picked for an empty collection
+            index_params=vector_index_policy.index_params(0),
+            search_params=vector_index_policy.initial_search_params(),
+            host=ZILLIZ_CLOUD_HOST,
+            port=ZILLIZ_CLOUD_PORT,
+            user=ZILLIZ_CLOUD_USER,
+            password=ZILLIZ_CLOUD_PASSWORD,
+            use_secure=True if PRISM_ENV == "PROD" else False,
+        )
+
+    def create_shared_vector_store(self, org_id: str) -> SharedMilvusVectorStore:
+        return SharedMilvusVectorStore(
+            org_id=org_id,
+            num_partitions=SHARED_COLLECTION_NUM_PARTITIONS,
+            collection_name=SHARED_COLLECTION_NAME,
+            # new collections start with the index picked for an empty collection
+            index_params=vector_index_policy.index_params(0),
+            search_params=vector_index_policy.initial_search_params(),
+            # create the shared collection upfront rather than on a first insert
+            dim=EMBEDDING_DIM,
+            host=ZILLIZ_CLOUD_HOST,
+            port=ZILLIZ_CLOUD_PORT,
+            user=ZILLIZ_CLOUD_USER,
+            password=ZILLIZ_CLOUD_PASSWORD,
+            use_secure=True if PRISM_ENV == "PROD" else False,
+        )
+
+    def create_local_vector_store(self, org_id: str) -> LocalVectorStore:
+        return LocalVectorStore(
+            path=os.path.join(LOCAL_VECTOR_STORE_DIR, org_id),
+            dtype=storage_dtype(EmbeddingQuantization(EMBEDDING_QUANTIZATION)).name,
+        )
+
+    def invalidate(self, org_id: str) -> None:
+        with self.lock:
+            self.vector_stores.pop(org_id, None)
+
+    def ensure_connection(self) -> None:
+        with self.connection_lock:
+            if time.monotonic() - self.last_health_check < self.health_check_interval:
+                return
+
+            if self.is_healthy():
+                self.last_health_check = time.monotonic()
+                return
+
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    self.connect()
+                    self.last_health_check = time.monotonic()
+                    return
+                except MilvusException as e:
+                    logger.warning(
+                        "Could not connect to Milvus. attempt={}, error={}", attempt, e
+                    )
+
+                    if attempt < self.max_retries:
+                        time.sleep(min(2**attempt, 30))
+
+        raise PrismDBException(
+            code=PrismDBExceptionCode.COULD_NOT_CONNECT_TO_VECTOR_STORE,
+            message="Could not connect to the vector store",
+        )
+
+    def is_healthy(self) -> bool:
+        if not connections.has_connection(self.alias):
+            return False
+
+        try:
+            utility.get_server_version(using=self.alias)
+        except MilvusException as e:
+            logger.warning("Milvus health check failed. error={}", e)
+            return False
+
+        return True
+
+    def connect(self) -> None:
+        logger.info("Connecting to Milvus. alias={}", self.alias)
+
+        connections.disconnect(self.alias)
+        connections.connect(
+            alias=self.alias,
+            host=ZILLIZ_CLOUD_HOST,
+            port=ZILLIZ_CLOUD_PORT,
+            user=ZILLIZ_CLOUD_USER,
+            password=ZILLIZ_CLOUD_PASSWORD,
+            secure=True if PRISM_ENV == "PROD" else False,
+        )
+
+
+milvus_connection_manager = MilvusConnectionManager(
+    alias=MILVUS_CONNECTION_ALIAS,
+    health_check_interval=MILVUS_HEALTH_CHECK_INTERVAL,
+    max_retries=MILVUS_CONNECT_MAX_RETRIES,
+    max_collections=MILVUS_COLLECTION_CACHE_SIZE,
+)
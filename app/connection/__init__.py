@@ -1,3 +1,4 @@
 from .ConnectionManager import ConnectionManager
+from .MilvusConnectionManager import MilvusConnectionManager, milvus_connection_manager
 
-__all__ = ["ConnectionManager"]
+__all__ = ["ConnectionManager", "MilvusConnectionManager", "milvus_connection_manager"]
@@ -27,6 +27,54 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 DEFAULT_OPENAI_MODEL = os.environ["DEFAULT_OPENAI_MODEL"]
 
 
+# Embedding
+# Used by both ingestion and queries so that the vectors live in the same space
+EMBEDDING_MODEL_NAME = "sentence-transformers/gte-large"
+EMBEDDING_DIM = 1024
+# "none", "float16" or "int8". The local store keeps vectors at that precision,
+# int8 with one scale per vector, and Milvus collections use an IVF_SQ8 index
+# for int8 since Milvus 2.2 has no float16 vectors
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")
+QUERY_EMBEDDING_DEVICE = os.getenv("QUERY_EMBEDDING_DEVICE", "cpu")
+QUERY_EMBEDDING_BATCH_SIZE = int(os.getenv("QUERY_EMBEDDING_BATCH_SIZE", "32"))
+QUERY_EMBEDDING_BATCH_WAIT = float(
+    os.getenv("QUERY_EMBEDDING_BATCH_WAIT", "0.005")
+)  # seconds
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+# Embeddings of chunk and sentence texts, on the local disk of every Ray worker,
+# so that re-synced files only embed what changed
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "/tmp/prism/embedding_cache.db"
+)
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "1000000"))
+# "auto", "gpu" or "cpu". Auto embeds on GPUs when the Ray cluster has any.
+# On CPUs every actor gets EMBEDDING_CPU_THREADS cores and the pool fills the cluster.
+EMBEDDING_EXECUTION_MODE = os.getenv("EMBEDDING_EXECUTION_MODE", "auto")
+EMBEDDING_GPU_BATCH_SIZE = int(os.getenv("EMBEDDING_GPU_BATCH_SIZE", "100"))
+EMBEDDING_CPU_RUNTIME = os.getenv("EMBEDDING_CPU_RUNTIME", "onnx")  # or "torch"
+EMBEDDING_CPU_QUANTIZE = os.getenv("EMBEDDING_CPU_QUANTIZE", "true").lower() == "true"
+EMBEDDING_CPU_THREADS = int(os.getenv("EMBEDDING_CPU_THREADS", "4"))
+EMBEDDING_CPU_BATCH_SIZE = int(os.getenv("EMBEDDING_CPU_BATCH_SIZE", "32"))
+
+
+# Sentence Embeddings
+# Largest encoded payload stored per node; the Milvus node field holds 65535 characters
+SENTENCE_EMBEDDINGS_MAX_SIZE = int(os.getenv("SENTENCE_EMBEDDINGS_MAX_SIZE", "48000"))
+
+
+# Reranker
+# "cohere" calls the Cohere rerank API, "cross-encoder" runs a local model on CPU
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "cohere")
+CROSS_ENCODER_MODEL = os.getenv(
+    "CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"
+)
+# "torch" or "onnx" (requires optimum[onnxruntime])
+CROSS_ENCODER_RUNTIME = os.getenv("CROSS_ENCODER_RUNTIME", "torch")
+CROSS_ENCODER_QUANTIZE = os.getenv("CROSS_ENCODER_QUANTIZE", "false").lower() == "true"
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "16"))
+
+
 # DynamoDB Tables
 DYNAMODB_USER_TABLE = os.environ["DYNAMODB_USER_TABLE"]
 DYNAMODB_FILE_TABLE = os.environ["DYNAMODB_FILE_TABLE"]
@@ -54,6 +102,139 @@ ZILLIZ_CLOUD_USER = os.environ["ZILLIZ_CLOUD_USER"]
 ZILLIZ_CLOUD_PASSWORD = os.environ["ZILLIZ_CLOUD_PASSWORD"]
 
 
+# Vector Store Mode
+# "collection" keeps one collection per organization, "shared" stores every
+# organization in one collection partitioned by the org_id partition key, and
+# "local" searches memory-mapped NumPy files on this machine without Milvus
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "collection")
+SHARED_COLLECTION_NAME = os.getenv("SHARED_COLLECTION_NAME", "prism_shared")
+SHARED_COLLECTION_NUM_PARTITIONS = int(
+    os.getenv("SHARED_COLLECTION_NUM_PARTITIONS", "64")
+)
+
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "/tmp/prism/vector_store")
+
+
+# Milvus Connection
+MILVUS_CONNECTION_ALIAS = "prism"
+MILVUS_HEALTH_CHECK_INTERVAL = int(
+    os.getenv("MILVUS_HEALTH_CHECK_INTERVAL", "30")
+)  # seconds
+MILVUS_CONNECT_MAX_RETRIES = int(os.getenv("MILVUS_CONNECT_MAX_RETRIES", "5"))
+MILVUS_COLLECTION_CACHE_SIZE = int(os.getenv("MILVUS_COLLECTION_CACHE_SIZE", "256"))
+
+
+# Vector Index
+# Collections below VECTOR_INDEX_FLAT_MAX_VECTORS are searched exhaustively, larger ones
+# get an HNSW graph, and the largest an IVF_SQ8 index that fits in memory
+VECTOR_INDEX_FLAT_MAX_VECTORS = int(os.getenv("VECTOR_INDEX_FLAT_MAX_VECTORS", "50000"))
+VECTOR_INDEX_HNSW_MAX_VECTORS = int(
+    os.getenv("VECTOR_INDEX_HNSW_MAX_VECTORS", "2000000")
+)
+# Rebuild the index after ingestion when the collection outgrew its index type
+VECTOR_INDEX_AUTO_REBUILD = (
+    os.getenv("VECTOR_INDEX_AUTO_REBUILD", "false").lower() == "true"
+)
+VECTOR_SEARCH_TOP_K = int(os.getenv("VECTOR_SEARCH_TOP_K", "10"))
+
+
+# Hybrid Retrieval
+# Fuse dense and BM25 results with reciprocal rank fusion before reranking.
+# The BM25 index of every organization is an SQLite file under SPARSE_INDEX_DIR,
+# written by the instance that ingests its data. Put the directory on a volume
+# shared by every instance of the API, such as EFS, or run
+# commands.build_sparse_index on every instance after it starts. Organizations
+# without an index are searched with dense retrieval only, with a warning.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", "/tmp/prism/sparse_index")
+SPARSE_SEARCH_TOP_K = int(os.getenv("SPARSE_SEARCH_TOP_K", "10"))
+HYBRID_RETRIEVAL_TOP_K = int(os.getenv("HYBRID_RETRIEVAL_TOP_K", "8"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+# Chunk Deduplication
+# Chunks with the same normalized text are stored once per organization, and the
+# embedding cache keeps repeated chunks from running through the model again.
+# The references of every file to its chunks live in SQLite files under
+# CHUNK_REFERENCE_DIR, which must be a durable volume shared by every instance of
+# the API, such as EFS. Deletes are refused while the references of a document are
+# missing, since the chunks other documents rely on can't be told apart.
+CHUNK_DEDUPLICATION = os.getenv("CHUNK_DEDUPLICATION", "false").lower() == "true"
+CHUNK_REFERENCE_DIR = os.getenv("CHUNK_REFERENCE_DIR", "/tmp/prism/chunk_references")
+
+
+# Vector Store Writes
+VECTOR_INSERT_BATCH_SIZE = int(os.getenv("VECTOR_INSERT_BATCH_SIZE", "500"))
+VECTOR_DELETE_BATCH_SIZE = int(os.getenv("VECTOR_DELETE_BATCH_SIZE", "100"))
+VECTOR_STORE_MAX_WORKERS = int(os.getenv("VECTOR_STORE_MAX_WORKERS", "4"))
+VECTOR_STORE_MAX_RETRIES = int(os.getenv("VECTOR_STORE_MAX_RETRIES", "3"))
+# Failed inserts wait a random time up to 2**attempt seconds, at most this long
+VECTOR_STORE_MAX_BACKOFF = float(os.getenv("VECTOR_STORE_MAX_BACKOFF", "30"))
+# Embedded nodes are streamed from Ray to the vector store in batches of this size.
+# The driver holds at most EMBEDDING_SINK_PREFETCH_BATCHES batches ahead of the
+# writes, and Ray stops embedding when the pipeline's blocks use more than
+# EMBEDDING_SINK_OBJECT_STORE_MEMORY bytes of the object store.
+EMBEDDING_SINK_BATCH_SIZE = int(os.getenv("EMBEDDING_SINK_BATCH_SIZE", "2000"))
+EMBEDDING_SINK_PREFETCH_BATCHES = int(os.getenv("EMBEDDING_SINK_PREFETCH_BATCHES", "2"))
+EMBEDDING_SINK_OBJECT_STORE_MEMORY = int(
+    os.getenv("EMBEDDING_SINK_OBJECT_STORE_MEMORY", str(2 * 1024**3))
+)
+# Files are downloaded by DOWNLOAD_ACTORS actors with DOWNLOAD_CONCURRENCY threads
+# each, bounding the connections to Merge, and parsed by tasks of PARSE_NUM_CPUS
+DOWNLOAD_ACTORS = int(os.getenv("DOWNLOAD_ACTORS", "4"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "16"))
+DOWNLOAD_BATCH_SIZE = int(os.getenv("DOWNLOAD_BATCH_SIZE", "16"))
+DOWNLOAD_NUM_CPUS = float(os.getenv("DOWNLOAD_NUM_CPUS", "0.25"))
+PARSE_NUM_CPUS = float(os.getenv("PARSE_NUM_CPUS", "1"))
+# Downloads larger than DOWNLOAD_SPILL_SIZE bytes skip the object store: the parse task
+# downloads them itself into the scratch directory of its machine and parses them
+# memory-mapped. Every machine's scratch files are capped at DOWNLOAD_SCRATCH_QUOTA
+# bytes, and files older than DOWNLOAD_SCRATCH_MAX_AGE seconds are left by crashes.
+DOWNLOAD_SPILL_SIZE = int(os.getenv("DOWNLOAD_SPILL_SIZE", str(32 * 1024**2)))
+DOWNLOAD_SCRATCH_DIR = os.getenv("DOWNLOAD_SCRATCH_DIR", "/tmp/prism/scratch")
+DOWNLOAD_SCRATCH_QUOTA = int(os.getenv("DOWNLOAD_SCRATCH_QUOTA", str(10 * 1024**3)))
+DOWNLOAD_SCRATCH_MAX_AGE = int(os.getenv("DOWNLOAD_SCRATCH_MAX_AGE", "21600"))
+# Outcome of every file of an ingestion run, to process only the failed files again
+INGESTION_MANIFEST_DIR = os.getenv(
+    "INGESTION_MANIFEST_DIR", "/tmp/prism/ingestion_manifests"
+)
+
+
+# Blocking I/O
+# Size of the thread pool that runs boto3, Merge and Milvus calls off the event loop
+BLOCKING_IO_MAX_WORKERS = int(os.getenv("BLOCKING_IO_MAX_WORKERS", "32"))
+# Ingestions run for minutes, so they get their own threads and never hold the
+# ones answering queries. Further syncs wait for a free thread.
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+
+
+# Query Engine Cache
+QUERY_ENGINE_CACHE_MAX_SIZE = int(os.getenv("QUERY_ENGINE_CACHE_MAX_SIZE", "64"))
+QUERY_ENGINE_CACHE_TTL = int(os.getenv("QUERY_ENGINE_CACHE_TTL", "1800"))  # seconds
+
+
+# Query Session
+# Questions answered at the same time on one websocket, and the most that may be queued
+QUERY_SESSION_MAX_CONCURRENCY = int(os.getenv("QUERY_SESSION_MAX_CONCURRENCY", "4"))
+QUERY_SESSION_MAX_IN_FLIGHT = int(os.getenv("QUERY_SESSION_MAX_IN_FLIGHT", "16"))
+
+
+# Metrics
+# Percentiles are computed over the most recent samples of each histogram
+METRICS_MAX_SAMPLES = int(os.getenv("METRICS_MAX_SAMPLES", "1024"))
+
+
+# Semantic Answer Cache
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95")
+)
+ANSWER_CACHE_MAX_ENTRIES_PER_ORG = int(
+    os.getenv("ANSWER_CACHE_MAX_ENTRIES_PER_ORG", "256")
+)
+ANSWER_CACHE_MAX_ORGS = int(os.getenv("ANSWER_CACHE_MAX_ORGS", "256"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+
+
 # File Processing Properties
 SUPPORTED_EXTENSIONS = [
     "html",
@@ -67,10 +248,22 @@ SUPPORTED_EXTENSIONS = [
     "pptx",
     "xlsx",
 ]
+# Read txt, csv and html with the standard library and PDFs from their text layer,
+# instead of Unstructured.io
+FAST_PARSING = os.getenv("FAST_PARSING", "true").lower() == "true"
 
 # https://docs.ray.io/en/latest/ray-core/api/doc/ray.runtime_env.RuntimeEnv.html
 RAY_ADDRESS = os.environ["RAY_ADDRESS"]
 RAY_RUNTIME_ENV = RuntimeEnv(
     pip=["llama_index", "langchain", "mergepythonclient", "nltk", "unstructured"],
-    env_vars={"MERGE_API_KEY": MERGE_API_KEY},
+    env_vars={
+        "MERGE_API_KEY": MERGE_API_KEY,
+        "EMBEDDING_CACHE": str(EMBEDDING_CACHE).lower(),
+        "EMBEDDING_CACHE_PATH": EMBEDDING_CACHE_PATH,
+        "EMBEDDING_CACHE_MAX_ROWS": str(EMBEDDING_CACHE_MAX_ROWS),
+        "DOWNLOAD_SPILL_SIZE": str(DOWNLOAD_SPILL_SIZE),
+        "DOWNLOAD_SCRATCH_DIR": DOWNLOAD_SCRATCH_DIR,
+        "DOWNLOAD_SCRATCH_QUOTA": str(DOWNLOAD_SCRATCH_QUOTA),
+        "DOWNLOAD_SCRATCH_MAX_AGE": str(DOWNLOAD_SCRATCH_MAX_AGE),
+    },
 )
@@ -0,0 +1,7 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class EmbeddingExecutionMode(ExtendedEnum):
+    AUTO = "auto"
+    GPU = "gpu"
+    CPU = "cpu"
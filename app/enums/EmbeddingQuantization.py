@@ -0,0 +1,7 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class EmbeddingQuantization(ExtendedEnum):
+    NONE = "none"
+    FLOAT16 = "float16"
+    INT8 = "int8"
@@ -0,0 +1,10 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class FileProcessingStatus(ExtendedEnum):
+    OK = "ok"
+    UNSUPPORTED = "unsupported"
+    DOWNLOAD_ERROR = "download_error"
+    PARSE_ERROR = "parse_error"
+    # the run failed before the file got an outcome
+    NOT_PROCESSED = "not_processed"
@@ -0,0 +1,6 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class QueryMessageType(ExtendedEnum):
+    QUERY = "query"
+    CANCEL = "cancel"
@@ -0,0 +1,6 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class RerankerBackend(ExtendedEnum):
+    COHERE = "cohere"
+    CROSS_ENCODER = "cross-encoder"
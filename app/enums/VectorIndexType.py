@@ -0,0 +1,9 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class VectorIndexType(ExtendedEnum):
+    FLAT = "FLAT"
+    HNSW = "HNSW"
+    IVF_FLAT = "IVF_FLAT"
+    IVF_SQ8 = "IVF_SQ8"
+    AUTOINDEX = "AUTOINDEX"
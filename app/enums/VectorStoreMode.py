@@ -0,0 +1,7 @@
+from .ExtendedEnum import ExtendedEnum
+
+
+class VectorStoreMode(ExtendedEnum):
+    COLLECTION = "collection"
+    SHARED = "shared"
+    LOCAL = "local"
@@ -1,5 +1,23 @@
+from .EmbeddingExecutionMode import EmbeddingExecutionMode
+from .EmbeddingQuantization import EmbeddingQuantization
 from .ExtendedEnum import ExtendedEnum
 from .FileOperation import FileOperation
+from .FileProcessingStatus import FileProcessingStatus
 from .IntegrationStatus import IntegrationStatus
+from .QueryMessageType import QueryMessageType
+from .RerankerBackend import RerankerBackend
+from .VectorIndexType import VectorIndexType
+from .VectorStoreMode import VectorStoreMode
 
-__all__ = ["ExtendedEnum", "FileOperation", "IntegrationStatus"]
+__all__ = [
+    "EmbeddingExecutionMode",
+    "EmbeddingQuantization",
+    "ExtendedEnum",
+    "FileOperation",
+    "FileProcessingStatus",
+    "IntegrationStatus",
+    "QueryMessageType",
+    "RerankerBackend",
+    "VectorIndexType",
+    "VectorStoreMode",
+]
@@ -18,6 +18,8 @@ class PrismDBExceptionCode(Enum):
     NOT_ENOUGH_PERMISSION = 4201
 
     COULD_NOT_CONNECT_TO_VECTOR_STORE = 4301
+    COULD_NOT_INSERT_VECTORS = 4302
+    COULD_NOT_DELETE_VECTORS = 4303
 
     COULD_NOT_CREATE_TABLE = 4401
 
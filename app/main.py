@@ -3,11 +3,19 @@ from http import HTTPStatus
 
 from api.v1 import (
     integration_router,
+    metrics_router,
     organization_router,
     query_router,
     sync_router,
     user_router,
 )
+from constants import (
+    CROSS_ENCODER_MODEL,
+    CROSS_ENCODER_QUANTIZE,
+    CROSS_ENCODER_RUNTIME,
+    RERANKER_BACKEND,
+)
+from enums import RerankerBackend
 from exceptions import PrismException
 from fastapi import FastAPI, Request
 from fastapi.encoders import jsonable_encoder
@@ -16,6 +24,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
 from loguru import logger
+from pipeline.CrossEncoderRerank import load_cross_encoder
+from pipeline.QueryEmbeddingService import query_embedding_service
+from utils import blocking_io_executor, ingestion_executor
 
 logger.remove()
 logger.add(
@@ -55,6 +66,23 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.on_event("startup")
+def load_models() -> None:
+    # Load the local models before the first question instead of during it
+    query_embedding_service.load()
+
+    if RerankerBackend(RERANKER_BACKEND) == RerankerBackend.CROSS_ENCODER:
+        load_cross_encoder(
+            CROSS_ENCODER_MODEL, CROSS_ENCODER_RUNTIME, CROSS_ENCODER_QUANTIZE
+        )
+
+
+@app.on_event("shutdown")
+def shutdown_executors() -> None:
+    blocking_io_executor.shutdown(wait=False)
+    ingestion_executor.shutdown(wait=False)
+
+
 @app.get("/")
 async def root() -> dict:
     return {"message": "Working"}
@@ -76,6 +104,7 @@ def prism_openapi() -> dict:
 
 app.openapi = prism_openapi
 app.include_router(integration_router, prefix="/v1")
+app.include_router(metrics_router, prefix="/v1")
 app.include_router(organization_router, prefix="/v1")
 app.include_router(query_router, prefix="/v1")
 app.include_router(sync_router, prefix="/v1")
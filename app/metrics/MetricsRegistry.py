@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+from constants import METRICS_MAX_SAMPLES
+
+
+class Histogram:
+    """Distribution of the most recent samples of a single metric."""
+
+    def __init__(self, max_samples: int):
+        self.samples: deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> dict:
+        samples = np.fromiter(self.samples, dtype=float)
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(samples.max()),
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process histograms per organization, grouped by kind:
+    `latency_ms` per query stage, `tokens` per LLM call and `nodes` per stage.
+    Percentiles are computed over the last `max_samples` observations.
+    """
+
+    def __init__(self, max_samples: int):
+        self.max_samples = max_samples
+        self.histograms: dict[tuple[str, str, str], Histogram] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, org_id: str, kind: str, name: str, value: float) -> None:
+        key = (org_id, kind, name)
+
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.max_samples)
+
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, org_id: str, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(
+                org_id,
+                "latency_ms",
+                stage,
+                (time.perf_counter() - started) * 1000,
+            )
+
+    def snapshot(self, org_id: str | None = None) -> dict:
+        with self.lock:
+            items = [
+                (key, histogram.summary())
+                for key, histogram in self.histograms.items()
+                if org_id is None or key[0] == org_id
+            ]
+
+        metrics: dict = {}
+
+        for (metric_org_id, kind, name), summary in sorted(items):
+            metrics.setdefault(metric_org_id, {}).setdefault(kind, {})[name] = summary
+
+        return metrics
+
+
+metrics_registry = MetricsRegistry(max_samples=METRICS_MAX_SAMPLES)
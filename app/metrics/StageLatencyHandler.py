@@ -0,0 +1,106 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from llama_index.callbacks.base_handler import BaseCallbackHandler
+from llama_index.callbacks.schema import CBEventType, EventPayload
+from llama_index.callbacks.token_counting import get_llm_token_counts
+from loguru import logger
+
+from .MetricsRegistry import MetricsRegistry
+
+# Events started longer ago never end, e.g. the LLM call of a cancelled stream
+STALE_EVENT_SECONDS = 600
+
+
+class StageLatencyHandler(BaseCallbackHandler):
+    """
+    Records the wall time of every query engine event (query, retrieve, embedding,
+    llm, synthesize), the LLM token counts and the number of retrieved nodes.
+    The engine is shared by every question of the organization, so the events
+    that never ended are dropped by age whenever a trace ends.
+    """
+
+    def __init__(
+        self,
+        org_id: str,
+        registry: MetricsRegistry,
+        tokenizer: Callable[[str], list],
+    ):
+        self.org_id = org_id
+        self.registry = registry
+        self.tokenizer = tokenizer
+        self.started: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+
+    def start_trace(self, trace_id: str | None = None) -> None:
+        return
+
+    def end_trace(
+        self,
+        trace_id: str | None = None,
+        trace_map: dict[str, list[str]] | None = None,
+    ) -> None:
+        deadline = time.perf_counter() - STALE_EVENT_SECONDS
+
+        with self.lock:
+            for event_id, started in list(self.started.items()):
+                if started < deadline:
+                    del self.started[event_id]
+
+    def on_event_start(
+        self,
+        event_type: CBEventType,
+        payload: dict[str, Any] | None = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        with self.lock:
+            self.started[event_id] = time.perf_counter()
+
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: CBEventType,
+        payload: dict[str, Any] | None = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        with self.lock:
+            started = self.started.pop(event_id, None)
+
+        if started is not None:
+            self.registry.observe(
+                self.org_id,
+                "latency_ms",
+                event_type.value,
+                (time.perf_counter() - started) * 1000,
+            )
+
+        if payload is None:
+            return
+
+        if event_type == CBEventType.RETRIEVE and EventPayload.NODES in payload:
+            self.registry.observe(
+                self.org_id, "nodes", "retrieve", len(payload[EventPayload.NODES])
+            )
+        elif event_type == CBEventType.LLM:
+            try:
+                token_counts = get_llm_token_counts(self.tokenizer, payload)
+            except ValueError as e:
+                logger.warning("org_id={}, error={}", self.org_id, e)
+                return
+
+            self.registry.observe(
+                self.org_id, "tokens", "prompt", token_counts.prompt_token_count
+            )
+            self.registry.observe(
+                self.org_id,
+                "tokens",
+                "completion",
+                token_counts.completion_token_count,
+            )
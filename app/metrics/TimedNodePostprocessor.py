@@ -0,0 +1,35 @@
+from llama_index.indices.postprocessor.types import BaseNodePostprocessor
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import NodeWithScore
+
+from .MetricsRegistry import MetricsRegistry
+
+
+class TimedNodePostprocessor(BaseNodePostprocessor):
+    """
+    Wraps a node postprocessor to record its wall time and output size, since the
+    CallbackManager has no event for postprocessors.
+    """
+
+    def __init__(
+        self,
+        postprocessor: BaseNodePostprocessor,
+        org_id: str,
+        registry: MetricsRegistry,
+    ):
+        self._postprocessor = postprocessor
+        self._org_id = org_id
+        self._registry = registry
+        self._stage = type(postprocessor).__name__
+
+    def postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        with self._registry.timer(self._org_id, self._stage):
+            nodes = self._postprocessor.postprocess_nodes(nodes, query_bundle)
+
+        self._registry.observe(self._org_id, "nodes", self._stage, len(nodes))
+
+        return nodes
@@ -0,0 +1,36 @@
+from llama_index import ServiceContext
+from llama_index.indices.base_retriever import BaseRetriever
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import NodeWithScore
+
+from .MetricsRegistry import MetricsRegistry
+
+
+class TimedRetriever(BaseRetriever):
+    """
+    Wraps a retriever to record the vector store search on its own. The retrieve
+    event of the query engine also includes the node postprocessors.
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        org_id: str,
+        registry: MetricsRegistry,
+        stage: str = "vector_search",
+    ):
+        self._retriever = retriever
+        self._org_id = org_id
+        self._registry = registry
+        self._stage = stage
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        with self._registry.timer(self._org_id, self._stage):
+            nodes = self._retriever.retrieve(query_bundle)
+
+        self._registry.observe(self._org_id, "nodes", self._stage, len(nodes))
+
+        return nodes
+
+    def get_service_context(self) -> ServiceContext | None:
+        return self._retriever.get_service_context()
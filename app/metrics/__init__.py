@@ -0,0 +1,13 @@
+from .MetricsRegistry import Histogram, MetricsRegistry, metrics_registry
+from .StageLatencyHandler import StageLatencyHandler
+from .TimedNodePostprocessor import TimedNodePostprocessor
+from .TimedRetriever import TimedRetriever
+
+__all__ = [
+    "Histogram",
+    "MetricsRegistry",
+    "StageLatencyHandler",
+    "TimedNodePostprocessor",
+    "TimedRetriever",
+    "metrics_registry",
+]
@@ -0,0 +1,14 @@
+from enums import FileProcessingStatus
+from pydantic import BaseModel
+
+
+class FileOutcome(BaseModel):
+    file_id: str
+    file_name: str
+    status: FileProcessingStatus
+    error: str | None = None
+    download_seconds: float = 0
+    parse_seconds: float = 0
+    nodes: int = 0
+    # the Merge file, to process it again
+    file: dict
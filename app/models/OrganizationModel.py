@@ -12,6 +12,8 @@ class OrganizationModel(BaseModel):
     invited_user_list: list[str]
     link_id_map: dict
     document_list: list[str]
+    # bumped whenever what answers are retrieved from changes
+    index_version: int
     created_at: str
     updated_at: str
 
@@ -29,6 +31,7 @@ def to_organization_model(response: dict) -> OrganizationModel:
         invited_user_list=item.get("invited_user_list", []),
         link_id_map=item.get("link_id_map", {}),
         document_list=item.get("document_list", []),
+        index_version=item.get("index_version", 0),
         created_at=item.get("created_at", ""),
         updated_at=item.get("updated_at", ""),
     )
@@ -1,3 +1,4 @@
+from enums import QueryMessageType
 from pydantic import BaseModel
 
 from .SyncFileModel import SyncFileModel
@@ -57,3 +58,9 @@ class RegisterUserRequest(BaseModel):
 class SyncOrganizationDataRequest(BaseModel):
     account_token: str
     files: list[SyncFileModel]
+
+
+class QueryMessage(BaseModel):
+    type: QueryMessageType = QueryMessageType.QUERY
+    request_id: str | None = None
+    query: str = ""
@@ -85,3 +85,8 @@ class SyncOrganizationDataResponse(BaseModel):
 class CheckAdminResponse(BaseModel):
     status: int
     is_admin: bool
+
+
+class GetMetricsResponse(BaseModel):
+    status: int
+    metrics: dict
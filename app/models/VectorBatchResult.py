@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class VectorBatchResult(BaseModel):
+    batch: int
+    size: int
+    success: bool
+    attempts: int = 1
+    error: str | None = None
@@ -1,17 +1,21 @@
 from .AccessControlModel import AccessControlModel, to_access_control_model
 from .FileModel import get_file_key, to_file_model
+from .FileOutcome import FileOutcome
 from .OrganizationModel import (
     OrganizationModel,
     get_organization_key,
     to_organization_model,
 )
 from .UserModel import UserModel, get_user_key, to_user_model
+from .VectorBatchResult import VectorBatchResult
 from .WhitelistModel import WhitelistModel, get_whitelist_key, to_whitelist_model
 
 __all__ = [
     "AccessControlModel",
+    "FileOutcome",
     "OrganizationModel",
     "UserModel",
+    "VectorBatchResult",
     "WhitelistModel",
     "to_access_control_model",
     "to_organization_model",
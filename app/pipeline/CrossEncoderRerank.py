@@ -0,0 +1,147 @@
+"""
+In-process cross-encoder reranker for Prism AI
+
+Drop-in replacement for CohereRerank that scores (query, node) pairs with a local
+sentence-transformers cross-encoder instead of calling the Cohere API.
+The model is loaded once per process and shared by every query engine.
+"""
+import tempfile
+import threading
+from typing import Any
+
+import numpy as np
+from llama_index.indices.postprocessor.types import BaseNodePostprocessor
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import NodeWithScore
+from loguru import logger
+
+_models: dict[tuple[str, str, bool], Any] = {}
+_models_lock = threading.Lock()
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder executed by onnxruntime, exposing the CrossEncoder predict API."""
+
+    def __init__(self, model_name: str, quantize: bool, max_length: int = 512):
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                "Cannot import optimum, please `pip install optimum[onnxruntime]`."
+            )
+
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = ORTModelForSequenceClassification.from_pretrained(
+            model_name, export=True
+        )
+
+        if quantize:
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            # dynamic int8 quantization of the exported graph
+            save_dir = tempfile.mkdtemp(prefix="prism-cross-encoder-")
+            quantizer = ORTQuantizer.from_pretrained(self.model)
+            quantizer.quantize(
+                save_dir=save_dir,
+                quantization_config=AutoQuantizationConfig.avx2(
+                    is_static=False, per_channel=False
+                ),
+            )
+            self.model = ORTModelForSequenceClassification.from_pretrained(
+                save_dir, file_name="model_quantized.onnx"
+            )
+
+    def predict(
+        self, sentences: list[tuple[str, str]], batch_size: int = 16, **kwargs: Any
+    ) -> np.ndarray:
+        scores = []
+
+        for i in range(0, len(sentences), batch_size):
+            batch = sentences[i : i + batch_size]
+            features = self.tokenizer(
+                [pair[0] for pair in batch],
+                [pair[1] for pair in batch],
+                padding=True,
+                truncation="longest_first",
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            logits = self.model(**features).logits
+            scores.append(np.asarray(logits)[:, 0])
+
+        # same activation as CrossEncoder with a single label
+        return 1 / (1 + np.exp(-np.concatenate(scores)))
+
+
+def load_cross_encoder(model_name: str, runtime: str, quantize: bool) -> Any:
+    key = (model_name, runtime, quantize)
+
+    with _models_lock:
+        if key in _models:
+            return _models[key]
+
+        logger.info(
+            "Loading cross-encoder. model_name={}, runtime={}, quantize={}",
+            model_name,
+            runtime,
+            quantize,
+        )
+
+        if runtime == "onnx":
+            model = OnnxCrossEncoder(model_name=model_name, quantize=quantize)
+        elif runtime == "torch":
+            import torch
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(model_name, max_length=512, device="cpu")
+
+            if quantize:
+                model.model = torch.quantization.quantize_dynamic(
+                    model.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        else:
+            raise ValueError(f"Unsupported cross-encoder runtime: {runtime}")
+
+        _models[key] = model
+
+        return model
+
+
+class CrossEncoderRerank(BaseNodePostprocessor):
+    def __init__(
+        self,
+        top_n: int = 2,
+        model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        runtime: str = "torch",
+        quantize: bool = False,
+        batch_size: int = 16,
+    ):
+        self._model = load_cross_encoder(model, runtime, quantize)
+        self._top_n = top_n
+        self._batch_size = batch_size
+
+    def postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+
+        if len(nodes) == 0:
+            return []
+
+        pairs = [(query_bundle.query_str, node.node.get_content()) for node in nodes]
+        scores = self._model.predict(
+            pairs, batch_size=self._batch_size, show_progress_bar=False
+        )
+
+        ranked = sorted(zip(nodes, scores), key=lambda x: x[1], reverse=True)
+
+        return [
+            NodeWithScore(node=node.node, score=float(score))
+            for node, score in ranked[: self._top_n]
+        ]
@@ -6,22 +6,102 @@ Original Implementation: llama_hub/file/unstructured/base.py
 
 A parser for unstructured text files using Unstructured.io.
 Supports .html, .rtf, .txt, .csv, .doc, .docx, .pdf, .ppt, .pptx, and .xlsx documents.
+
+Plain text, CSV and HTML files are read with the standard library and PDFs from their
+text layer with pdfminer, skipping the file type detection and element pipeline of
+Unstructured.io. Files the fast parsers can't read, such as non UTF-8 text or scanned
+PDFs, go through Unstructured.io like every other format.
 """
+import csv
+import io
 import re
+from html.parser import HTMLParser
 from typing import IO, Any
 
 from llama_index.readers.base import BaseReader
 from llama_index.readers.schema.base import Document
 
+# Tags whose text isn't part of the document
+SKIPPED_HTML_TAGS = {"head", "noscript", "script", "style", "template", "title"}
+# Tags that start a new text chunk
+BLOCK_HTML_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "footer",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+
+
+class _HTMLTextParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.chunks: list[str] = [""]
+        self.skipped_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in SKIPPED_HTML_TAGS:
+            self.skipped_depth += 1
+        elif tag in BLOCK_HTML_TAGS:
+            self.chunks.append("")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_HTML_TAGS:
+            self.skipped_depth = max(self.skipped_depth - 1, 0)
+        elif tag in BLOCK_HTML_TAGS:
+            self.chunks.append("")
+
+    def handle_data(self, data: str) -> None:
+        if not self.skipped_depth:
+            self.chunks[-1] += data
+
 
 class CustomUnstructuredReader(BaseReader):
     """Custom unstructured text reader for a variety of files."""
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
+    def __init__(self, *args: Any, fast_parsing: bool = True, **kwargs: Any) -> None:
         """Init params."""
         super().__init__(*args, **kwargs)
         self.clean_regex = re.compile(r"[\t\n]")
         self.compress_regex = re.compile(r" +")
+        self.paragraph_regex = re.compile(r"\n\s*\n|\f")
+        self.fast_parsers = (
+            {
+                "txt": self.parse_text,
+                "csv": self.parse_csv,
+                "html": self.parse_html,
+                "htm": self.parse_html,
+                "pdf": self.parse_pdf,
+            }
+            if fast_parsing
+            else {}
+        )
 
         # Prerequisite for Unstructured.io to work
         import nltk
@@ -29,17 +109,85 @@ class CustomUnstructuredReader(BaseReader):
         nltk.download("punkt")
         nltk.download("averaged_perceptron_tagger")
 
+    @staticmethod
+    def decode(file: IO[bytes]) -> str | None:
+        try:
+            return file.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            # Unstructured.io detects the encoding
+            return None
+
+    def parse_text(self, file: IO[bytes]) -> list[str] | None:
+        text = self.decode(file)
+
+        if text is None:
+            return None
+
+        return self.paragraph_regex.split(text)
+
+    def parse_csv(self, file: IO[bytes]) -> list[str] | None:
+        text = self.decode(file)
+
+        if text is None:
+            return None
+
+        return [" ".join(row) for row in csv.reader(io.StringIO(text))]
+
+    def parse_html(self, file: IO[bytes]) -> list[str] | None:
+        text = self.decode(file)
+
+        if text is None:
+            return None
+
+        parser = _HTMLTextParser()
+        parser.feed(text)
+        parser.close()
+
+        return parser.chunks
+
+    def parse_pdf(self, file: IO[bytes]) -> list[str] | None:
+        from pdfminer.high_level import extract_text
+
+        try:
+            text = extract_text(file)
+        except Exception:
+            # pdfminer raises all kinds of errors on malformed or encrypted PDFs,
+            # which Unstructured.io may still read
+            return None
+
+        if not text.strip():
+            # no text layer, Unstructured.io runs OCR on scanned PDFs
+            return None
+
+        return self.paragraph_regex.split(text)
+
+    def partition(self, file: IO[bytes], extension: str | None) -> list[str]:
+        fast_parser = self.fast_parsers.get((extension or "").lower())
+
+        if fast_parser is not None:
+            text_chunks = fast_parser(file)
+
+            if text_chunks is not None:
+                return text_chunks
+
+            file.seek(0)
+
+        from unstructured.partition.auto import partition
+
+        return [str(el) for el in partition(file=file)]
+
     def load_data(
         self,
         file: IO[bytes],
         extra_info: dict | None = None,
         split_documents: bool | None = False,
+        extension: str | None = None,
     ) -> list[Document]:
-        """Parse file."""
-        from unstructured.partition.auto import partition
-
-        elements = partition(file=file)
-        text_chunks = [" ".join(str(el).split()) for el in elements]
+        """Parse file, with the fast parser of its extension if there is one."""
+        text_chunks = [
+            " ".join(chunk.split()) for chunk in self.partition(file, extension)
+        ]
+        text_chunks = [chunk for chunk in text_chunks if chunk]
 
         if split_documents:
             return [
@@ -1,48 +1,91 @@
-from collections.abc import Sequence
+import json
+import os
+import random
+import sqlite3
+import time
+from collections.abc import Callable, Generator, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 
 import tiktoken
+from connection import milvus_connection_manager
 from constants import (
+    CHUNK_REFERENCE_DIR,
     COHERE_API_KEY,
+    CROSS_ENCODER_BATCH_SIZE,
+    CROSS_ENCODER_MODEL,
+    CROSS_ENCODER_QUANTIZE,
+    CROSS_ENCODER_RUNTIME,
     DEFAULT_OPENAI_MODEL,
-    PRISM_ENV,
-    ZILLIZ_CLOUD_HOST,
-    ZILLIZ_CLOUD_PASSWORD,
-    ZILLIZ_CLOUD_PORT,
-    ZILLIZ_CLOUD_USER,
+    HYBRID_RETRIEVAL,
+    HYBRID_RETRIEVAL_TOP_K,
+    RERANKER_BACKEND,
+    RRF_K,
+    SPARSE_INDEX_DIR,
+    SPARSE_SEARCH_TOP_K,
+    VECTOR_DELETE_BATCH_SIZE,
+    VECTOR_INDEX_AUTO_REBUILD,
+    VECTOR_INSERT_BATCH_SIZE,
+    VECTOR_SEARCH_TOP_K,
+    VECTOR_STORE_MAX_BACKOFF,
+    VECTOR_STORE_MAX_RETRIES,
+    VECTOR_STORE_MAX_WORKERS,
 )
+from enums import RerankerBackend
 from exceptions import PrismDBException, PrismDBExceptionCode
 from llama_index import ServiceContext, StorageContext, VectorStoreIndex
 from llama_index.callbacks import CallbackManager, TokenCountingHandler
-from llama_index.indices.postprocessor import (
-    FixedRecencyPostprocessor,
-    SentenceEmbeddingOptimizer,
-)
+from llama_index.embeddings import LangchainEmbedding
+from llama_index.indices.postprocessor import FixedRecencyPostprocessor
 from llama_index.indices.postprocessor.cohere_rerank import CohereRerank
+from llama_index.indices.postprocessor.types import BaseNodePostprocessor
 from llama_index.indices.query.base import BaseQueryEngine
 from llama_index.llms import OpenAI
+from llama_index.query_engine import RetrieverQueryEngine
 from llama_index.schema import BaseNode
 from llama_index.vector_stores import MilvusVectorStore
 from llama_index.vector_stores.types import NodeWithEmbedding
 from loguru import logger
+from metrics import (
+    StageLatencyHandler,
+    TimedNodePostprocessor,
+    TimedRetriever,
+    metrics_registry,
+)
+from models import VectorBatchResult
 from pymilvus import Collection
 from pymilvus.exceptions import MilvusException
+from storage import (
+    ChunkReferenceStore,
+    LocalVectorStore,
+    SharedMilvusVectorStore,
+    SparseIndex,
+    vector_index_policy,
+)
+from storage.ChunkReferenceStore import CONTENT_HASH_KEY
+from utils import divide_list
+
+from .CrossEncoderRerank import CrossEncoderRerank
+from .FusionRetriever import FusionRetriever
+from .PrecomputedSentenceOptimizer import PrecomputedSentenceOptimizer
+from .QueryEmbeddingService import query_embedding_service
+from .SparseRetriever import SparseRetriever
 
 
 class DataIndexingService:
+    # Largest number of rows a Milvus query returns
+    QUERY_LIMIT = 16384
+
     def __init__(self, org_id: str):
         self.org_id = org_id
+        self.sparse_index = SparseIndex(os.path.join(SPARSE_INDEX_DIR, f"{org_id}.db"))
+        self.chunk_references = ChunkReferenceStore(
+            os.path.join(CHUNK_REFERENCE_DIR, f"{org_id}.db")
+        )
 
         try:
+            # shared connection and cached collection handle of the organization
             self.storage_context = StorageContext.from_defaults(
-                vector_store=MilvusVectorStore(
-                    # collection name can only contain numbers, letters and underscores
-                    collection_name=org_id,
-                    host=ZILLIZ_CLOUD_HOST,
-                    port=ZILLIZ_CLOUD_PORT,
-                    user=ZILLIZ_CLOUD_USER,
-                    password=ZILLIZ_CLOUD_PASSWORD,
-                    use_secure=True if PRISM_ENV == "PROD" else False,
-                ),
+                vector_store=milvus_connection_manager.get_vector_store(org_id),
             )
         except MilvusException as e:
             logger.error("org_id={}, error={}", org_id, str(e))
@@ -54,50 +97,537 @@ class DataIndexingService:
     def store_vectors(self, nodes: Sequence[BaseNode]) -> None:
         logger.info("org_id={}, len(nodes)={}", self.org_id, len(nodes))
 
-        vector_index = VectorStoreIndex(
-            nodes=nodes, storage_context=self.storage_context, show_progress=True
+        self.store_nodes(nodes)
+        self.refresh_vector_index()
+
+        logger.info("Stored vectors to vector store. org_id={}", self.org_id)
+
+    def add_nodes(self, nodes: Sequence[BaseNode]) -> None:
+        logger.info("org_id={}, len(nodes)={}", self.org_id, len(nodes))
+
+        self.store_nodes(nodes)
+        self.refresh_vector_index()
+
+    def store_batches(
+        self,
+        batches: Iterable[Sequence[BaseNode]],
+        on_batch_stored: Callable[[], None] | None = None,
+    ) -> int:
+        """
+        Store batches of embedded nodes as they arrive from the pipeline, so they
+        are searchable while the rest is still embedded, and refresh the vector
+        index once at the end. `on_batch_stored` runs after every batch, to drop
+        what was cached from the previous contents. Returns the number of stored
+        nodes.
+        """
+        stored = 0
+        started = time.perf_counter()
+
+        try:
+            for nodes in batches:
+                stored += self.store_nodes(nodes)
+
+                if on_batch_stored is not None:
+                    on_batch_stored()
+
+                logger.info(
+                    "org_id={}, len(nodes)={}, stored={}, elapsed={:.2f}s",
+                    self.org_id,
+                    len(nodes),
+                    stored,
+                    time.perf_counter() - started,
+                )
+        finally:
+            # a generator of batches finishes its own cleanup now, not when collected
+            if isinstance(batches, Generator):
+                batches.close()
+
+            self.refresh_vector_index()
+
+        return stored
+
+    def store_nodes(self, nodes: Sequence[BaseNode]) -> int:
+        stored_nodes = self.deduplicate_nodes(nodes)
+
+        # raises when a batch could not be inserted, so that the BM25 index never
+        # holds nodes without vectors
+        self.insert_nodes(stored_nodes)
+        self.index_sparse(stored_nodes)
+        self.add_chunk_references(stored_nodes, nodes)
+
+        return len(stored_nodes)
+
+    def deduplicate_nodes(self, nodes: Sequence[BaseNode]) -> list[BaseNode]:
+        """
+        Leave out the nodes whose chunk is stored already or repeated in the batch.
+        They are only recorded as references to the stored chunk.
+        """
+        hashes = {
+            node.metadata[CONTENT_HASH_KEY]
+            for node in nodes
+            if CONTENT_HASH_KEY in node.metadata
+        }
+
+        try:
+            seen = set(self.chunk_references.stored_chunks(hashes)) if hashes else set()
+        except sqlite3.Error as e:
+            # chunks are still deduplicated within the batch
+            logger.error("org_id={}, error={}", self.org_id, e)
+            seen = set()
+
+        stored_nodes = []
+
+        for node in nodes:
+            content_hash = node.metadata.get(CONTENT_HASH_KEY)
+
+            if content_hash in seen:
+                continue
+
+            if content_hash is not None:
+                seen.add(content_hash)
+
+            stored_nodes.append(node)
+
+        if len(stored_nodes) < len(nodes):
+            logger.info(
+                "org_id={}, len(nodes)={}, duplicate_nodes={}",
+                self.org_id,
+                len(nodes),
+                len(nodes) - len(stored_nodes),
+            )
+
+        return stored_nodes
+
+    def add_chunk_references(
+        self, stored_nodes: Sequence[BaseNode], nodes: Sequence[BaseNode]
+    ) -> None:
+        """Record the node storing every new chunk, and every document containing it."""
+        hashed_nodes = [node for node in nodes if CONTENT_HASH_KEY in node.metadata]
+
+        if not hashed_nodes:
+            return
+
+        try:
+            self.chunk_references.add(
+                [
+                    (node.metadata[CONTENT_HASH_KEY], node.node_id, node.ref_doc_id)
+                    for node in stored_nodes
+                    if CONTENT_HASH_KEY in node.metadata
+                ],
+                [
+                    (node.metadata[CONTENT_HASH_KEY], node.ref_doc_id)
+                    for node in hashed_nodes
+                ],
+            )
+        except sqlite3.Error as e:
+            # the vectors are stored, the chunks are only not deduplicated
+            logger.error("org_id={}, error={}", self.org_id, e)
+
+    def index_sparse(self, nodes: Sequence[BaseNode]) -> None:
+        """Add the inserted nodes to the BM25 index."""
+        if not HYBRID_RETRIEVAL:
+            return
+
+        try:
+            self.sparse_index.add(nodes)
+        except sqlite3.Error as e:
+            # dense search still works, the sparse results are only fused in
+            logger.error("org_id={}, error={}", self.org_id, e)
+
+    def refresh_vector_index(self) -> None:
+        """
+        Rebuild the index when the collection outgrew its index type, if enabled,
+        and drop the cached vector store so the search parameters are derived again
+        from the new number of vectors.
+        """
+        vector_store = self.storage_context.vector_store
+
+        # the local store is searched exactly and reloads itself
+        if not isinstance(vector_store, MilvusVectorStore):
+            return
+
+        try:
+            if VECTOR_INDEX_AUTO_REBUILD and vector_index_policy.needs_rebuild(
+                vector_store
+            ):
+                vector_index_policy.rebuild(vector_store)
+        except MilvusException as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+
+        milvus_connection_manager.invalidate(self.org_id)
+
+    def insert_nodes(self, nodes: Sequence[BaseNode]) -> list[VectorBatchResult]:
+        """
+        Insert embedded nodes in batches of VECTOR_INSERT_BATCH_SIZE over a pool of
+        VECTOR_STORE_MAX_WORKERS threads, retrying failed batches, and flush once
+        at the end.
+        """
+        batches: list[list[NodeWithEmbedding]] = divide_list(
+            [NodeWithEmbedding(node=node, embedding=node.embedding) for node in nodes],
+            VECTOR_INSERT_BATCH_SIZE,
         )
 
+        if not batches:
+            return []
+
+        started = time.perf_counter()
+        vector_store = self.storage_context.vector_store
+        is_milvus = isinstance(vector_store, MilvusVectorStore)
+
+        # The first insert creates the collection if it doesn't exist yet,
+        # so it can't run concurrently with the others.
+        results = [self.insert_batch(0, batches[0])]
+
+        if is_milvus and vector_store.collection is None:
+            results.extend(
+                VectorBatchResult(
+                    batch=i,
+                    size=len(batch),
+                    success=False,
+                    attempts=0,
+                    error="The collection was not created",
+                )
+                for i, batch in enumerate(batches[1:], start=1)
+            )
+        else:
+            with ThreadPoolExecutor(max_workers=VECTOR_STORE_MAX_WORKERS) as executor:
+                results.extend(
+                    executor.map(
+                        self.insert_batch,
+                        range(1, len(batches)),
+                        batches[1:],
+                    )
+                )
+
+            try:
+                if is_milvus:
+                    vector_store.collection.flush()
+            except MilvusException as e:
+                logger.error("org_id={}, error={}", self.org_id, e)
+
+        elapsed = time.perf_counter() - started
+        inserted = sum(result.size for result in results if result.success)
+        failed = [result for result in results if not result.success]
+
         logger.info(
-            "Stored index to vector store. org_id={}, index_id={}",
+            "org_id={}, inserted={}, failed_batches={}, elapsed={:.2f}s, "
+            "throughput={:.1f} vectors/sec",
             self.org_id,
-            vector_index.index_id,
+            inserted,
+            len(failed),
+            elapsed,
+            inserted / elapsed if elapsed > 0 else 0,
         )
 
-    def add_nodes(self, nodes: list[NodeWithEmbedding]) -> None:
+        if failed:
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_INSERT_VECTORS,
+                message=f"Failed to insert {len(failed)} of {len(results)} batches",
+            )
+
+        return results
+
+    def insert_batch(
+        self, batch_index: int, batch: list[NodeWithEmbedding]
+    ) -> VectorBatchResult:
+        # `add` writes the serialized node into its metadata, restore it on retry
+        metadata = [dict(result.node.metadata) for result in batch]
+        error = None
+
+        for attempt in range(1, VECTOR_STORE_MAX_RETRIES + 1):
+            try:
+                if attempt > 1:
+                    # inserts aren't idempotent and a timed out one may have landed
+                    self.remove_batch(batch)
+
+                self.storage_context.vector_store.add(batch)
+
+                return VectorBatchResult(
+                    batch=batch_index, size=len(batch), success=True, attempts=attempt
+                )
+            except (MilvusException, OSError) as e:
+                logger.warning(
+                    "org_id={}, batch={}, attempt={}, error={}",
+                    self.org_id,
+                    batch_index,
+                    attempt,
+                    e,
+                )
+                error = str(e)
+
+                for result, node_metadata in zip(batch, metadata):
+                    result.node.metadata = dict(node_metadata)
+
+                if attempt < VECTOR_STORE_MAX_RETRIES:
+                    # jittered so that the batches failing together don't retry together
+                    time.sleep(
+                        random.uniform(0, min(2**attempt, VECTOR_STORE_MAX_BACKOFF))
+                    )
+
+        return VectorBatchResult(
+            batch=batch_index,
+            size=len(batch),
+            success=False,
+            attempts=VECTOR_STORE_MAX_RETRIES,
+            error=error,
+        )
+
+    def remove_batch(self, batch: list[NodeWithEmbedding]) -> None:
+        """Delete the rows of a batch by primary key, whichever of them were written."""
+        ids = [result.id for result in batch]
+        vector_store = self.storage_context.vector_store
+
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.delete_documents([], node_ids=ids)
+        elif vector_store.collection is not None:
+            vector_store.collection.delete(f"id in {json.dumps(ids)}")
+
+    def delete_nodes(self, ref_doc_ids: list[str]) -> list[VectorBatchResult]:
+        """
+        Delete the nodes of the given documents in batches of
+        VECTOR_DELETE_BATCH_SIZE ids, concurrently over VECTOR_STORE_MAX_WORKERS
+        threads. Failed batches are returned rather than raised.
+
+        Deduplicated chunks that other documents still reference are kept, and the
+        chunks stored with other documents that only these documents referenced
+        are deleted. Raises PrismDBException without deleting anything when the
+        references of a document with deduplicated chunks are missing.
+        """
         logger.info(
-            "org_id={}, nodes={}",
+            "org_id={}, len(ref_doc_ids)={}",
             self.org_id,
-            nodes,
+            len(ref_doc_ids),
         )
 
+        self.check_chunk_references(ref_doc_ids)
+        kept_node_ids, orphaned_node_ids = self.remove_chunk_references(ref_doc_ids)
+        keep_node_ids = {
+            node_id for node_ids in kept_node_ids.values() for node_id in node_ids
+        }
+
         try:
-            self.storage_context.vector_store.add(nodes)
+            self.sparse_index.delete_documents(
+                ref_doc_ids, keep_node_ids, orphaned_node_ids
+            )
+        except sqlite3.Error as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+
+        vector_store = self.storage_context.vector_store
+
+        if isinstance(vector_store, LocalVectorStore):
+            # the local store rewrites its files on delete, so only do it once
+            return [
+                self.delete_local_batch(
+                    vector_store, 0, ref_doc_ids, keep_node_ids, orphaned_node_ids
+                )
+            ]
+
+        collection: Collection = vector_store.collection
+        exprs: list[tuple[str, int]] = []
+
+        for batch in divide_list(ref_doc_ids, VECTOR_DELETE_BATCH_SIZE):
+            expr = f"doc_id in {json.dumps(batch)}"
+            kept = [
+                node_id for doc_id in batch for node_id in kept_node_ids.get(doc_id, [])
+            ]
+
+            if kept:
+                expr += f" and id not in {json.dumps(kept)}"
+
+            exprs.append((expr, len(batch)))
+
+        for batch in divide_list(sorted(orphaned_node_ids), VECTOR_DELETE_BATCH_SIZE):
+            exprs.append((f"id in {json.dumps(batch)}", len(batch)))
+
+        if collection is None or not exprs:
+            return []
+
+        with ThreadPoolExecutor(max_workers=VECTOR_STORE_MAX_WORKERS) as executor:
+            results = list(
+                executor.map(
+                    self.delete_batch,
+                    [collection] * len(exprs),
+                    range(len(exprs)),
+                    [expr for expr, _ in exprs],
+                    [size for _, size in exprs],
+                )
+            )
+
+        logger.info(
+            "org_id={}, deleted_batches={}, failed_batches={}",
+            self.org_id,
+            sum(result.success for result in results),
+            sum(not result.success for result in results),
+        )
+
+        return results
+
+    def delete_batch(
+        self, collection: Collection, batch_index: int, expr: str, size: int
+    ) -> VectorBatchResult:
+        try:
+            self.delete_by_expr(collection, self.scoped_expr(expr))
         except MilvusException as e:
             logger.error(
-                "org_id={}, nodes={}, error={}",
+                "org_id={}, batch={}, expr={}, error={}",
                 self.org_id,
-                nodes,
+                batch_index,
+                expr,
                 e,
             )
+            return VectorBatchResult(
+                batch=batch_index, size=size, success=False, error=str(e)
+            )
 
-    def delete_nodes(self, ref_doc_ids: list[str]) -> None:
-        logger.info(
-            "org_id={}, ref_doc_ids={}",
-            self.org_id,
-            ref_doc_ids,
-        )
+        return VectorBatchResult(batch=batch_index, size=size, success=True)
 
-        for ref_doc_id in ref_doc_ids:
-            try:
-                self.storage_context.vector_store.delete(ref_doc_id=ref_doc_id)
-            except MilvusException as e:
-                logger.error(
-                    "org_id={}, ref_doc_id={}, error={}",
-                    self.org_id,
-                    ref_doc_id,
-                    e,
+    def delete_local_batch(
+        self,
+        vector_store: LocalVectorStore,
+        batch_index: int,
+        ref_doc_ids: list[str],
+        keep_node_ids: set[str],
+        node_ids: set[str],
+    ) -> VectorBatchResult:
+        try:
+            vector_store.delete_documents(ref_doc_ids, keep_node_ids, node_ids)
+        except OSError as e:
+            logger.error(
+                "org_id={}, batch={}, ref_doc_ids={}, error={}",
+                self.org_id,
+                batch_index,
+                ref_doc_ids,
+                e,
+            )
+            return VectorBatchResult(
+                batch=batch_index, size=len(ref_doc_ids), success=False, error=str(e)
+            )
+
+        return VectorBatchResult(batch=batch_index, size=len(ref_doc_ids), success=True)
+
+    def check_chunk_references(self, ref_doc_ids: list[str]) -> None:
+        """
+        Make sure the references of every document with deduplicated chunks are
+        recorded, e.g. the reference directory wasn't lost with the instance that
+        ingested them. Deleting without them would remove chunks that other
+        documents rely on.
+        """
+        try:
+            doc_ids = self.deduplicated_documents(ref_doc_ids)
+            missing = doc_ids - self.chunk_references.referenced_documents(doc_ids)
+        except (MilvusException, OSError, sqlite3.Error) as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_DELETE_VECTORS,
+                message="Could not check the chunk references of the documents",
+            )
+
+        if missing:
+            logger.error(
+                "Missing chunk references. org_id={}, path={}, missing={}",
+                self.org_id,
+                self.chunk_references.path,
+                sorted(missing),
+            )
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_DELETE_VECTORS,
+                message="The chunk references of the documents are missing",
+            )
+
+    def deduplicated_documents(self, ref_doc_ids: list[str]) -> set[str]:
+        """The documents with nodes that went through chunk deduplication."""
+        vector_store = self.storage_context.vector_store
+
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.reload()
+            doc_ids = set(ref_doc_ids)
+            rows = [row for row in vector_store.rows if row["doc_id"] in doc_ids]
+        elif vector_store.collection is None:
+            return set()
+        else:
+            rows = [
+                row
+                for batch in divide_list(ref_doc_ids, VECTOR_DELETE_BATCH_SIZE)
+                for row in self.query_by_doc_ids(
+                    vector_store.collection,
+                    batch,
+                    ["doc_id", "node"],
+                    self.scoped_expr,
                 )
+            ]
+
+        return {
+            row["doc_id"]
+            for row in rows
+            if CONTENT_HASH_KEY in json.loads(row["node"]).get("metadata", {})
+        }
+
+    def remove_chunk_references(
+        self, ref_doc_ids: list[str]
+    ) -> tuple[dict[str, list[str]], set[str]]:
+        try:
+            return self.chunk_references.remove_documents(ref_doc_ids)
+        except sqlite3.Error as e:
+            # without references, shared chunks can't be told apart
+            logger.error("org_id={}, error={}", self.org_id, e)
+            raise PrismDBException(
+                code=PrismDBExceptionCode.COULD_NOT_DELETE_VECTORS,
+                message="Could not remove the chunk references of the documents",
+            )
+
+    @classmethod
+    def delete_by_expr(cls, collection: Collection, expr: str) -> None:
+        # Deletes are expressed on the primary key, so look the ids up first.
+        # A query returns at most QUERY_LIMIT rows, repeat until none are left.
+        while True:
+            entries = collection.query(
+                expr, output_fields=["id"], limit=cls.QUERY_LIMIT
+            )
+
+            if entries:
+                ids = [entry["id"] for entry in entries]
+                collection.delete(f"id in {json.dumps(ids)}")
+
+            if len(entries) < cls.QUERY_LIMIT:
+                break
+
+    @classmethod
+    def query_by_doc_ids(
+        cls,
+        collection: Collection,
+        doc_ids: list[str],
+        output_fields: list[str],
+        scope: Callable[[str], str] | None = None,
+    ) -> list[dict]:
+        """Query the rows of `doc_ids`, splitting them whenever QUERY_LIMIT is hit."""
+        expr = f"doc_id in {json.dumps(doc_ids)}"
+        rows = collection.query(
+            scope(expr) if scope else expr,
+            output_fields=output_fields,
+            limit=cls.QUERY_LIMIT,
+        )
+
+        # The query may have been truncated, query both halves separately
+        if len(rows) == cls.QUERY_LIMIT:
+            if len(doc_ids) == 1:
+                raise ValueError(f"doc_id={doc_ids[0]} has too many nodes to query")
+
+            middle = len(doc_ids) // 2
+
+            return cls.query_by_doc_ids(
+                collection, doc_ids[:middle], output_fields, scope
+            ) + cls.query_by_doc_ids(collection, doc_ids[middle:], output_fields, scope)
+
+        return rows
+
+    def scoped_expr(self, expr: str) -> str:
+        """Restrict an expression to this organization in the shared collection."""
+        vector_store = self.storage_context.vector_store
+
+        if isinstance(vector_store, SharedMilvusVectorStore):
+            return vector_store.scoped(expr)
+
+        return expr
 
     def drop_collection(self) -> None:
         logger.info(
@@ -105,9 +635,21 @@ class DataIndexingService:
             self.org_id,
         )
 
+        self.sparse_index.drop()
+        self.chunk_references.drop()
+
         try:
-            collection: Collection = self.storage_context.vector_store.collection
-            collection.drop()
+            vector_store = self.storage_context.vector_store
+
+            if isinstance(vector_store, LocalVectorStore):
+                vector_store.drop()
+            # other organizations live in the shared collection, only remove ours
+            elif isinstance(vector_store, SharedMilvusVectorStore):
+                self.delete_by_expr(vector_store.collection, vector_store.org_filter)
+            else:
+                vector_store.collection.drop()
+
+            milvus_connection_manager.invalidate(self.org_id)
         except MilvusException as e:
             logger.error(
                 "org_id={}, error={}",
@@ -123,15 +665,32 @@ class DataIndexingService:
     def load_vector_index(self) -> VectorStoreIndex:
         logger.info("org_id={}", self.org_id)
 
-        return VectorStoreIndex.from_vector_store(self.storage_context.vector_store)
+        # the retriever embeds questions with the index's service context
+        return VectorStoreIndex.from_vector_store(
+            self.storage_context.vector_store,
+            service_context=ServiceContext.from_defaults(
+                llm=None, embed_model=LangchainEmbedding(query_embedding_service)
+            ),
+        )
 
-    def generate_query_engine(self, vector_index: VectorStoreIndex) -> BaseQueryEngine:
-        logger.info("org_id={}, vector_index_id={}", self.org_id, vector_index.index_id)
+    def generate_query_engine(
+        self, vector_index: VectorStoreIndex, streaming: bool = False
+    ) -> BaseQueryEngine:
+        logger.info(
+            "org_id={}, vector_index_id={}, streaming={}",
+            self.org_id,
+            vector_index.index_id,
+            streaming,
+        )
 
-        token_counter = TokenCountingHandler(
-            tokenizer=tiktoken.encoding_for_model(DEFAULT_OPENAI_MODEL).encode,
-            verbose=True,
+        tokenizer = tiktoken.encoding_for_model(DEFAULT_OPENAI_MODEL).encode
+        token_counter = TokenCountingHandler(tokenizer=tokenizer, verbose=True)
+        # per-stage latency, token and node count histograms for /metrics
+        stage_latency_handler = StageLatencyHandler(
+            org_id=self.org_id, registry=metrics_registry, tokenizer=tokenizer
         )
+        # embed questions locally with the same model used at ingestion
+        embed_model = LangchainEmbedding(query_embedding_service)
         service_context = ServiceContext.from_defaults(
             llm=OpenAI(
                 model=DEFAULT_OPENAI_MODEL,
@@ -139,8 +698,9 @@ class DataIndexingService:
                 temperature=0.1,
                 max_retries=3,
             ),
+            embed_model=embed_model,
             chunk_size=1024,
-            callback_manager=CallbackManager([token_counter]),
+            callback_manager=CallbackManager([token_counter, stage_latency_handler]),
         )
 
         # prioritize most recent information in the results
@@ -150,21 +710,84 @@ class DataIndexingService:
         )
 
         # re-order nodes, and returns the top N nodes
-        cohere_rerank_postprocessor = CohereRerank(api_key=COHERE_API_KEY, top_n=3)
+        rerank_postprocessor = self.get_rerank_postprocessor(top_n=3)
 
-        # remove sentences that are not relevant to the query
-        sentence_embedding_postprocessor = SentenceEmbeddingOptimizer(
-            percentile_cutoff=0.7
+        # remove sentences that are not relevant to the query,
+        # using the sentence embeddings stored at ingestion
+        sentence_embedding_postprocessor = PrecomputedSentenceOptimizer(
+            embed_model=embed_model, percentile_cutoff=0.7
         )
 
-        query_engine = vector_index.as_query_engine(
-            similarity_top_k=10,
+        retriever = TimedRetriever(
+            vector_index.as_retriever(similarity_top_k=VECTOR_SEARCH_TOP_K),
+            org_id=self.org_id,
+            registry=metrics_registry,
+        )
+
+        if HYBRID_RETRIEVAL and self.has_sparse_index():
+            # exact terms like file names, codes and people are found by BM25
+            retriever = FusionRetriever(
+                [
+                    retriever,
+                    TimedRetriever(
+                        SparseRetriever(self.sparse_index, SPARSE_SEARCH_TOP_K),
+                        org_id=self.org_id,
+                        registry=metrics_registry,
+                        stage="sparse_search",
+                    ),
+                ],
+                top_k=HYBRID_RETRIEVAL_TOP_K,
+                rrf_k=RRF_K,
+            )
+
+        query_engine = RetrieverQueryEngine.from_args(
+            retriever=retriever,
             service_context=service_context,
+            # streaming responses expose a token generator instead of the full text
+            streaming=streaming,
             node_postprocessors=[
-                cohere_rerank_postprocessor,
-                fixed_recency_postprocessor,
-                sentence_embedding_postprocessor,
+                TimedNodePostprocessor(
+                    postprocessor, org_id=self.org_id, registry=metrics_registry
+                )
+                for postprocessor in [
+                    rerank_postprocessor,
+                    fixed_recency_postprocessor,
+                    sentence_embedding_postprocessor,
+                ]
             ],
         )
 
         return query_engine
+
+    def has_sparse_index(self) -> bool:
+        try:
+            is_empty = self.sparse_index.is_empty()
+        except sqlite3.Error as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+            is_empty = True
+
+        if is_empty:
+            # SPARSE_INDEX_DIR is not shared with the instance that ingested the data
+            logger.warning(
+                "Sparse index is missing or empty, retrieving with dense search only. "
+                "Run commands.build_sparse_index on this instance. org_id={}, path={}",
+                self.org_id,
+                self.sparse_index.path,
+            )
+
+        return not is_empty
+
+    def get_rerank_postprocessor(self, top_n: int) -> BaseNodePostprocessor:
+        backend = RerankerBackend(RERANKER_BACKEND)
+
+        if backend == RerankerBackend.CROSS_ENCODER:
+            # runs in-process, no network round trip on the query path
+            return CrossEncoderRerank(
+                top_n=top_n,
+                model=CROSS_ENCODER_MODEL,
+                runtime=CROSS_ENCODER_RUNTIME,
+                quantize=CROSS_ENCODER_QUANTIZE,
+                batch_size=CROSS_ENCODER_BATCH_SIZE,
+            )
+
+        return CohereRerank(api_key=COHERE_API_KEY, top_n=top_n)
@@ -1,20 +1,56 @@
 import datetime
-from collections.abc import Sequence
-from typing import IO
+import io
+import json
+import math
+import mmap
+import time
+from collections import Counter
+from collections.abc import Iterator
+from typing import IO, Any
 
 import ray
-from constants import PRISM_ENV, RAY_ADDRESS, RAY_RUNTIME_ENV
-from exceptions import PrismDBException, PrismException
+from constants import (
+    CHUNK_DEDUPLICATION,
+    DOWNLOAD_ACTORS,
+    DOWNLOAD_BATCH_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_NUM_CPUS,
+    EMBEDDING_CPU_BATCH_SIZE,
+    EMBEDDING_CPU_QUANTIZE,
+    EMBEDDING_CPU_RUNTIME,
+    EMBEDDING_CPU_THREADS,
+    EMBEDDING_EXECUTION_MODE,
+    EMBEDDING_GPU_BATCH_SIZE,
+    EMBEDDING_SINK_BATCH_SIZE,
+    EMBEDDING_SINK_OBJECT_STORE_MEMORY,
+    EMBEDDING_SINK_PREFETCH_BATCHES,
+    FAST_PARSING,
+    INGESTION_MANIFEST_DIR,
+    PARSE_NUM_CPUS,
+    PRISM_ENV,
+    RAY_ADDRESS,
+    RAY_RUNTIME_ENV,
+)
+from enums import EmbeddingExecutionMode, FileProcessingStatus
+from exceptions import PrismDBException
 from llama_index import Document
 from llama_index.node_parser import SimpleNodeParser
-from llama_index.schema import BaseNode, TextNode
+from llama_index.schema import BaseNode
 from loguru import logger
 from merge.resources.filestorage.types import File
-from ray.data import ActorPoolStrategy, Dataset, from_items
+from models import FileOutcome
+from ray.data import ActorPoolStrategy, DataContext, Dataset, from_items
 from ray.data.dataset import MaterializedDataset
-from storage import DynamoDBService, MergeService
+from storage import (
+    ChunkReferenceStore,
+    DynamoDBService,
+    IngestionManifest,
+    MergeService,
+)
+from storage.ChunkReferenceStore import CONTENT_HASH_KEY
 
 from .CustomUnstructuredReader import CustomUnstructuredReader
+from .DownloadFiles import DownloadFiles
 from .EmbedNodes import EmbedNodes
 
 
@@ -22,12 +58,12 @@ class DataPipelineService:
     def __init__(self, org_id: str, account_token: str):
         self.org_id = org_id
         self.account_token = account_token
-        self.loader = CustomUnstructuredReader()
+        self.loader = CustomUnstructuredReader(fast_parsing=FAST_PARSING)
         self.parser = SimpleNodeParser.from_defaults()
         self.dynamodb_service = DynamoDBService()
-        self.merge_service = MergeService(account_token=account_token)
         self.process_date = datetime.datetime.today().strftime("%m/%d/%Y, %H:%M:%S")
-        self.not_processed_file_ids: list[str] = []
+        self.manifest = IngestionManifest(INGESTION_MANIFEST_DIR)
+        self.manifest_path: str | None = None
 
         if not ray.is_initialized():
             logger.info("Connecting to the ray cluster. ENV={}", PRISM_ENV)
@@ -51,22 +87,131 @@ class DataPipelineService:
             else:
                 ray.init(runtime_env=RAY_RUNTIME_ENV)
 
-    def get_embedded_nodes(self, all_files: list[File]) -> Sequence[BaseNode]:
+    def get_embedded_batches(self, all_files: list[File]) -> Iterator[list[BaseNode]]:
+        """
+        Embedded nodes in batches of EMBEDDING_SINK_BATCH_SIZE, streamed out of the
+        Ray pipeline while the remaining files are still loaded and embedded. At
+        most EMBEDDING_SINK_PREFETCH_BATCHES batches wait in the driver and Ray
+        pauses the pipeline at EMBEDDING_SINK_OBJECT_STORE_MEMORY, so the driver
+        memory doesn't grow with the organization.
+        """
         logger.info(
             "org_id={}, account_token={}",
             self.org_id,
             self.account_token,
         )
 
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        outcomes: list[FileOutcome] = []
+
         loaded_docs = self.load_data(all_files)
+        nodes = self.generate_nodes(loaded_docs)
+        embedded_nodes = self.generate_embeddings(nodes)
+
+        # Backpressure of the streaming executor. The context is shared by every
+        # Ray Data job of the process, so the previous limit is put back after.
+        resource_limits = DataContext.get_current().execution_options.resource_limits
+        object_store_memory = resource_limits.object_store_memory
+        resource_limits.object_store_memory = EMBEDDING_SINK_OBJECT_STORE_MEMORY
+
+        complete = False
+
+        try:
+            # Trigger execution and pass on the embedded nodes batch by batch.
+            # Rows without a node carry the outcome of a file.
+            for batch in embedded_nodes.iter_batches(
+                batch_size=EMBEDDING_SINK_BATCH_SIZE,
+                prefetch_batches=EMBEDDING_SINK_PREFETCH_BATCHES,
+            ):
+                yield [node for node in batch["embedded_nodes"] if node is not None]
+
+                # The outcome row of a file follows its nodes, so once the consumer
+                # asks for the next batch all of the file's nodes are stored.
+                outcomes.extend(
+                    outcome for outcome in batch["outcome"] if outcome is not None
+                )
+
+            complete = True
+            logger.info(
+                "Finished generating embeddings. account_token={}", self.account_token
+            )
+        finally:
+            resource_limits.object_store_memory = object_store_memory
+            # also when the pipeline or the consumer failed, the files that got no
+            # outcome are recorded as not processed so they can be retried
+            self.record_outcomes(
+                started_at,
+                outcomes + self.unprocessed_outcomes(all_files, outcomes),
+                complete,
+            )
+
+    def get_link_id(self) -> str | None:
+        """Merge id of the integration of the account token, to name it on disk."""
+        try:
+            organization = self.dynamodb_service.get_organization(self.org_id)
+        except PrismDBException as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+            return None
+
+        return organization.link_id_map.get(self.account_token, {}).get("id")
+
+    @staticmethod
+    def unprocessed_outcomes(
+        all_files: list[File], outcomes: list[FileOutcome]
+    ) -> list[FileOutcome]:
+        """Outcomes of the files a failed run never reached."""
+        processed_file_ids = {outcome.file_id for outcome in outcomes}
+
+        return [
+            FileOutcome(
+                file_id=file.id,
+                file_name=file.name or "",
+                status=FileProcessingStatus.NOT_PROCESSED,
+                error="The run ended before the file was processed",
+                file=json.loads(file.json()),
+            )
+            for file in all_files
+            if file.id not in processed_file_ids
+        ]
+
+    def record_outcomes(
+        self,
+        started_at: datetime.datetime,
+        outcomes: list[FileOutcome],
+        complete: bool = True,
+    ) -> None:
+        """
+        Write the manifest of the run, and remove the files that were not processed
+        from the database and organization.
+        """
+        statuses = Counter(outcome.status.value for outcome in outcomes)
+        not_processed_file_ids = [
+            outcome.file_id
+            for outcome in outcomes
+            if outcome.status != FileProcessingStatus.OK
+        ]
+
+        try:
+            self.manifest_path = self.manifest.write(
+                self.org_id, self.get_link_id(), started_at, outcomes, complete
+            )
+        except OSError as e:
+            logger.error("org_id={}, error={}", self.org_id, e)
+
+        logger.info(
+            "org_id={}, statuses={}, complete={}, manifest_path={}",
+            self.org_id,
+            dict(statuses),
+            complete,
+            self.manifest_path,
+        )
 
-        # remove not processed files from the database and organization
         try:
             self.dynamodb_service.modify_organization_files(
-                org_id=self.org_id, file_ids=self.not_processed_file_ids, is_remove=True
+                org_id=self.org_id, file_ids=not_processed_file_ids, is_remove=True
             )
             self.dynamodb_service.modify_file_in_batch(
-                file_ids=self.not_processed_file_ids, is_remove=True
+                file_ids=not_processed_file_ids, is_remove=True
             )
         except PrismDBException as e:
             logger.error(
@@ -76,35 +221,64 @@ class DataPipelineService:
                 e,
             )
 
-        nodes = self.generate_nodes(loaded_docs)
-        embeddings = self.generate_embeddings(nodes)
+    @staticmethod
+    def open_content(content: IO[bytes]) -> IO[bytes] | mmap.mmap:
+        if isinstance(content, io.BytesIO):
+            return content
 
-        return embeddings
+        # spilled to the scratch directory, read the pages from the page cache
+        # instead of copying the whole file into the memory of the task
+        return mmap.mmap(content.fileno(), 0, access=mmap.ACCESS_READ)
 
-    def load_and_parse_files(
-        self, file_row: dict[str, File]
-    ) -> list[dict[str, Document]]:
-        documents = []
+    def parse_file(self, file_row: dict[str, Any]) -> list[dict[str, Any]]:
+        """
+        Parse stage of the ingestion pipeline, CPU bound. Runs in Ray tasks, so the
+        outcome of the file is returned with its document rather than kept on this
+        copy of the service.
+        """
+        outcome: FileOutcome = file_row["outcome"]
 
-        try:
-            file_in_bytes: IO[bytes] = self.merge_service.download_file(
-                file=file_row["data"], in_bytes=True
-            )
-            loaded_doc = self.loader.load_data(
-                file=file_in_bytes, split_documents=False
+        content = None
+
+        if file_row["content"] is not None:
+            content = io.BytesIO(file_row["content"])
+        elif file_row["path"] is not None:
+            content = DownloadFiles.open_handoff(file_row["path"], file_row["node_id"])
+
+        if content is None and outcome.status == FileProcessingStatus.OK:
+            # too large for the object store, download it on this machine
+            content = DownloadFiles.open_file(
+                MergeService(account_token=self.account_token), outcome
             )
-            loaded_doc[0].doc_id = file_row["data"].id
-            loaded_doc[0].metadata = {
-                "file_id": file_row["data"].id,
-                "process_date": self.process_date,
-            }
 
-            documents.extend(loaded_doc)
-        except PrismException as e:
-            logger.error("file_row={}, error={}", file_row, e)
-            self.not_processed_file_ids.append(file_row["data"].id)
+        if content is None:
+            return [{"doc": None, "outcome": outcome}]
 
-        return [{"doc": doc} for doc in documents]
+        started = time.perf_counter()
+
+        try:
+            with content, self.open_content(content) as readable:
+                loaded_doc = self.loader.load_data(
+                    file=readable,
+                    split_documents=False,
+                    extension=outcome.file_name.split(".")[-1],
+                )
+        except Exception as e:
+            # unstructured raises all kinds of errors on malformed files
+            logger.error("file_id={}, error={}", outcome.file_id, e)
+            outcome.status = FileProcessingStatus.PARSE_ERROR
+            outcome.error = str(e)
+            return [{"doc": None, "outcome": outcome}]
+        finally:
+            outcome.parse_seconds = time.perf_counter() - started
+
+        loaded_doc[0].doc_id = outcome.file_id
+        loaded_doc[0].metadata = {
+            "file_id": outcome.file_id,
+            "process_date": self.process_date,
+        }
+
+        return [{"doc": loaded_doc[0], "outcome": outcome}]
 
     def load_data(self, all_files: list[File]) -> Dataset:
         logger.info("Started loading data. account_token={}", self.account_token)
@@ -130,23 +304,66 @@ class DataPipelineService:
 
         ds: MaterializedDataset = from_items(all_items)
 
+        # Downloads wait on the network and parsing on the CPU, so they run as
+        # separate stages that Ray streams into each other and sizes independently.
+        downloaded_files = ds.map_batches(
+            DownloadFiles,
+            fn_constructor_kwargs={
+                "account_token": self.account_token,
+                "concurrency": DOWNLOAD_CONCURRENCY,
+            },
+            batch_size=DOWNLOAD_BATCH_SIZE,
+            num_cpus=DOWNLOAD_NUM_CPUS,
+            compute=ActorPoolStrategy(size=DOWNLOAD_ACTORS),
+        )
+
         # Use `flat_map` since there is a 1:N relationship.
         # Each filepath returns multiple documents.
-        loaded_docs = ds.flat_map(self.load_and_parse_files)
+        loaded_docs = downloaded_files.flat_map(
+            self.parse_file, num_cpus=PARSE_NUM_CPUS
+        )
         logger.info("Finished loading data. account_token=", self.account_token)
 
         return loaded_docs
 
     def convert_documents_into_nodes(
-        self, documents: dict[str, Document]
-    ) -> list[dict[str, TextNode]]:
+        self, documents: dict[str, Any]
+    ) -> list[dict[str, Any]]:
         # Convert the loaded documents into llama_index Nodes.
         # This will split the documents into chunks.
 
-        document = documents["doc"]
-        nodes = self.parser.get_nodes_from_documents([document], show_progress=True)
+        document: Document | None = documents["doc"]
+        outcome: FileOutcome = documents["outcome"]
+
+        if document is None:
+            return [{"node": None, "outcome": outcome}]
 
-        return [{"node": node} for node in nodes]
+        started = time.perf_counter()
+
+        try:
+            nodes = self.parser.get_nodes_from_documents([document], show_progress=True)
+        except Exception as e:
+            logger.error("file_id={}, error={}", outcome.file_id, e)
+            outcome.status = FileProcessingStatus.PARSE_ERROR
+            outcome.error = str(e)
+            return [{"node": None, "outcome": outcome}]
+        finally:
+            outcome.parse_seconds += time.perf_counter() - started
+
+        if CHUNK_DEDUPLICATION:
+            for node in nodes:
+                node.metadata[CONTENT_HASH_KEY] = ChunkReferenceStore.content_hash(
+                    node.text
+                )
+                node.excluded_llm_metadata_keys.append(CONTENT_HASH_KEY)
+                node.excluded_embed_metadata_keys.append(CONTENT_HASH_KEY)
+
+        outcome.nodes = len(nodes)
+
+        # the outcome of the file follows its nodes in a row of its own
+        return [{"node": node, "outcome": None} for node in nodes] + [
+            {"node": None, "outcome": outcome}
+        ]
 
     def generate_nodes(self, loaded_docs: Dataset) -> Dataset:
         logger.info("Started generating nodes. account_token={}", self.account_token)
@@ -157,37 +374,75 @@ class DataPipelineService:
 
         return nodes
 
-    def generate_embeddings(self, nodes: Dataset) -> Sequence[BaseNode]:
+    def embedding_resources(self) -> dict:
         """
-        Use `map_batches` to specify a batch size to maximize GPU utilization.
-        We define `EmbedNodes` as a class instead of a function
-        so we only initialize the embedding model once.
+        `map_batches` arguments of the embedding actors for the resources of the
+        cluster. GPU mode runs one actor per GPU. CPU mode leaves the cores of the
+        download actors and of a parse task free, and runs one actor per
+        EMBEDDING_CPU_THREADS of the other cores, so actors don't compete for cores
+        and throughput grows with the cluster.
         """
+        resources = ray.cluster_resources()
+        num_gpus = int(resources.get("GPU", 0))
+        mode = EmbeddingExecutionMode(EMBEDDING_EXECUTION_MODE)
 
-        logger.info(
-            "Started generating embeddings. account_token={}", self.account_token
-        )
+        if mode == EmbeddingExecutionMode.AUTO:
+            mode = (
+                EmbeddingExecutionMode.GPU if num_gpus else EmbeddingExecutionMode.CPU
+            )
 
-        # This state can be reused for multiple batches.
-        embedded_nodes = nodes.map_batches(
-            EmbedNodes,
-            batch_size=100,
-            # Use 1 GPU per actor.
-            num_gpus=1,
-            # There are 2 GPUs in the cluster. Each actor uses 1 GPU. So we want 2 total actors.
-            compute=ActorPoolStrategy(size=2),
-        )
+        if mode == EmbeddingExecutionMode.GPU:
+            logger.info("org_id={}, mode={}, actors={}", self.org_id, mode, num_gpus)
+
+            return {
+                "fn_constructor_kwargs": {
+                    "device": "cuda",
+                    "batch_size": EMBEDDING_GPU_BATCH_SIZE,
+                },
+                "batch_size": EMBEDDING_GPU_BATCH_SIZE,
+                # Use 1 GPU per actor.
+                "num_gpus": 1,
+                "compute": ActorPoolStrategy(size=max(num_gpus, 1)),
+            }
 
-        # Trigger execution and collect all the embedded nodes.
-        embeddings = []
+        num_cpus = max(
+            int(resources.get("CPU", 1))
+            - math.ceil(DOWNLOAD_ACTORS * DOWNLOAD_NUM_CPUS + PARSE_NUM_CPUS),
+            1,
+        )
+        num_threads = min(EMBEDDING_CPU_THREADS, num_cpus)
+        num_actors = num_cpus // num_threads
+        logger.info(
+            "org_id={}, mode={}, actors={}, threads={}",
+            self.org_id,
+            mode,
+            num_actors,
+            num_threads,
+        )
 
-        for row in embedded_nodes.iter_rows():
-            node = row["embedded_nodes"]
-            assert node.embedding is not None
-            embeddings.append(node)
+        return {
+            "fn_constructor_kwargs": {
+                "device": "cpu",
+                "runtime": EMBEDDING_CPU_RUNTIME,
+                "quantize": EMBEDDING_CPU_QUANTIZE,
+                "num_threads": num_threads,
+                "batch_size": EMBEDDING_CPU_BATCH_SIZE,
+            },
+            "batch_size": EMBEDDING_CPU_BATCH_SIZE,
+            "num_cpus": num_threads,
+            "compute": ActorPoolStrategy(size=num_actors),
+        }
+
+    def generate_embeddings(self, nodes: Dataset) -> Dataset:
+        """
+        Use `map_batches` to specify a batch size to maximize GPU or CPU utilization.
+        We define `EmbedNodes` as a class instead of a function
+        so we only initialize the embedding model once.
+        """
 
         logger.info(
-            "Finished generating embeddings. account_token={}", self.account_token
+            "Started generating embeddings. account_token={}", self.account_token
         )
 
-        return embeddings
+        # This state can be reused for multiple batches.
+        return nodes.map_batches(EmbedNodes, **self.embedding_resources())
@@ -2,6 +2,7 @@ import datetime
 from collections.abc import Sequence
 from typing import IO
 
+from constants import FAST_PARSING
 from exceptions import PrismDBException, PrismException
 from llama_index import Document
 from llama_index.node_parser import SimpleNodeParser
@@ -17,7 +18,7 @@ class DataPipelineServiceLocal:
     def __init__(self, org_id: str, account_token: str):
         self.org_id = org_id
         self.account_token = account_token
-        self.loader = CustomUnstructuredReader()
+        self.loader = CustomUnstructuredReader(fast_parsing=FAST_PARSING)
         self.parser = SimpleNodeParser.from_defaults()
         self.dynamodb_service = DynamoDBService()
         self.merge_service = MergeService(account_token=account_token)
@@ -68,9 +69,12 @@ class DataPipelineServiceLocal:
             file_in_bytes: IO[bytes] = self.merge_service.download_file(
                 file=file_row["data"], in_bytes=True
             )
-            loaded_doc = self.loader.load_data(
-                file=file_in_bytes, split_documents=False
-            )
+            with file_in_bytes:
+                loaded_doc = self.loader.load_data(
+                    file=file_in_bytes,
+                    split_documents=False,
+                    extension=file_row["data"].name.split(".")[-1],
+                )
             loaded_doc[0].doc_id = file_row["data"].id
             loaded_doc[0].metadata = {
                 "file_id": file_row["data"].id,
@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO
+
+import ray
+from constants import DOWNLOAD_SPILL_SIZE
+from enums import FileProcessingStatus
+from exceptions import PrismMergeException, PrismMergeExceptionCode
+from loguru import logger
+from merge.resources.filestorage.types import File
+from models import FileOutcome
+from storage import MergeService
+
+
+class DownloadFiles:
+    """
+    Download stage of the ingestion pipeline.
+
+    Downloads are bound by the network, so every actor downloads the files of a
+    batch over `concurrency` threads on a fraction of a core. The number of open
+    connections to Merge is bounded by actors times threads, and the cores are left
+    to the parse stage.
+
+    Files larger than DOWNLOAD_SPILL_SIZE are returned without content, so that they
+    never sit in the object store or in the memory of this actor. The ones that
+    turned out larger while downloading are handed over as a file of the scratch
+    directory with the id of this machine, and the others are downloaded by the parse
+    task.
+    """
+
+    def __init__(self, account_token: str, concurrency: int):
+        self.merge_service = MergeService(account_token=account_token)
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="prism-download"
+        )
+
+    def __call__(self, file_batch: dict[str, list[File]]) -> dict[str, list]:
+        results = list(self.executor.map(self.download, file_batch["data"]))
+
+        return {
+            "content": [content for content, _, _ in results],
+            "path": [path for _, path, _ in results],
+            "node_id": [ray.get_runtime_context().get_node_id()] * len(results),
+            "outcome": [outcome for _, _, outcome in results],
+        }
+
+    def download(self, file: File) -> tuple[bytes | None, str | None, FileOutcome]:
+        outcome = FileOutcome(
+            file_id=file.id,
+            file_name=file.name or "",
+            status=FileProcessingStatus.OK,
+            file=json.loads(file.json()),
+        )
+
+        if file.size is not None and file.size > DOWNLOAD_SPILL_SIZE:
+            return None, None, outcome
+
+        content = self.open_file(self.merge_service, outcome)
+
+        if content is None:
+            return None, None, outcome
+
+        with content:
+            if isinstance(content, io.BytesIO):
+                return content.getvalue(), None, outcome
+
+            # larger than Merge reported and spilled already, hand the file over
+            try:
+                path = self.merge_service.scratch_directory.keep(content)
+            except OSError as e:
+                logger.error("file_id={}, error={}", file.id, e)
+                return None, None, outcome
+
+            return None, path, outcome
+
+    @staticmethod
+    def open_handoff(path: str, node_id: str) -> IO[bytes] | None:
+        """
+        Open a file handed over by a download actor, if it is on this machine. It is
+        removed right away and disappears once closed.
+        """
+        if node_id != ray.get_runtime_context().get_node_id():
+            # swept from the other machine's scratch directory once it's stale
+            logger.info("Handed over file is on another machine. path={}", path)
+            return None
+
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+        os.remove(path)
+
+        return file
+
+    @staticmethod
+    def open_file(
+        merge_service: MergeService, outcome: FileOutcome
+    ) -> IO[bytes] | None:
+        """
+        Download the file of the outcome, recording the time taken and the failure if
+        any. The returned file object is removed from the scratch directory when
+        closed.
+        """
+        started = time.perf_counter()
+
+        try:
+            return merge_service.download_file(
+                file=File.parse_obj(outcome.file), in_bytes=True
+            )
+        except PrismMergeException as e:
+            logger.error("file_id={}, error={}", outcome.file_id, e)
+            outcome.status = (
+                FileProcessingStatus.UNSUPPORTED
+                if e.code == PrismMergeExceptionCode.FILE_TYPE_NOT_SUPPORTED
+                else FileProcessingStatus.DOWNLOAD_ERROR
+            )
+            outcome.error = e.message
+            return None
+        finally:
+            outcome.download_seconds += time.perf_counter() - started
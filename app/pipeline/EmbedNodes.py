@@ -1,31 +1,204 @@
+import sqlite3
+
+import numpy as np
+from constants import (
+    EMBEDDING_CACHE,
+    EMBEDDING_CACHE_MAX_ROWS,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MODEL_NAME,
+    SENTENCE_EMBEDDINGS_MAX_SIZE,
+)
+from langchain.embeddings.base import Embeddings
 from langchain.embeddings.huggingface import HuggingFaceEmbeddings
-from llama_index.schema import TextNode
+from llama_index.schema import MetadataMode, TextNode
+from loguru import logger
+from storage import EmbeddingCache
+
+from .OnnxEmbeddings import OnnxEmbeddings
+from .PrecomputedSentenceOptimizer import (
+    SENTENCE_EMBEDDINGS_KEY,
+    encode_sentence_embeddings,
+    get_sentence_tokenizer,
+)
+
+
+def load_embedding_model(
+    device: str, runtime: str, quantize: bool, num_threads: int, batch_size: int
+) -> Embeddings:
+    """
+    The gte model on a GPU, or on CPUs with `num_threads` threads, either exported to
+    ONNX or in torch, optionally with dynamic int8 quantization of the linear layers.
+    """
+    logger.info(
+        "Loading embedding model. model_name={}, device={}, runtime={}, quantize={}",
+        EMBEDDING_MODEL_NAME,
+        device,
+        runtime,
+        quantize,
+    )
+
+    if device == "cpu":
+        import torch
+
+        torch.set_num_threads(num_threads)
+
+        if runtime == "onnx":
+            return OnnxEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                quantize=quantize,
+                num_threads=num_threads,
+                batch_size=batch_size,
+            )
+
+        if runtime != "torch":
+            raise ValueError(f"Unsupported embedding runtime: {runtime}")
+
+    embedding_model = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": device},
+        encode_kwargs={"device": device, "batch_size": batch_size},
+    )
+
+    if device == "cpu" and quantize:
+        embedding_model.client = torch.quantization.quantize_dynamic(
+            embedding_model.client, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    return embedding_model
 
 
 class EmbedNodes:
     """https://huggingface.co/spaces/mteb/leaderboard"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        device: str = "cuda",
+        runtime: str = "torch",
+        quantize: bool = False,
+        num_threads: int = 1,
+        batch_size: int = 100,
+    ):
         """
-        Use GPU for embedding and specify a large enough batch size to maximize GPU utilization.
-        Remove the "device": "cuda" to use CPU instead.
+        On a GPU, specify a large enough batch size to maximize GPU utilization.
+        On CPUs, every actor runs the model with `num_threads` threads.
         """
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/gte-large",
-            model_kwargs={"device": "cuda"},
-            encode_kwargs={"device": "cuda", "batch_size": 100},
+        self.embedding_model = load_embedding_model(
+            device, runtime, quantize, num_threads, batch_size
+        )
+        self.sentence_tokenizer = get_sentence_tokenizer()
+        # int8 and ONNX vectors differ slightly from the full precision torch ones,
+        # so every runtime and precision keeps its own entries. GPUs always run the
+        # full precision torch model.
+        cache_runtime = runtime if device == "cpu" else "torch"
+        precision = "int8" if device == "cpu" and quantize else "fp32"
+        self.embedding_cache = (
+            EmbeddingCache(
+                EMBEDDING_CACHE_PATH,
+                f"{EMBEDDING_MODEL_NAME}:{cache_runtime}:{precision}",
+                EMBEDDING_CACHE_MAX_ROWS,
+            )
+            if EMBEDDING_CACHE
+            else None
         )
 
-    def __call__(
-        self, node_batch: dict[str, list[TextNode]]
-    ) -> dict[str, list[TextNode]]:
-        nodes = node_batch["node"]
+    def __call__(self, node_batch: dict[str, list]) -> dict[str, list]:
+        # rows without a node carry the outcome of a file, pass them through
+        nodes: list[TextNode] = [
+            node for node in node_batch["node"] if node is not None
+        ]
+
+        if nodes:
+            self.embed_nodes(nodes)
+
+        return {
+            "embedded_nodes": list(node_batch["node"]),
+            "outcome": list(node_batch["outcome"]),
+        }
+
+    def embed_nodes(self, nodes: list[TextNode]) -> None:
         text = [node.text for node in nodes]
-        embeddings = self.embedding_model.embed_documents(text)
+        embeddings = self.embed(text)
 
         assert len(nodes) == len(embeddings)
 
         for node, embedding in zip(nodes, embeddings):
             node.embedding = embedding
 
-        return {"embedded_nodes": nodes}
+        self.add_sentence_embeddings(nodes)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed the texts, running the model only once for every distinct text that is
+        not in the embedding cache, and caching the new embeddings.
+        """
+        if self.embedding_cache is None:
+            return self.embedding_model.embed_documents(texts)
+
+        try:
+            cached = self.embedding_cache.get(texts)
+        except sqlite3.Error as e:
+            logger.error("error={}", e)
+            cached = [None] * len(texts)
+
+        missing = list(
+            dict.fromkeys(
+                text for text, embedding in zip(texts, cached) if embedding is None
+            )
+        )
+        computed = (
+            dict(zip(missing, self.embedding_model.embed_documents(missing)))
+            if missing
+            else {}
+        )
+
+        try:
+            self.embedding_cache.put(list(computed), list(computed.values()))
+        except sqlite3.Error as e:
+            logger.error("error={}", e)
+
+        logger.info(
+            "texts={}, cached={}, embedded={}",
+            len(texts),
+            sum(embedding is not None for embedding in cached),
+            len(missing),
+        )
+
+        return [
+            computed[text] if embedding is None else embedding.tolist()
+            for text, embedding in zip(texts, cached)
+        ]
+
+    def add_sentence_embeddings(self, nodes: list[TextNode]) -> None:
+        """
+        Embed the sentences of every node once here, so that the query time
+        optimizer only needs a dot product. Sentences are split the same way as in
+        PrecomputedSentenceOptimizer, from the LLM content of the node.
+        """
+        splits = [
+            self.sentence_tokenizer(node.get_content(metadata_mode=MetadataMode.LLM))
+            for node in nodes
+        ]
+        sentences = [sentence for split in splits for sentence in split]
+
+        if not sentences:
+            return
+
+        embeddings = np.asarray(self.embed(sentences), dtype=np.float32)
+        offset = 0
+
+        for node, split in zip(nodes, splits):
+            node_embeddings = embeddings[offset : offset + len(split)]
+            offset += len(split)
+
+            if not split:
+                continue
+
+            payload = encode_sentence_embeddings(node_embeddings)
+
+            # too many sentences, the optimizer embeds this node at query time
+            if len(payload) > SENTENCE_EMBEDDINGS_MAX_SIZE:
+                continue
+
+            node.metadata[SENTENCE_EMBEDDINGS_KEY] = payload
+            node.excluded_llm_metadata_keys.append(SENTENCE_EMBEDDINGS_KEY)
+            node.excluded_embed_metadata_keys.append(SENTENCE_EMBEDDINGS_KEY)
@@ -0,0 +1,40 @@
+from llama_index import ServiceContext
+from llama_index.indices.base_retriever import BaseRetriever
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import NodeWithScore
+
+
+class FusionRetriever(BaseRetriever):
+    """
+    Fuses the results of several retrievers with reciprocal rank fusion.
+
+    A node scores the sum of 1 / (rrf_k + rank) over the result lists it appears in,
+    so nodes found by both dense and BM25 search rank first without having to
+    compare their scores. The first retriever provides the service context, which
+    embeds the question.
+    """
+
+    def __init__(self, retrievers: list[BaseRetriever], top_k: int, rrf_k: int = 60):
+        self._retrievers = retrievers
+        self._top_k = top_k
+        self._rrf_k = rrf_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        scores: dict[str, float] = {}
+        nodes: dict[str, NodeWithScore] = {}
+
+        for retriever in self._retrievers:
+            for rank, node in enumerate(retriever.retrieve(query_bundle), start=1):
+                node_id = node.node.node_id
+                scores[node_id] = scores.get(node_id, 0.0) + 1 / (self._rrf_k + rank)
+                nodes.setdefault(node_id, node)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[: self._top_k]
+
+        return [
+            NodeWithScore(node=nodes[node_id].node, score=scores[node_id])
+            for node_id in ranked
+        ]
+
+    def get_service_context(self) -> ServiceContext | None:
+        return self._retrievers[0].get_service_context()
@@ -0,0 +1,88 @@
+"""
+Sentence embeddings executed by onnxruntime on CPU
+
+Exposes the langchain Embeddings API of HuggingFaceEmbeddings, with the mean pooling
+of the gte models, so that EmbedNodes can swap it in on machines without GPUs.
+"""
+import tempfile
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str,
+        quantize: bool,
+        num_threads: int,
+        batch_size: int,
+        max_length: int = 512,
+    ):
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                "Cannot import optimum, please `pip install optimum[onnxruntime]`."
+            )
+
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        # one actor per group of cores, so keep onnxruntime within its share
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        session_options.inter_op_num_threads = 1
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_name, export=True, session_options=session_options
+        )
+
+        if quantize:
+            from optimum.onnxruntime import ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+            # dynamic int8 quantization of the exported graph
+            save_dir = tempfile.mkdtemp(prefix="prism-embeddings-")
+            quantizer = ORTQuantizer.from_pretrained(self.model)
+            quantizer.quantize(
+                save_dir=save_dir,
+                quantization_config=AutoQuantizationConfig.avx2(
+                    is_static=False, per_channel=False
+                ),
+            )
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                save_dir,
+                file_name="model_quantized.onnx",
+                session_options=session_options,
+            )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # same preprocessing as HuggingFaceEmbeddings
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = []
+
+        for i in range(0, len(texts), self.batch_size):
+            features = self.tokenizer(
+                texts[i : i + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            token_embeddings = np.asarray(self.model(**features).last_hidden_state)
+
+            # mean pooling over the tokens that are not padding
+            mask = features["attention_mask"][:, :, None].astype(np.float32)
+            embeddings.append(
+                (token_embeddings * mask).sum(axis=1)
+                / np.maximum(mask.sum(axis=1), 1e-9)
+            )
+
+        return np.concatenate(embeddings).tolist() if embeddings else []
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,160 @@
+"""
+Sentence pruning with sentence embeddings computed at ingestion
+
+Same behaviour as SentenceEmbeddingOptimizer, but the sentence embeddings are read
+from the node metadata, where EmbedNodes stores them, instead of being embedded on
+every query. Nodes without stored embeddings fall back to the embed model.
+"""
+import base64
+import os
+from collections.abc import Callable
+
+import numpy as np
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.indices.postprocessor.types import BaseNodePostprocessor
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import BaseNode, MetadataMode, NodeWithScore
+from loguru import logger
+
+SENTENCE_EMBEDDINGS_KEY = "sentence_embeddings"
+
+
+def get_sentence_tokenizer() -> Callable[[str], list[str]]:
+    """The punkt tokenizer SentenceEmbeddingOptimizer splits sentences with."""
+    import nltk.data
+    from llama_index.utils import get_cache_dir
+
+    nltk_data_dir = os.environ.get("NLTK_DATA", get_cache_dir())
+
+    if nltk_data_dir not in nltk.data.path:
+        nltk.data.path.append(nltk_data_dir)
+
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt", download_dir=nltk_data_dir)
+
+    return nltk.data.load("tokenizers/punkt/english.pickle").tokenize
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def encode_sentence_embeddings(embeddings: np.ndarray) -> str:
+    """
+    Pack unit-normalized sentence embeddings as 4-bit integers with a float16 scale
+    per sentence, so that a whole node fits in the Milvus node field.
+    Layout: uint16 count, uint16 dim, float16 scales, packed nibbles.
+    """
+    count, dim = embeddings.shape
+    embeddings = normalize(embeddings.astype(np.float32))
+    scales = np.abs(embeddings).max(axis=1, keepdims=True) / 7
+    scales[scales == 0] = 1
+    quantized = (np.rint(embeddings / scales) + 8).astype(np.uint8)
+
+    if dim % 2:
+        quantized = np.pad(quantized, ((0, 0), (0, 1)), constant_values=8)
+
+    packed = (quantized[:, 0::2] << 4) | quantized[:, 1::2]
+    data = (
+        np.array([count, dim], dtype=np.uint16).tobytes()
+        + scales.astype(np.float16).tobytes()
+        + packed.tobytes()
+    )
+
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_sentence_embeddings(payload: str) -> np.ndarray:
+    data = base64.b64decode(payload)
+    count, dim = (int(i) for i in np.frombuffer(data, dtype=np.uint16, count=2))
+    scales = np.frombuffer(data, dtype=np.float16, count=count, offset=4)
+    packed = np.frombuffer(
+        data, dtype=np.uint8, count=count * ((dim + 1) // 2), offset=4 + 2 * count
+    ).reshape(count, -1)
+
+    quantized = np.empty((count, packed.shape[1] * 2), dtype=np.float32)
+    quantized[:, 0::2] = packed >> 4
+    quantized[:, 1::2] = packed & 0x0F
+
+    return (quantized[:, :dim] - 8) * scales.astype(np.float32)[:, None]
+
+
+class PrecomputedSentenceOptimizer(BaseNodePostprocessor):
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        percentile_cutoff: float | None = None,
+        threshold_cutoff: float | None = None,
+        tokenizer_fn: Callable[[str], list[str]] | None = None,
+    ):
+        self._embed_model = embed_model
+        self._percentile_cutoff = percentile_cutoff
+        self._threshold_cutoff = threshold_cutoff
+        self._tokenizer_fn = tokenizer_fn or get_sentence_tokenizer()
+
+    def postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if query_bundle is None:
+            return nodes
+
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+
+        query_embedding = normalize(
+            np.asarray(query_bundle.embedding, dtype=np.float32)
+        )
+
+        for node_with_score in nodes:
+            node = node_with_score.node
+            split_text = self._tokenizer_fn(
+                node.get_content(metadata_mode=MetadataMode.LLM)
+            )
+
+            if not split_text:
+                continue
+
+            # cosine similarity of every sentence at once
+            similarities = self.get_sentence_embeddings(node, split_text) @ (
+                query_embedding
+            )
+            top_idxs = np.argsort(-similarities, kind="stable")
+
+            if self._threshold_cutoff is not None:
+                top_idxs = top_idxs[similarities[top_idxs] > self._threshold_cutoff]
+
+            if self._percentile_cutoff is not None:
+                num_top_k = int(len(split_text) * self._percentile_cutoff)
+
+                if num_top_k:
+                    top_idxs = top_idxs[:num_top_k]
+
+            if len(top_idxs) == 0:
+                raise ValueError("Optimizer returned zero sentences.")
+
+            node.set_content(" ".join(split_text[idx] for idx in top_idxs))
+
+        return nodes
+
+    def get_sentence_embeddings(self, node: BaseNode, split_text: list[str]):
+        payload = node.metadata.get(SENTENCE_EMBEDDINGS_KEY)
+
+        if payload:
+            try:
+                embeddings = decode_sentence_embeddings(payload)
+
+                if len(embeddings) == len(split_text):
+                    return normalize(embeddings)
+            except ValueError as e:
+                logger.warning("node_id={}, error={}", node.node_id, e)
+
+        embeddings = self._embed_model._get_text_embeddings(split_text)
+
+        return normalize(np.asarray(embeddings, dtype=np.float32))
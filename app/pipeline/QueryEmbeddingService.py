@@ -0,0 +1,185 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from constants import (
+    EMBEDDING_MODEL_NAME,
+    QUERY_EMBEDDING_BATCH_SIZE,
+    QUERY_EMBEDDING_BATCH_WAIT,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_DEVICE,
+)
+from langchain.embeddings.base import Embeddings
+from loguru import logger
+
+
+class QueryEmbeddingService(Embeddings):
+    """
+    Shared in-process query embedding service.
+
+    Uses the same model and encode settings as EmbedNodes so that query and document
+    vectors live in the same space. Queries submitted at the same time are encoded
+    together by a background worker, and recent query embeddings are kept in an
+    LRU cache.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str,
+        batch_size: int,
+        batch_wait: float,
+        cache_size: int,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, list[float]] = OrderedDict()
+        self.requests: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self.model = None
+        self.worker: threading.Thread | None = None
+        self.lock = threading.Lock()
+        self.model_lock = threading.Lock()
+
+    def load(self):
+        with self.model_lock:
+            if self.model is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(
+                    "Loading query embedding model. model_name={}, device={}",
+                    self.model_name,
+                    self.device,
+                )
+                self.model = SentenceTransformer(self.model_name, device=self.device)
+
+        return self.model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = self.load().encode(texts, batch_size=self.batch_size)
+
+        return embeddings.tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed_documents, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def submit(self, text: str) -> Future:
+        text = text.replace("\n", " ")
+        future = Future()
+
+        with self.lock:
+            embedding = self.cache.get(text)
+
+            if embedding is not None:
+                self.cache.move_to_end(text)
+                future.set_result(list(embedding))
+                return future
+
+            # start the worker, or start it again if a batch killed it
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(
+                    target=self.run, name="prism-query-embedding", daemon=True
+                )
+                self.worker.start()
+
+        self.requests.put((text, future))
+
+        return future
+
+    def run(self) -> None:
+        while True:
+            batch = self.collect_batch()
+
+            try:
+                self.encode_batch(batch)
+            except Exception as e:
+                logger.exception("len(batch)={}, error={}", len(batch), e)
+
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def collect_batch(self) -> list[tuple[str, Future]]:
+        """
+        Wait for the first query, then briefly collect the ones arriving with it.
+        Queries cancelled meanwhile, e.g. by a cancelled question, are dropped, and
+        the others can't be cancelled anymore.
+        """
+        batch = []
+        deadline = None
+
+        while len(batch) < self.batch_size:
+            try:
+                if deadline is None:
+                    request = self.requests.get()
+                else:
+                    timeout = deadline - time.monotonic()
+
+                    if timeout <= 0:
+                        break
+
+                    request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if deadline is None:
+                deadline = time.monotonic() + self.batch_wait
+
+            if request[1].set_running_or_notify_cancel():
+                batch.append(request)
+
+        return batch
+
+    def encode_batch(self, batch: list[tuple[str, Future]]) -> None:
+        if not batch:
+            return
+
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            embeddings = self.load().encode(texts, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error("len(texts)={}, error={}", len(texts), e)
+
+            for _, future in batch:
+                future.set_exception(e)
+
+            return
+
+        text_to_embedding = {
+            text: embedding.tolist() for text, embedding in zip(texts, embeddings)
+        }
+
+        with self.lock:
+            self.cache.update(text_to_embedding)
+
+            for text in texts:
+                self.cache.move_to_end(text)
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        for text, future in batch:
+            future.set_result(list(text_to_embedding[text]))
+
+
+query_embedding_service = QueryEmbeddingService(
+    model_name=EMBEDDING_MODEL_NAME,
+    device=QUERY_EMBEDDING_DEVICE,
+    batch_size=QUERY_EMBEDDING_BATCH_SIZE,
+    batch_wait=QUERY_EMBEDDING_BATCH_WAIT,
+    cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+)
@@ -0,0 +1,20 @@
+from llama_index.indices.base_retriever import BaseRetriever
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import NodeWithScore
+from storage import SparseIndex
+
+
+class SparseRetriever(BaseRetriever):
+    """Retrieves the `similarity_top_k` best BM25 matches of the question."""
+
+    def __init__(self, sparse_index: SparseIndex, similarity_top_k: int):
+        self._sparse_index = sparse_index
+        self._similarity_top_k = similarity_top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        return [
+            NodeWithScore(node=node, score=score)
+            for node, score in self._sparse_index.search(
+                query_bundle.query_str, self._similarity_top_k
+            )
+        ]
@@ -1,5 +1,20 @@
+from .CrossEncoderRerank import CrossEncoderRerank
 from .DataIndexingService import DataIndexingService
 from .DataPipelineService import DataPipelineService
 from .DataPipelineServiceLocal import DataPipelineServiceLocal
+from .FusionRetriever import FusionRetriever
+from .PrecomputedSentenceOptimizer import PrecomputedSentenceOptimizer
+from .QueryEmbeddingService import QueryEmbeddingService, query_embedding_service
+from .SparseRetriever import SparseRetriever
 
-__all__ = ["DataIndexingService", "DataPipelineService", "DataPipelineServiceLocal"]
+__all__ = [
+    "CrossEncoderRerank",
+    "DataIndexingService",
+    "DataPipelineService",
+    "DataPipelineServiceLocal",
+    "FusionRetriever",
+    "PrecomputedSentenceOptimizer",
+    "QueryEmbeddingService",
+    "query_embedding_service",
+    "SparseRetriever",
+]
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import re
+import sqlite3
+import unicodedata
+from collections.abc import Iterable
+
+from utils import divide_list
+
+# Metadata key holding the content hash of a node
+CONTENT_HASH_KEY = "content_hash"
+
+# SQLite limits the number of variables in a statement
+QUERY_BATCH_SIZE = 500
+
+
+class ChunkReferenceStore:
+    """
+    Deduplicated chunks of one organization, kept in SQLite.
+
+    A chunk whose normalized text was seen before is not embedded or stored again.
+    `chunks` maps every content hash to the node holding its vector and the document
+    that node was stored with, and `refs` records every document containing it, so
+    deletes only remove a vector once no document references it and sources resolve
+    to every file with the chunk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash TEXT PRIMARY KEY, node_id TEXT, doc_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                hash TEXT, doc_id TEXT, PRIMARY KEY (hash, doc_id)
+            );
+            CREATE INDEX IF NOT EXISTS refs_doc_id ON refs (doc_id);
+            """
+        )
+
+        return connection
+
+    @staticmethod
+    def select(
+        connection: sqlite3.Connection, query: str, values: Iterable[str]
+    ) -> list[tuple]:
+        """Run `query`, which has one `IN ({})` clause, over batches of values."""
+        rows = []
+
+        for batch in divide_list(list(values), QUERY_BATCH_SIZE):
+            rows.extend(
+                connection.execute(
+                    query.format(", ".join("?" * len(batch))), batch
+                ).fetchall()
+            )
+
+        return rows
+
+    def stored_chunks(self, hashes: Iterable[str]) -> dict[str, str]:
+        """Node ids of the hashes that already have a stored vector."""
+        if not os.path.exists(self.path):
+            return {}
+
+        with self.connect() as connection:
+            rows = self.select(
+                connection,
+                "SELECT hash, node_id FROM chunks WHERE hash IN ({})",
+                hashes,
+            )
+
+        connection.close()
+
+        return dict(rows)
+
+    def add(
+        self,
+        chunks: Iterable[tuple[str, str, str]],
+        refs: Iterable[tuple[str, str]],
+    ) -> None:
+        """
+        Record stored chunks as (hash, node_id, doc_id) and the documents containing
+        them as (hash, doc_id). The first node stored for a hash is kept.
+        """
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO chunks (hash, node_id, doc_id) VALUES (?, ?, ?)",
+                chunks,
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO refs (hash, doc_id) VALUES (?, ?)", refs
+            )
+
+        connection.close()
+
+    def remove_documents(
+        self, doc_ids: list[str]
+    ) -> tuple[dict[str, list[str]], set[str]]:
+        """
+        Remove the references of the documents. Returns the nodes stored with each of
+        the documents that other documents still reference, and the node ids no
+        document references anymore.
+        """
+        if not os.path.exists(self.path):
+            return {}, set()
+
+        with self.connect() as connection:
+            hashes = {
+                row[0]
+                for row in self.select(
+                    connection, "SELECT hash FROM refs WHERE doc_id IN ({})", doc_ids
+                )
+            }
+            self.select(connection, "DELETE FROM refs WHERE doc_id IN ({})", doc_ids)
+
+            referenced = {
+                row[0]
+                for row in self.select(
+                    connection,
+                    "SELECT DISTINCT hash FROM refs WHERE hash IN ({})",
+                    hashes,
+                )
+            }
+            kept = self.select(
+                connection,
+                "SELECT doc_id, node_id FROM chunks WHERE hash IN ({})",
+                referenced,
+            )
+            orphaned = self.select(
+                connection,
+                "SELECT node_id FROM chunks WHERE hash IN ({})",
+                hashes - referenced,
+            )
+            self.select(
+                connection, "DELETE FROM chunks WHERE hash IN ({})", hashes - referenced
+            )
+
+        connection.close()
+        kept_node_ids: dict[str, list[str]] = {}
+
+        for doc_id, node_id in kept:
+            kept_node_ids.setdefault(doc_id, []).append(node_id)
+
+        return kept_node_ids, {row[0] for row in orphaned}
+
+    def referenced_documents(self, doc_ids: Iterable[str]) -> set[str]:
+        """The documents that have references recorded."""
+        if not os.path.exists(self.path):
+            return set()
+
+        with self.connect() as connection:
+            rows = self.select(
+                connection,
+                "SELECT DISTINCT doc_id FROM refs WHERE doc_id IN ({})",
+                doc_ids,
+            )
+
+        connection.close()
+
+        return {row[0] for row in rows}
+
+    def documents(self, hashes: Iterable[str]) -> dict[str, list[str]]:
+        """Every document containing each of the chunks."""
+        if not os.path.exists(self.path):
+            return {}
+
+        with self.connect() as connection:
+            rows = self.select(
+                connection, "SELECT hash, doc_id FROM refs WHERE hash IN ({})", hashes
+            )
+
+        connection.close()
+        documents: dict[str, list[str]] = {}
+
+        for content_hash, doc_id in rows:
+            documents.setdefault(content_hash, []).append(doc_id)
+
+        return documents
+
+    def drop(self) -> None:
+        for suffix in ["", "-wal", "-shm"]:
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
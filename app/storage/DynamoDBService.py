@@ -26,7 +26,7 @@ from models import (
     to_user_model,
     to_whitelist_model,
 )
-from utils import serialize
+from utils import deserialize, serialize
 
 from .MergeService import MergeService
 
@@ -203,6 +203,7 @@ class DynamoDBService:
             "invited_user_list": {"L": []},
             "link_id_map": {"M": {}},
             "document_list": {"L": []},
+            "index_version": {"N": "0"},
             "created_at": {"S": timestamp},
             "updated_at": {"S": timestamp},
         }
@@ -221,6 +222,45 @@ class DynamoDBService:
             e.message = "Could not find organization"
             raise
 
+    def get_index_version(self, org_id: str) -> int:
+        """Read only the index version of the organization, not the whole item."""
+        response = self.client.get_item(
+            Key=get_organization_key(org_id),
+            TableName=DYNAMODB_ORGANIZATION_TABLE,
+            ProjectionExpression="index_version",
+        )
+
+        if "Item" not in response:
+            raise PrismDBException(
+                code=PrismDBExceptionCode.ITEM_DOES_NOT_EXIST,
+                message="Could not find organization",
+            )
+
+        return int(deserialize(response["Item"]).get("index_version", 0))
+
+    def bump_index_version(self, org_id: str) -> None:
+        """
+        Tell every API process that the documents, vectors or index of the
+        organization changed, so that their cached query engines and answers are
+        dropped. Updated in place, since it runs concurrently with the other writes.
+        """
+        logger.info("org_id={}", org_id)
+
+        try:
+            self.client.update_item(
+                TableName=DYNAMODB_ORGANIZATION_TABLE,
+                Key=get_organization_key(org_id),
+                UpdateExpression="ADD index_version :one",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeValues={":one": {"N": "1"}},
+            )
+        except ClientError as e:
+            logger.error("org_id={}, error={}", org_id, str(e))
+            raise PrismDBException(
+                code=PrismDBExceptionCode.ITEM_UPDATE_ERROR,
+                message="Could not update the index version",
+            )
+
     def remove_organization(self, org_id: str, org_admin_id: str) -> dict:
         key = get_organization_key(org_id)
 
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import sqlite3
+from collections.abc import Sequence
+
+import numpy as np
+from utils import divide_list
+
+from .ChunkReferenceStore import QUERY_BATCH_SIZE
+
+
+class EmbeddingCache:
+    """
+    Embeddings of texts already seen by a model, kept in SQLite.
+
+    Rows are keyed by the model name and the sha256 of the exact text, so that a
+    re-synced file only runs the model for the chunks and sentences that changed.
+    Vectors are stored as float32 bytes. Once the cache holds more than `max_rows`
+    rows the oldest inserted ones are removed. Every call opens its own connection,
+    so the actors of one machine can share the file.
+    """
+
+    def __init__(self, path: str, model_name: str, max_rows: int):
+        self.path = path
+        self.model_name = model_name
+        self.max_rows = max_rows
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT, hash TEXT, embedding BLOB, UNIQUE (model, hash)
+            );
+            """
+        )
+
+        return connection
+
+    def get(self, texts: Sequence[str]) -> list[np.ndarray | None]:
+        """Cached embedding of every text, None for the ones not cached."""
+        if not texts or not os.path.exists(self.path):
+            return [None] * len(texts)
+
+        hashes = [self.text_hash(text) for text in texts]
+        found: dict[str, np.ndarray] = {}
+
+        with self.connect() as connection:
+            for batch in divide_list(list(set(hashes)), QUERY_BATCH_SIZE):
+                rows = connection.execute(
+                    "SELECT hash, embedding FROM embeddings WHERE model = ? AND hash "
+                    f"IN ({', '.join('?' * len(batch))})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                found.update(
+                    (text_hash, np.frombuffer(embedding, dtype=np.float32))
+                    for text_hash, embedding in rows
+                )
+
+        connection.close()
+
+        return [found.get(text_hash) for text_hash in hashes]
+
+    def put(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        if not texts:
+            return
+
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, embedding) "
+                "VALUES (?, ?, ?)",
+                [
+                    (
+                        self.model_name,
+                        self.text_hash(text),
+                        np.asarray(embedding, dtype=np.float32).tobytes(),
+                    )
+                    for text, embedding in zip(texts, embeddings)
+                ],
+            )
+            connection.execute(
+                "DELETE FROM embeddings WHERE rowid <= "
+                "(SELECT MAX(rowid) FROM embeddings) - ?",
+                (self.max_rows,),
+            )
+
+        connection.close()
@@ -0,0 +1,66 @@
+import numpy as np
+from enums import EmbeddingQuantization
+
+# Bytes of the float32 scale appended to every int8 row
+SCALE_SIZE = 4
+# Rows converted to float32 at a time when scoring quantized rows
+SCORE_BLOCK_SIZE = 2048
+
+
+def storage_dtype(quantization: EmbeddingQuantization) -> np.dtype:
+    if quantization == EmbeddingQuantization.INT8:
+        return np.dtype(np.int8)
+
+    if quantization == EmbeddingQuantization.FLOAT16:
+        return np.dtype(np.float16)
+
+    return np.dtype(np.float32)
+
+
+def row_width(dim: int, dtype: np.dtype) -> int:
+    return dim + SCALE_SIZE if dtype == np.int8 else dim
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric scalar quantization with one scale per vector."""
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales[scales == 0] = 1
+
+    codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+
+    return codes, scales.astype(np.float32)
+
+
+def encode_rows(embeddings: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """
+    Rows as stored in a `dtype` matrix. int8 rows end with the bytes of their float32
+    scale, so codes and scales are written, grown and compacted together.
+    """
+    if dtype == np.int8:
+        codes, scales = quantize_int8(embeddings)
+        return np.concatenate([codes, scales[:, None].view(np.int8)], axis=1)
+
+    return embeddings.astype(dtype)
+
+
+def score_rows(rows: np.ndarray, embedding: np.ndarray) -> np.ndarray:
+    """Inner products of stored rows with a float32 query embedding."""
+    if rows.dtype == np.float32:
+        return np.asarray(rows) @ embedding
+
+    codes = rows[:, :-SCALE_SIZE] if rows.dtype == np.int8 else rows
+    scores = np.empty(len(rows), dtype=np.float32)
+    buffer = np.empty((min(SCORE_BLOCK_SIZE, len(rows)), codes.shape[1]), np.float32)
+
+    # NumPy has no fast int8 or float16 matmul. Converting a block at a time into
+    # a buffer that stays in cache is several times faster than converting at once.
+    for start in range(0, len(rows), SCORE_BLOCK_SIZE):
+        block = codes[start : start + SCORE_BLOCK_SIZE]
+        np.copyto(buffer[: len(block)], block, casting="unsafe")
+        scores[start : start + len(block)] = buffer[: len(block)] @ embedding
+
+    if rows.dtype == np.int8:
+        scales = np.ascontiguousarray(rows[:, -SCALE_SIZE:]).view(np.float32)[:, 0]
+        scores *= scales
+
+    return scores
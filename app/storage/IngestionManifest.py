@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from enums import FileProcessingStatus
+from merge.resources.filestorage.types import File
+from models import FileOutcome
+
+# Outcomes worth processing again, an unsupported file fails the same way every time
+RETRYABLE_STATUSES = [
+    FileProcessingStatus.DOWNLOAD_ERROR,
+    FileProcessingStatus.PARSE_ERROR,
+    FileProcessingStatus.NOT_PROCESSED,
+]
+
+
+class IngestionManifest:
+    """
+    Outcome of every file of an ingestion run, kept as JSON files.
+
+    Every run of an organization writes `{directory}/{org_id}/{started_at}.json` with
+    the Merge id of the integration and one FileOutcome per file, so that the failed
+    files of a run can be processed again without processing the whole organization.
+    A run that failed partway is written with `complete` false, and the files it
+    never reached as NOT_PROCESSED.
+    The account token is never written, it stays in the organization's integration.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def write(
+        self,
+        org_id: str,
+        link_id: str | None,
+        started_at: datetime,
+        outcomes: list[FileOutcome],
+        complete: bool = True,
+    ) -> str:
+        path = os.path.join(
+            self.directory, org_id, f"{started_at.strftime('%Y%m%dT%H%M%S%fZ')}.json"
+        )
+        manifest = {
+            "org_id": org_id,
+            "link_id": link_id,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "complete": complete,
+            "outcomes": [json.loads(outcome.json()) for outcome in outcomes],
+        }
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(manifest, f)
+
+        os.replace(f"{path}.tmp", path)
+
+        return path
+
+    def latest(self, org_id: str) -> str | None:
+        try:
+            names = sorted(
+                name
+                for name in os.listdir(os.path.join(self.directory, org_id))
+                if name.endswith(".json")
+            )
+        except FileNotFoundError:
+            return None
+
+        return os.path.join(self.directory, org_id, names[-1]) if names else None
+
+    @staticmethod
+    def load(path: str) -> tuple[dict, list[FileOutcome]]:
+        with open(path) as f:
+            manifest = json.load(f)
+
+        return manifest, [
+            FileOutcome.parse_obj(outcome) for outcome in manifest["outcomes"]
+        ]
+
+    @staticmethod
+    def failed_files(outcomes: list[FileOutcome]) -> list[File]:
+        return [
+            File.parse_obj(outcome.file)
+            for outcome in outcomes
+            if outcome.status in RETRYABLE_STATUSES
+        ]
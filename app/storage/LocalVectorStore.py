@@ -0,0 +1,312 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import numpy as np
+from llama_index.schema import MetadataMode
+from llama_index.vector_stores.types import (
+    NodeWithEmbedding,
+    VectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from loguru import logger
+
+from .EmbeddingQuantizer import encode_rows, row_width, score_rows
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store of one organization, searched exactly with NumPy.
+
+    Embeddings live in a memory-mapped `vectors.npy` matrix of `dtype` rows, float32,
+    float16 or int8 with a scale per row (see EmbeddingQuantizer), and the
+    id, doc_id, text and serialized node of every row in a `rows.jsonl` sidecar.
+    `meta.json` records how many rows and sidecar bytes are valid and is replaced
+    last, so a write interrupted half way is ignored on the next load.
+    Writes hold an exclusive lock on the directory, and every instance reloads when
+    `meta.json` changed, so API and ingestion processes on the same machine can share
+    a directory. Scores are inner products, like the Milvus collections.
+    """
+
+    stores_text: bool = True
+    stores_node: bool = True
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.lock = threading.RLock()
+        self.vectors: np.memmap | None = None
+        self.doc_ids = np.array([], dtype=object)
+        self.rows: list[dict] = []
+        self.meta: dict = {}
+        self.meta_stat: tuple[int, int, int] | None = None
+
+        os.makedirs(self.path, exist_ok=True)
+        self.reload()
+
+    @property
+    def client(self) -> Any:
+        return self
+
+    @property
+    def count(self) -> int:
+        return self.meta.get("count", 0)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] - row_width(0, self.vectors.dtype)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        with self.lock, open(self.file("lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                self.reload()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reload(self) -> None:
+        """Load the matrix and sidecar again if another writer changed them."""
+        try:
+            stat = os.stat(self.file("meta.json"))
+        except FileNotFoundError:
+            return
+
+        meta_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            if meta_stat == self.meta_stat:
+                return
+
+            with open(self.file("meta.json")) as f:
+                meta = json.load(f)
+
+            rows = []
+
+            with open(self.file("rows.jsonl"), "rb") as f:
+                for line in f.read(meta["rows_size"]).splitlines():
+                    rows.append(json.loads(line))
+
+            self.vectors = np.load(self.file("vectors.npy"), mmap_mode="r+")
+            self.rows = rows
+            self.doc_ids = np.array([row["doc_id"] for row in rows], dtype=object)
+            self.meta = meta
+            self.meta_stat = meta_stat
+
+    def write_meta(self, count: int, rows_size: int) -> None:
+        meta = {
+            "count": count,
+            "rows_size": rows_size,
+            "dim": self.dim,
+            "dtype": self.vectors.dtype.name,
+            "version": self.meta.get("version", 0) + 1,
+        }
+
+        with open(self.file("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+
+        os.replace(self.file("meta.json.tmp"), self.file("meta.json"))
+        stat = os.stat(self.file("meta.json"))
+        self.meta = meta
+        self.meta_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def reserve(self, capacity: int, dim: int) -> None:
+        if self.vectors is not None and self.vectors.shape[0] >= capacity:
+            return
+
+        current = 0 if self.vectors is None else self.vectors.shape[0]
+        capacity = max(capacity, 2 * current, 1024)
+        vectors = np.lib.format.open_memmap(
+            self.file("vectors.npy.tmp"),
+            mode="w+",
+            dtype=self.vectors.dtype if self.vectors is not None else self.dtype,
+            shape=(capacity, dim),
+        )
+
+        if self.count:
+            vectors[: self.count] = self.vectors[: self.count]
+
+        vectors.flush()
+        os.replace(self.file("vectors.npy.tmp"), self.file("vectors.npy"))
+        self.vectors = vectors
+
+    def add(self, embedding_results: list[NodeWithEmbedding]) -> list[str]:
+        if len(embedding_results) == 0:
+            return []
+
+        embeddings = np.array(
+            [result.embedding for result in embedding_results], dtype=np.float32
+        )
+        rows = []
+
+        for result in embedding_results:
+            # Store node without text
+            metadata = node_to_metadata_dict(result.node, remove_text=True)
+            rows.append(
+                {
+                    "id": result.id,
+                    "doc_id": result.ref_doc_id,
+                    "text": result.node.get_content(metadata_mode=MetadataMode.NONE),
+                    "node": metadata["_node_content"],
+                }
+            )
+
+        with self.write_lock():
+            count = self.count
+
+            if self.vectors is not None and self.dim != embeddings.shape[1]:
+                raise ValueError(
+                    f"Expected {self.dim} dimensions, got {embeddings.shape[1]}"
+                )
+
+            # an existing matrix keeps the precision it was created with
+            encoded = encode_rows(
+                embeddings, self.dtype if self.vectors is None else self.vectors.dtype
+            )
+            self.reserve(count + len(rows), encoded.shape[1])
+            self.vectors[count : count + len(rows)] = encoded
+            self.vectors.flush()
+
+            with open(self.file("rows.jsonl"), "ab") as f:
+                # drop rows of an interrupted write
+                f.truncate(self.meta.get("rows_size", 0))
+                f.seek(0, os.SEEK_END)
+                f.write(b"".join(json.dumps(row).encode() + b"\n" for row in rows))
+                rows_size = f.tell()
+
+            self.write_meta(count + len(rows), rows_size)
+            self.rows = self.rows + rows
+            self.doc_ids = np.concatenate(
+                [self.doc_ids, np.array([row["doc_id"] for row in rows], dtype=object)]
+            )
+
+        return [row["id"] for row in rows]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self.delete_documents([ref_doc_id])
+
+    def delete_documents(
+        self,
+        ref_doc_ids: list[str],
+        keep_node_ids: Collection[str] = frozenset(),
+        node_ids: Collection[str] = (),
+    ) -> int:
+        """
+        Remove the rows of the given documents except `keep_node_ids`, and the rows of
+        `node_ids`, rewriting the remaining ones.
+        """
+        with self.write_lock():
+            if self.count == 0:
+                return 0
+
+            ref_doc_ids = set(ref_doc_ids)
+            node_ids = set(node_ids)
+            keep = np.array(
+                [
+                    row["id"] not in node_ids
+                    and (doc_id not in ref_doc_ids or row["id"] in keep_node_ids)
+                    for row, doc_id in zip(self.rows, self.doc_ids)
+                ],
+                dtype=bool,
+            )
+            deleted = int(len(keep) - keep.sum())
+
+            if deleted == 0:
+                return 0
+
+            remaining = self.vectors[: self.count][keep]
+            vectors = np.lib.format.open_memmap(
+                self.file("vectors.npy.tmp"),
+                mode="w+",
+                dtype=self.vectors.dtype,
+                shape=(max(len(remaining), 1), self.vectors.shape[1]),
+            )
+            vectors[: len(remaining)] = remaining
+            vectors.flush()
+
+            with open(self.file("rows.jsonl.tmp"), "wb") as f:
+                f.write(
+                    b"".join(
+                        json.dumps(row).encode() + b"\n"
+                        for row, kept in zip(self.rows, keep)
+                        if kept
+                    )
+                )
+                rows_size = f.tell()
+
+            os.replace(self.file("vectors.npy.tmp"), self.file("vectors.npy"))
+            os.replace(self.file("rows.jsonl.tmp"), self.file("rows.jsonl"))
+            self.vectors = vectors
+            self.write_meta(len(remaining), rows_size)
+            self.rows = [row for row, kept in zip(self.rows, keep) if kept]
+            self.doc_ids = self.doc_ids[keep]
+
+        logger.info("path={}, deleted={}", self.path, deleted)
+
+        return deleted
+
+    def drop(self) -> None:
+        with self.lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.vectors = None
+            self.doc_ids = np.array([], dtype=object)
+            self.rows = []
+            self.meta = {}
+            self.meta_stat = None
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"LocalVectorStore does not support {query.mode} yet.")
+
+        if query.filters is not None:
+            raise ValueError("Metadata filters not implemented for LocalVectorStore.")
+
+        self.reload()
+
+        with self.lock:
+            count = self.count
+            vectors = self.vectors
+            rows = self.rows
+            doc_ids = self.doc_ids
+
+        if count == 0 or query.similarity_top_k == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        scores = score_rows(
+            vectors[:count], np.asarray(query.query_embedding, dtype=np.float32)
+        )
+
+        if query.doc_ids:
+            query_doc_ids = set(query.doc_ids)
+            scores[[doc_id not in query_doc_ids for doc_id in doc_ids]] = -np.inf
+
+        top_k = min(query.similarity_top_k, count)
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+
+        nodes = []
+
+        for i in top:
+            node = metadata_dict_to_node({"_node_content": rows[i]["node"]})
+            node.text = rows[i]["text"]
+            nodes.append(node)
+
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=scores[top].tolist(),
+            ids=[rows[i]["id"] for i in top],
+        )
@@ -1,9 +1,15 @@
-import io
 import time
 import uuid
 from typing import IO
 
-from constants import MERGE_API_KEY, SUPPORTED_EXTENSIONS
+from constants import (
+    DOWNLOAD_SCRATCH_DIR,
+    DOWNLOAD_SCRATCH_MAX_AGE,
+    DOWNLOAD_SCRATCH_QUOTA,
+    DOWNLOAD_SPILL_SIZE,
+    MERGE_API_KEY,
+    SUPPORTED_EXTENSIONS,
+)
 from exceptions import PrismMergeException, PrismMergeExceptionCode
 from loguru import logger
 from merge.client import Merge
@@ -17,6 +23,8 @@ from merge.resources.filestorage.types import (
     SyncStatusStatusEnum,
 )
 
+from .ScratchDirectory import ScratchDirectory
+
 
 class MergeService:
     """https://github.com/merge-api/merge-python-client"""
@@ -24,6 +32,7 @@ class MergeService:
     def __init__(self, account_token: str | None = None):
         self.account_token = account_token
         self.client = Merge(api_key=MERGE_API_KEY, account_token=account_token)
+        self.scratch_directory: ScratchDirectory | None = None
 
     def generate_link_token(self, org_id: str, org_name: str, org_email: str) -> str:
         logger.info("org_id={}, org_name={}, org_email={}", org_id, org_name, org_email)
@@ -247,6 +256,12 @@ class MergeService:
     def download_file(
         self, file: File, in_bytes: bool | None = False
     ) -> IO[bytes] | str:
+        """
+        Stream the file from Merge. With `in_bytes` returns a file object that holds
+        files up to DOWNLOAD_SPILL_SIZE bytes in memory and larger ones in the scratch
+        directory, removed when it is closed. Otherwise writes the file to the scratch
+        directory and returns its path, which the caller removes.
+        """
         logger.info(
             "file_id={}, file_name={}, in_bytes={}", file.id, file.name, in_bytes
         )
@@ -267,8 +282,22 @@ class MergeService:
                 message="File type not supported",
             )
 
+        if self.scratch_directory is None:
+            self.scratch_directory = ScratchDirectory(
+                path=DOWNLOAD_SCRATCH_DIR,
+                quota=DOWNLOAD_SCRATCH_QUOTA,
+                max_age=DOWNLOAD_SCRATCH_MAX_AGE,
+            )
+
+        # the chunks are fetched while iterating, so connection errors and a full
+        # scratch directory surface in the writes
         try:
             chunks = self.client.filestorage.files.download_retrieve(id=file.id)
+
+            if in_bytes:
+                return self.scratch_directory.spool(chunks, DOWNLOAD_SPILL_SIZE)
+
+            return self.scratch_directory.write(chunks)
         except Exception as e:
             logger.error(
                 "account_token={}, file_id={}, error={}",
@@ -281,18 +310,6 @@ class MergeService:
                 message="Could not download file",
             )
 
-        if in_bytes:
-            response = b"".join(chunks)
-            return io.BytesIO(response)
-
-        tmp_uuid = str(uuid.uuid4())
-
-        with open(tmp_uuid, "wb") as f:
-            for chunk in chunks:
-                f.write(chunk)
-
-        return tmp_uuid
-
     def remove_integration(self) -> None:
         try:
             self.client.filestorage.delete_account.delete()
@@ -0,0 +1,137 @@
+import errno
+import io
+import itertools
+import os
+import tempfile
+import time
+import uuid
+from collections.abc import Iterable
+from typing import IO
+
+from loguru import logger
+
+# Bytes written to a spilled file between two scans of the directory's usage
+QUOTA_CHECK_BYTES = 8 * 1024 * 1024
+
+
+class ScratchDirectory:
+    """
+    Local directory that downloads too large to keep in memory are written to.
+
+    The files of every process on the machine count towards `quota` bytes, and a
+    write that would exceed it fails with EDQUOT instead of filling the disk.
+    Spooled files are removed when closed, and files left behind by crashed
+    processes are removed once they are older than `max_age` seconds.
+    """
+
+    def __init__(self, path: str, quota: int, max_age: int):
+        self.path = path
+        self.quota = quota
+        self.max_age = max_age
+
+        os.makedirs(self.path, exist_ok=True)
+        self.sweep()
+
+    def usage(self) -> int:
+        usage = 0
+
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                try:
+                    usage += entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+
+        return usage
+
+    def sweep(self) -> None:
+        now = time.time()
+
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                try:
+                    if now - entry.stat().st_mtime > self.max_age:
+                        os.remove(entry.path)
+                        logger.info("Removed stale scratch file. path={}", entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def write_chunks(self, chunks: Iterable[bytes], file: IO[bytes]) -> None:
+        """
+        Write the chunks to a new file of the directory, checking the quota before
+        every write. The usage of the other files is scanned again every
+        QUOTA_CHECK_BYTES, since the other processes write meanwhile.
+        """
+        other_usage = self.usage()
+        written = 0
+        unchecked = 0
+
+        for chunk in chunks:
+            if unchecked >= QUOTA_CHECK_BYTES:
+                file.flush()
+                other_usage = self.usage() - written
+                unchecked = 0
+
+            if other_usage + written + len(chunk) > self.quota:
+                raise OSError(
+                    errno.EDQUOT, f"Scratch directory quota exceeded: {self.path}"
+                )
+
+            file.write(chunk)
+            written += len(chunk)
+            unchecked += len(chunk)
+
+    def spool(self, chunks: Iterable[bytes], spill_size: int) -> IO[bytes]:
+        """
+        Collect the chunks in memory up to `spill_size` bytes, and in a file of the
+        directory beyond that. The returned file is at position 0 and is removed
+        when closed.
+        """
+        chunks = iter(chunks)
+        buffer = io.BytesIO()
+
+        for chunk in chunks:
+            buffer.write(chunk)
+
+            if buffer.tell() > spill_size:
+                break
+        else:
+            buffer.seek(0)
+            return buffer
+
+        file = tempfile.NamedTemporaryFile(dir=self.path, prefix="spool-")
+
+        try:
+            # what was kept in memory counts towards the quota like the rest
+            self.write_chunks(itertools.chain([buffer.getvalue()], chunks), file)
+            buffer.close()
+            file.flush()
+            file.seek(0)
+        except BaseException:
+            file.close()
+            raise
+
+        return file
+
+    def keep(self, file: IO[bytes]) -> str:
+        """
+        Give a spooled file a name of its own that outlives closing it, to hand it to
+        another process of the machine. Returns its path.
+        """
+        path = os.path.join(self.path, f"handoff-{uuid.uuid4()}")
+        os.link(file.name, path)
+
+        return path
+
+    def write(self, chunks: Iterable[bytes]) -> str:
+        """Write the chunks to a new file of the directory and return its path."""
+        path = os.path.join(self.path, f"download-{uuid.uuid4()}")
+
+        try:
+            with open(path, "wb") as f:
+                self.write_chunks(chunks, f)
+        except BaseException:
+            os.remove(path)
+            raise
+
+        return path
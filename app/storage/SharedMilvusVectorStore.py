@@ -0,0 +1,174 @@
+import json
+from typing import Any
+
+from llama_index.schema import MetadataMode
+from llama_index.vector_stores import MilvusVectorStore
+from llama_index.vector_stores.types import (
+    NodeWithEmbedding,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from loguru import logger
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema
+
+
+class SharedMilvusVectorStore(MilvusVectorStore):
+    """
+    MilvusVectorStore scoped to one organization inside a collection shared by all
+    organizations. Rows carry an `org_id` partition key, so Milvus hashes every
+    organization into one of `num_partitions` partitions, and every search, query
+    and delete is filtered by it.
+    """
+
+    def __init__(self, org_id: str, num_partitions: int, **kwargs: Any):
+        self.org_id = org_id
+        self.num_partitions = num_partitions
+
+        super().__init__(**kwargs)
+
+    @property
+    def org_filter(self) -> str:
+        return f"org_id == {json.dumps(self.org_id)}"
+
+    def scoped(self, expr: str) -> str:
+        return f"{self.org_filter} and ({expr})"
+
+    def _create_collection(self) -> None:
+        fields = [
+            FieldSchema(
+                name="id",
+                dtype=DataType.VARCHAR,
+                description="Unique ID",
+                is_primary=True,
+                auto_id=False,
+                max_length=65535,
+            ),
+            FieldSchema(
+                name=self.doc_id_field,
+                dtype=DataType.VARCHAR,
+                description="Source document ID",
+                max_length=65535,
+            ),
+            FieldSchema(
+                name=self.text_field,
+                dtype=DataType.VARCHAR,
+                description="The embedding vector",
+                max_length=65535,
+            ),
+            FieldSchema(
+                name=self.embedding_field,
+                dtype=DataType.FLOAT_VECTOR,
+                description="The embedding vector",
+                dim=self.dim,
+            ),
+            FieldSchema(
+                name="node",
+                dtype=DataType.VARCHAR,
+                description="The node content",
+                max_length=65535,
+            ),
+            FieldSchema(
+                name="org_id",
+                dtype=DataType.VARCHAR,
+                description="Organization ID",
+                max_length=256,
+                is_partition_key=True,
+            ),
+        ]
+
+        self.collection = Collection(
+            self.collection_name,
+            CollectionSchema(fields=fields),
+            using=self.alias,
+            consistency_level=self.consistency_level,
+            num_partitions=self.num_partitions,
+        )
+        logger.info(
+            "Created shared collection. collection_name={}, num_partitions={}",
+            self.collection_name,
+            self.num_partitions,
+        )
+
+    def add(self, embedding_results: list[NodeWithEmbedding]) -> list[str]:
+        if len(embedding_results) == 0:
+            return []
+
+        if self.collection is None:
+            self.dim = len(embedding_results[0].embedding)
+            self._create_collection()
+            self._create_index()
+            self.collection.load()
+
+        ids = []
+        doc_ids = []
+        texts = []
+        embeddings = []
+        nodes = []
+
+        for result in embedding_results:
+            ids.append(result.id)
+            doc_ids.append(result.ref_doc_id)
+            texts.append(result.node.get_content(metadata_mode=MetadataMode.NONE))
+            embeddings.append(result.embedding)
+
+            # Store node without text
+            metadata = node_to_metadata_dict(result.node, remove_text=True)
+            nodes.append(metadata["_node_content"])
+
+        self.collection.insert(
+            [ids, doc_ids, texts, embeddings, nodes, [self.org_id] * len(ids)]
+        )
+
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        if self.collection is None:
+            return
+
+        entries = self.collection.query(
+            self.scoped(f"{self.doc_id_field} in {json.dumps([ref_doc_id])}"),
+            output_fields=["id"],
+        )
+
+        if entries:
+            ids = [entry["id"] for entry in entries]
+            self.collection.delete(f"id in {json.dumps(ids)}")
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if self.collection is None:
+            raise ValueError("Milvus instance not initialized.")
+
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Milvus does not support {query.mode} yet.")
+
+        if query.filters is not None:
+            raise ValueError("Metadata filters not implemented for Milvus yet.")
+
+        expr = self.org_filter
+
+        if query.doc_ids:
+            expr = self.scoped(f"{self.doc_id_field} in {json.dumps(query.doc_ids)}")
+
+        res = self.collection.search(
+            [query.query_embedding],
+            self.embedding_field,
+            self.search_params,
+            limit=query.similarity_top_k,
+            output_fields=[self.doc_id_field, self.text_field, "node"],
+            expr=expr,
+        )
+
+        nodes = []
+        similarities = []
+        ids = []
+
+        for hit in res[0]:
+            node = metadata_dict_to_node({"_node_content": hit.entity.get("node")})
+            node.text = hit.entity.get(self.text_field)
+            nodes.append(node)
+            similarities.append(hit.score)
+            ids.append(hit.id)
+
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
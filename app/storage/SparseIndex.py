@@ -0,0 +1,207 @@
+import json
+import os
+import re
+import sqlite3
+from collections.abc import Collection, Iterable, Sequence
+
+from llama_index.schema import BaseNode, MetadataMode, TextNode
+from llama_index.vector_stores.utils import metadata_dict_to_node
+from loguru import logger
+
+# Words too common to narrow down a BM25 search
+STOPWORDS = set(
+    "a an and are as at be but by can did do does for from had has have how i in "
+    "into is it its me my of on or our so than that the their them there these they "
+    "this to was we were what when where which who whom why will with would you your".split()
+)
+# Keys the vector stores write into the metadata of the nodes they insert
+VECTOR_STORE_METADATA_KEYS = {
+    "_node_content",
+    "_node_type",
+    "doc_id",
+    "document_id",
+    "ref_doc_id",
+}
+
+
+class SparseIndex:
+    """
+    BM25 inverted index of one organization's nodes, kept in an SQLite FTS5 table.
+
+    Nodes are stored with their text and serialized node, like the Milvus `node`
+    field, so that search results can be returned without the vector store.
+    `node_rows` maps node and document ids to FTS rows for upserts and deletes.
+    Every call opens its own connection, and WAL lets searches run during writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS nodes USING fts5(
+                text, node UNINDEXED, tokenize='porter unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS node_rows (
+                rowid INTEGER PRIMARY KEY, node_id TEXT UNIQUE, doc_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS node_rows_doc_id ON node_rows (doc_id);
+            """
+        )
+
+        return connection
+
+    @staticmethod
+    def serialize(node: BaseNode) -> str:
+        # same content as node_to_metadata_dict, without mutating the node metadata
+        # and without what the vector store added to it when the node was inserted
+        node_dict = node.dict()
+        node_dict["text"] = ""
+        node_dict["embedding"] = None
+        node_dict["metadata"] = {
+            key: value
+            for key, value in node_dict["metadata"].items()
+            if key not in VECTOR_STORE_METADATA_KEYS
+        }
+
+        return json.dumps(node_dict)
+
+    @staticmethod
+    def to_match_query(query: str) -> str:
+        terms = [
+            term
+            for term in dict.fromkeys(re.findall(r"\w+", query.lower()))
+            if len(term) > 1 and term not in STOPWORDS
+        ]
+
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def add(self, nodes: Sequence[BaseNode]) -> None:
+        if not nodes:
+            return
+
+        with self.connect() as connection:
+            self.delete_rows(
+                connection,
+                self.select_rows(
+                    connection,
+                    "SELECT rowid, node_id FROM node_rows WHERE node_id = ?",
+                    [node.node_id for node in nodes],
+                ),
+            )
+
+            for node in nodes:
+                rowid = connection.execute(
+                    "INSERT INTO node_rows (node_id, doc_id) VALUES (?, ?)",
+                    (node.node_id, node.ref_doc_id),
+                ).lastrowid
+                connection.execute(
+                    "INSERT INTO nodes (rowid, text, node) VALUES (?, ?, ?)",
+                    (
+                        rowid,
+                        node.get_content(metadata_mode=MetadataMode.NONE),
+                        self.serialize(node),
+                    ),
+                )
+
+        connection.close()
+
+    def delete_documents(
+        self,
+        ref_doc_ids: list[str],
+        keep_node_ids: Collection[str] = frozenset(),
+        node_ids: Collection[str] = (),
+    ) -> None:
+        """
+        Delete the nodes of the documents except `keep_node_ids`, which other documents
+        still reference, and the nodes of `node_ids`.
+        """
+        with self.connect() as connection:
+            rows = self.select_rows(
+                connection,
+                "SELECT rowid, node_id FROM node_rows WHERE doc_id = ?",
+                ref_doc_ids,
+            )
+            rows = [row for row in rows if row[1] not in keep_node_ids]
+            rows += self.select_rows(
+                connection,
+                "SELECT rowid, node_id FROM node_rows WHERE node_id = ?",
+                node_ids,
+            )
+            self.delete_rows(connection, rows)
+
+        connection.close()
+
+    @staticmethod
+    def select_rows(
+        connection: sqlite3.Connection, select: str, values: Iterable[str]
+    ) -> list[tuple[int, str]]:
+        return [
+            row
+            for value in values
+            for row in connection.execute(select, (value,)).fetchall()
+        ]
+
+    @staticmethod
+    def delete_rows(
+        connection: sqlite3.Connection, rows: list[tuple[int, str]]
+    ) -> None:
+        rowids = [(rowid,) for rowid, _ in rows]
+
+        connection.executemany("DELETE FROM nodes WHERE rowid = ?", rowids)
+        connection.executemany("DELETE FROM node_rows WHERE rowid = ?", rowids)
+
+    def is_empty(self) -> bool:
+        """Whether there is nothing to search, e.g. on an instance that never ingested."""
+        if not os.path.exists(self.path):
+            return True
+
+        connection = self.connect()
+
+        try:
+            return (
+                connection.execute("SELECT 1 FROM node_rows LIMIT 1").fetchone() is None
+            )
+        finally:
+            connection.close()
+
+    def drop(self) -> None:
+        for suffix in ["", "-wal", "-shm"]:
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def search(self, query: str, top_k: int) -> list[tuple[TextNode, float]]:
+        match_query = self.to_match_query(query)
+
+        if not match_query or not os.path.exists(self.path):
+            return []
+
+        connection = self.connect()
+
+        try:
+            rows = connection.execute(
+                "SELECT text, node, bm25(nodes) FROM nodes WHERE nodes MATCH ? "
+                "ORDER BY bm25(nodes) LIMIT ?",
+                (match_query, top_k),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.error("path={}, query={}, error={}", self.path, match_query, e)
+            return []
+        finally:
+            connection.close()
+
+        results = []
+
+        for text, node_json, score in rows:
+            node = metadata_dict_to_node({"_node_content": node_json})
+            node.text = text
+            # FTS5 negates BM25 so that better matches sort first
+            results.append((node, -score))
+
+        return results
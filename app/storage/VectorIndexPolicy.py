@@ -0,0 +1,180 @@
+import math
+
+from constants import (
+    EMBEDDING_QUANTIZATION,
+    VECTOR_INDEX_FLAT_MAX_VECTORS,
+    VECTOR_INDEX_HNSW_MAX_VECTORS,
+    VECTOR_SEARCH_TOP_K,
+)
+from enums import EmbeddingQuantization, VectorIndexType
+from llama_index.vector_stores import MilvusVectorStore
+from loguru import logger
+from pymilvus.exceptions import MilvusException
+
+
+class VectorIndexPolicy:
+    """
+    Picks the ANN index of a collection from its size and derives the search
+    parameters from the index and the number of vectors it holds.
+
+    Small collections use FLAT, which is exact and cheap below `flat_max_vectors`.
+    Larger ones use HNSW with `ef` growing with log2 of the vector count, and the
+    largest use IVF_SQ8 with `nlist` around 4 * sqrt(n) and `nprobe` at 2% of it.
+    The derived values are starting points, `commands.tune_vector_index` measures
+    their recall against exact search. With int8 quantization every collection that
+    outgrew FLAT uses IVF_SQ8, which keeps 1 byte per dimension in memory.
+    """
+
+    METRIC_TYPE = "IP"
+
+    def __init__(
+        self,
+        flat_max_vectors: int,
+        hnsw_max_vectors: int,
+        top_k: int,
+        quantization: EmbeddingQuantization = EmbeddingQuantization.NONE,
+    ):
+        self.flat_max_vectors = flat_max_vectors
+        self.hnsw_max_vectors = hnsw_max_vectors
+        self.top_k = top_k
+        self.quantization = quantization
+
+    def index_params(self, num_vectors: int) -> dict:
+        if num_vectors < self.flat_max_vectors:
+            return {
+                "metric_type": self.METRIC_TYPE,
+                "index_type": VectorIndexType.FLAT.value,
+                "params": {},
+            }
+
+        if (
+            num_vectors < self.hnsw_max_vectors
+            and self.quantization != EmbeddingQuantization.INT8
+        ):
+            return {
+                "metric_type": self.METRIC_TYPE,
+                "index_type": VectorIndexType.HNSW.value,
+                "params": {"M": 16, "efConstruction": 200},
+            }
+
+        nlist = min(max(int(4 * math.sqrt(num_vectors)), 1024), 65536)
+
+        return {
+            "metric_type": self.METRIC_TYPE,
+            "index_type": VectorIndexType.IVF_SQ8.value,
+            "params": {"nlist": nlist},
+        }
+
+    def search_params(
+        self, index_params: dict, num_vectors: int, top_k: int | None = None
+    ) -> dict:
+        top_k = top_k or self.top_k
+        index_type = index_params.get("index_type")
+        metric_type = index_params.get("metric_type", self.METRIC_TYPE)
+
+        if index_type == VectorIndexType.HNSW.value:
+            ef = int(8 * math.log2(max(num_vectors, 2)))
+            # ef can't be smaller than the number of results
+            params = {"ef": max(min(max(ef, 4 * top_k), 512), top_k)}
+        elif index_type in [
+            VectorIndexType.IVF_FLAT.value,
+            VectorIndexType.IVF_SQ8.value,
+        ]:
+            nlist = int(index_params.get("params", {}).get("nlist", 1024))
+            params = {"nprobe": min(max(nlist // 50, 16), nlist)}
+        else:
+            # FLAT, AUTOINDEX and the index types created outside of this policy
+            # (DISKANN, IVF_PQ, ...) are searched with the Milvus defaults
+            params = {}
+
+        return {"metric_type": metric_type, "params": params}
+
+    def initial_search_params(self) -> dict:
+        """Search parameters matching the index of a collection that is created empty."""
+        return self.search_params(self.index_params(0), 0)
+
+    def tune(self, vector_store: MilvusVectorStore) -> None:
+        """Derive the search parameters of a vector store from its current index."""
+        collection = vector_store.collection
+
+        if collection is None or len(collection.indexes) == 0:
+            return
+
+        index_params = collection.indexes[0].params
+        vector_store.search_params = self.search_params(
+            index_params, collection.num_entities
+        )
+
+    def needs_rebuild(self, vector_store: MilvusVectorStore) -> bool:
+        collection = vector_store.collection
+
+        if collection is None or len(collection.indexes) == 0:
+            return False
+
+        index_type = collection.indexes[0].params["index_type"]
+
+        # Zilliz Cloud manages AUTOINDEX itself, and index types this policy doesn't
+        # create were chosen by hand
+        if (
+            index_type == VectorIndexType.AUTOINDEX.value
+            or index_type not in VectorIndexType.list()
+        ):
+            return False
+
+        recommended = self.index_params(collection.num_entities)
+
+        return index_type != recommended["index_type"]
+
+    def rebuild(
+        self, vector_store: MilvusVectorStore, index_params: dict | None = None
+    ) -> dict:
+        """
+        Replace the index of a vector store, by default with the one recommended for
+        its size. The collection is released while the index is built, so searches
+        fail until it is loaded again.
+        """
+        collection = vector_store.collection
+        index_params = index_params or self.index_params(collection.num_entities)
+
+        logger.info(
+            "Rebuilding vector index. collection_name={}, num_entities={}, "
+            "index_params={}",
+            vector_store.collection_name,
+            collection.num_entities,
+            index_params,
+        )
+
+        collection.release()
+        collection.drop_index()
+
+        try:
+            collection.create_index(
+                vector_store.embedding_field, index_params=index_params
+            )
+        except MilvusException as e:
+            # Zilliz Cloud only accepts AUTOINDEX
+            logger.warning(
+                "collection_name={}, error={}", vector_store.collection_name, e
+            )
+            index_params = {
+                "metric_type": self.METRIC_TYPE,
+                "index_type": VectorIndexType.AUTOINDEX.value,
+                "params": {},
+            }
+            collection.create_index(
+                vector_store.embedding_field, index_params=index_params
+            )
+
+        collection.load()
+        vector_store.index_params = index_params
+        self.tune(vector_store)
+
+        return index_params
+
+
+vector_index_policy = VectorIndexPolicy(
+    flat_max_vectors=VECTOR_INDEX_FLAT_MAX_VECTORS,
+    hnsw_max_vectors=VECTOR_INDEX_HNSW_MAX_VECTORS,
+    top_k=VECTOR_SEARCH_TOP_K,
+    quantization=EmbeddingQuantization(EMBEDDING_QUANTIZATION),
+)
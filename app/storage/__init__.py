@@ -1,4 +1,24 @@
+from .ChunkReferenceStore import ChunkReferenceStore
 from .DynamoDBService import DynamoDBService
+from .EmbeddingCache import EmbeddingCache
+from .IngestionManifest import IngestionManifest
+from .LocalVectorStore import LocalVectorStore
 from .MergeService import MergeService
+from .ScratchDirectory import ScratchDirectory
+from .SharedMilvusVectorStore import SharedMilvusVectorStore
+from .SparseIndex import SparseIndex
+from .VectorIndexPolicy import VectorIndexPolicy, vector_index_policy
 
-__all__ = ["DynamoDBService", "MergeService"]
+__all__ = [
+    "ChunkReferenceStore",
+    "DynamoDBService",
+    "EmbeddingCache",
+    "IngestionManifest",
+    "LocalVectorStore",
+    "MergeService",
+    "ScratchDirectory",
+    "SharedMilvusVectorStore",
+    "SparseIndex",
+    "VectorIndexPolicy",
+    "vector_index_policy",
+]
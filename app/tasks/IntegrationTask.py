@@ -1,5 +1,7 @@
+import functools
 import time
 
+from cache import query_engine_cache, semantic_answer_cache
 from enums import IntegrationStatus
 from loguru import logger
 from models.RequestModels import IntegrationRequest
@@ -39,13 +41,23 @@ def initiate_file_processing(
             org_id=integration_request.organization_id, account_token=account_token
         )
 
-        nodes = data_pipeline_service.get_embedded_nodes(file_list)
-
         data_indexing_service = DataIndexingService(
             org_id=integration_request.organization_id
         )
 
-        data_indexing_service.store_vectors(nodes)
+        # nodes are stored batch by batch while the rest is still being embedded
+        data_indexing_service.store_batches(
+            data_pipeline_service.get_embedded_batches(file_list),
+            on_batch_stored=functools.partial(
+                dynamodb_service.bump_index_version,
+                integration_request.organization_id,
+            ),
+        )
+
+        # The collection may have been created and cached answers are now stale
+        query_engine_cache.invalidate(integration_request.organization_id)
+        semantic_answer_cache.invalidate(integration_request.organization_id)
+        dynamodb_service.bump_index_version(integration_request.organization_id)
     except Exception as e:
         logger.error(
             "integration_request={}, account_token={}, error={}",
@@ -1,5 +1,24 @@
 """General utils functions."""
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
 from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from constants import BLOCKING_IO_MAX_WORKERS, INGESTION_MAX_WORKERS
+
+T = TypeVar("T")
+
+# Shared by every handler so that blocking SDK calls (boto3, Merge, Milvus) never
+# run on the event loop and cannot stall the open websockets.
+blocking_io_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_MAX_WORKERS, thread_name_prefix="prism-io"
+)
+# Whole ingestions, kept apart from the short calls of blocking_io_executor
+ingestion_executor = ThreadPoolExecutor(
+    max_workers=INGESTION_MAX_WORKERS, thread_name_prefix="prism-ingestion"
+)
 
 
 def divide_list(target_list: list, item_size: int) -> list[list]:
@@ -20,3 +39,17 @@ def serialize(object: dict) -> dict:
 def deserialize(object: dict) -> dict:
     deserializer = TypeDeserializer()
     return {k: deserializer.deserialize(v) for k, v in object.items()}
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        blocking_io_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_ingestion(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        ingestion_executor, functools.partial(func, *args, **kwargs)
+    )
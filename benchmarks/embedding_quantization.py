@@ -0,0 +1,85 @@
+"""
+Recall loss and memory savings of quantized embedding storage.
+
+Stores `--vectors` embeddings as float32, float16 and int8 rows the way
+LocalVectorStore does, searches `--queries` held-out embeddings in each, and prints
+bytes per vector, recall@k against float32 exact search and p50 search latency.
+Pass `--embeddings` with an (n, dim) .npy file of real gte-large embeddings, otherwise
+clustered random unit vectors are used.
+Needs the same .env as the API since it imports the app's storage package.
+
+    python benchmarks/embedding_quantization.py --embeddings embeddings.npy --k 10
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+from enums import EmbeddingQuantization  # noqa: E402
+from storage.EmbeddingQuantizer import (  # noqa: E402
+    encode_rows,
+    score_rows,
+    storage_dtype,
+)
+
+
+def make_embeddings(count: int, dim: int, clusters: int = 64) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim))
+    embeddings = centers[rng.integers(clusters, size=count)] + rng.standard_normal(
+        (count, dim)
+    )
+
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def top_k(scores: np.ndarray, k: int) -> set[int]:
+    return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.embeddings:
+        embeddings = np.load(args.embeddings).astype(np.float32)
+    else:
+        embeddings = make_embeddings(args.vectors + args.queries, args.dim)
+
+    embeddings = embeddings.astype(np.float32)
+    queries, embeddings = embeddings[: args.queries], embeddings[args.queries :]
+    exact = [top_k(embeddings @ query, args.k) for query in queries]
+
+    for quantization in EmbeddingQuantization:
+        rows = encode_rows(embeddings, storage_dtype(quantization))
+        recalls = []
+        latencies = []
+
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            scores = score_rows(rows, query)
+            found = top_k(scores, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(found & expected) / args.k)
+
+        latencies.sort()
+        print(
+            f"quantization={quantization.value}, vectors={len(embeddings)}, "
+            f"dim={embeddings.shape[1]}: "
+            f"bytes/vector={rows.nbytes // len(rows)}, "
+            f"memory={rows.nbytes / 2**20:.1f}MiB, "
+            f"recall@{args.k}={np.mean(recalls):.4f}, "
+            f"p50={latencies[len(latencies) // 2]:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--embeddings")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+
+    main(parser.parse_args())
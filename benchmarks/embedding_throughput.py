@@ -0,0 +1,95 @@
+"""
+Throughput of the ingestion embedding model per execution mode.
+
+Embeds `--texts` synthetic chunks of `--words` words with the GPU (when available) and
+every CPU runtime/quantization combination, using `--threads` threads like one CPU
+actor, and prints texts per second and the mean cosine similarity of the vectors
+to those of the unquantized torch model, since quantized vectors are compared with
+query vectors of the unquantized model. Multiply the CPU throughput by the number
+of actors DataPipelineService.embedding_resources starts to estimate a cluster's.
+Needs the same .env as the API since it imports the app's pipeline package.
+
+    python benchmarks/embedding_throughput.py --texts 512 --threads 4
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+from pipeline.EmbedNodes import load_embedding_model  # noqa: E402
+
+VOCABULARY = (
+    "policy onboarding contract invoice revenue quarter review meeting customer "
+    "engineering roadmap budget hiring security incident report deadline launch"
+).split()
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+
+    return float((a * b).sum(axis=1).mean())
+
+
+def main(args: argparse.Namespace) -> None:
+    import torch
+
+    random.seed(0)
+    texts = [
+        " ".join(random.choices(VOCABULARY, k=args.words)) for _ in range(args.texts)
+    ]
+    modes = [
+        ("cpu", "torch", False),
+        ("cpu", "torch", True),
+        ("cpu", "onnx", False),
+        ("cpu", "onnx", True),
+    ]
+
+    if torch.cuda.is_available():
+        modes.append(("cuda", "torch", False))
+
+    reference = None
+
+    for device, runtime, quantize in modes:
+        try:
+            model = load_embedding_model(
+                device, runtime, quantize, args.threads, args.batch_size
+            )
+        except ImportError as e:
+            print(
+                f"device={device}, runtime={runtime}, quantize={quantize}, skipped: {e}"
+            )
+            continue
+
+        # warm up
+        model.embed_documents(texts[: args.batch_size])
+
+        started = time.perf_counter()
+        embeddings = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        elapsed = time.perf_counter() - started
+
+        if (device, runtime, quantize) == ("cpu", "torch", False):
+            reference = embeddings
+
+        similarity = (
+            "" if reference is None else f", cosine={cosine(embeddings, reference):.4f}"
+        )
+        print(
+            f"device={device}, runtime={runtime}, quantize={quantize}: "
+            f"{len(texts) / elapsed:.1f} texts/sec{similarity}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+
+    main(parser.parse_args())
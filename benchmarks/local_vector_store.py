@@ -0,0 +1,88 @@
+"""
+Query latency of the in-process NumPy vector store.
+
+Fills a LocalVectorStore in a temporary directory with `--vectors` random unit
+vectors of `--dim` dimensions for each dtype, then prints the add throughput and the
+p50/p95 latency of `--runs` top-k searches.
+Needs the same .env as the API since it imports the app's storage package.
+
+    python benchmarks/local_vector_store.py --vectors 5000 --runs 200
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+from llama_index.schema import TextNode  # noqa: E402
+from llama_index.vector_stores.types import (  # noqa: E402
+    NodeWithEmbedding,
+    VectorStoreQuery,
+)
+from storage.LocalVectorStore import LocalVectorStore  # noqa: E402
+
+
+def make_embeddings(count: int, dim: int) -> np.ndarray:
+    embeddings = np.random.default_rng(0).standard_normal((count, dim))
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def main(args: argparse.Namespace) -> None:
+    embeddings = make_embeddings(args.vectors, args.dim)
+    queries = make_embeddings(args.runs, args.dim)
+
+    for dtype in ["float32", "float16", "int8"]:
+        with tempfile.TemporaryDirectory() as path:
+            vector_store = LocalVectorStore(path, dtype=dtype)
+
+            started = time.perf_counter()
+
+            for offset in range(0, args.vectors, args.batch_size):
+                vector_store.add(
+                    [
+                        NodeWithEmbedding(
+                            node=TextNode(text=f"node {i}", id_=f"node-{i}"),
+                            embedding=embeddings[i].tolist(),
+                        )
+                        for i in range(
+                            offset, min(offset + args.batch_size, args.vectors)
+                        )
+                    ]
+                )
+
+            elapsed = time.perf_counter() - started
+            latencies = []
+
+            for query in queries:
+                started = time.perf_counter()
+                vector_store.query(
+                    VectorStoreQuery(
+                        query_embedding=query.tolist(), similarity_top_k=args.k
+                    )
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            latencies.sort()
+            print(
+                f"dtype={dtype}, vectors={args.vectors}, dim={args.dim}: "
+                f"add={args.vectors / elapsed:.0f} vectors/sec, "
+                f"mean={statistics.mean(latencies):.2f}ms, "
+                f"p50={latencies[len(latencies) // 2]:.2f}ms, "
+                f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+
+    main(parser.parse_args())
@@ -0,0 +1,82 @@
+"""
+Parse throughput of CustomUnstructuredReader per file format.
+
+Parses every file of `--corpus` (searched recursively) with the fast parsers and with
+Unstructured.io alone, `--repeat` times each, and prints per extension the files,
+megabytes, MB per second of both paths and the Jaccard similarity of the words they
+extract, since the fast parsers should keep the text the embeddings see. Formats
+without a fast parser show the same path twice. Needs the same .env as the API since
+it imports the app's pipeline package.
+
+    python benchmarks/parse_throughput.py --corpus [SAMPLE_FILES_DIR] --repeat 3
+"""
+import argparse
+import io
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+from pipeline.CustomUnstructuredReader import CustomUnstructuredReader  # noqa: E402
+
+
+def parse(reader: CustomUnstructuredReader, content: bytes, extension: str) -> str:
+    return reader.load_data(file=io.BytesIO(content), extension=extension)[0].text
+
+
+def jaccard(a: str, b: str) -> float:
+    a_words, b_words = set(a.split()), set(b.split())
+
+    if not a_words and not b_words:
+        return 1.0
+
+    return len(a_words & b_words) / len(a_words | b_words)
+
+
+def main(args: argparse.Namespace) -> None:
+    readers = {
+        "fast": CustomUnstructuredReader(fast_parsing=True),
+        "unstructured": CustomUnstructuredReader(fast_parsing=False),
+    }
+    files = defaultdict(list)
+
+    for path in sorted(Path(args.corpus).rglob("*")):
+        if path.is_file() and path.suffix:
+            files[path.suffix[1:].lower()].append(path.read_bytes())
+
+    for extension, contents in sorted(files.items()):
+        megabytes = sum(len(content) for content in contents) / 1024**2
+        seconds, texts = {}, {}
+
+        for name, reader in readers.items():
+            started = time.perf_counter()
+
+            for _ in range(args.repeat):
+                texts[name] = [
+                    parse(reader, content, extension) for content in contents
+                ]
+
+            seconds[name] = (time.perf_counter() - started) / args.repeat
+
+        similarity = sum(
+            jaccard(fast, unstructured)
+            for fast, unstructured in zip(texts["fast"], texts["unstructured"])
+        ) / len(contents)
+
+        print(
+            f"extension={extension}, files={len(contents)}, MB={megabytes:.2f}, "
+            f"fast={megabytes / seconds['fast']:.2f} MB/sec, "
+            f"unstructured={megabytes / seconds['unstructured']:.2f} MB/sec, "
+            f"speedup={seconds['unstructured'] / seconds['fast']:.1f}x, "
+            f"jaccard={similarity:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", required=True)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    main(parser.parse_args())
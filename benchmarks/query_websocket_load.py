@@ -0,0 +1,125 @@
+"""
+Load test for the /v1/query websocket.
+
+Opens `--sessions` concurrent websocket sessions, each asking `--questions` questions
+in a row, while a probe requests `GET /` every `--probe-interval` seconds. The probe
+latency shows how long the event loop is blocked by the handlers, and the question
+throughput shows how many sessions a single worker can serve.
+
+Run it against the same deployment before and after a change:
+
+    python benchmarks/query_websocket_load.py --url ws://localhost:8000/v1/query \
+        --org-id <org_id> --user-id <user_id> --sessions 20 --questions 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlencode, urlparse
+
+import websockets
+
+DEFAULT_QUESTIONS = [
+    "What are the main topics covered in our documents?",
+    "Summarize the most recent meeting notes.",
+    "Who is responsible for the onboarding process?",
+    "What is our policy on remote work?",
+    "List the action items from the last quarterly review.",
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run_session(url: str, questions: list[str], latencies: list[float]) -> int:
+    answered = 0
+
+    async with websockets.connect(url, max_size=None) as websocket:
+        for question in questions:
+            started = time.perf_counter()
+            await websocket.send(question)
+            await websocket.recv()
+            latencies.append(time.perf_counter() - started)
+            answered += 1
+
+    return answered
+
+
+async def probe(host: str, port: int, interval: float, latencies: list[float]):
+    while True:
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET / HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        await reader.read()
+        writer.close()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def main(args: argparse.Namespace) -> None:
+    query = urlencode({"org_id": args.org_id, "user_id": args.user_id})
+    url = f"{args.url}?{query}"
+    parsed = urlparse(args.url)
+    questions = [
+        DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)] for i in range(args.questions)
+    ]
+
+    question_latencies: list[float] = []
+    probe_latencies: list[float] = []
+    probe_task = asyncio.create_task(
+        probe(parsed.hostname, parsed.port or 80, args.probe_interval, probe_latencies)
+    )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *[
+            run_session(url, questions, question_latencies)
+            for _ in range(args.sessions)
+        ],
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    probe_task.cancel()
+
+    answered = sum(r for r in results if isinstance(r, int))
+    errors = [r for r in results if isinstance(r, Exception)]
+
+    print(f"sessions={args.sessions}, questions/session={args.questions}")
+    print(f"answered={answered}, failed_sessions={len(errors)}, elapsed={elapsed:.2f}s")
+    print(f"throughput={answered / elapsed:.2f} questions/s")
+
+    for name, values in [
+        ("question latency", question_latencies),
+        ("event loop probe", probe_latencies),
+    ]:
+        if not values:
+            continue
+
+        print(
+            f"{name}: mean={statistics.mean(values) * 1000:.1f}ms, "
+            f"p50={percentile(values, 50) * 1000:.1f}ms, "
+            f"p95={percentile(values, 95) * 1000:.1f}ms, "
+            f"max={max(values) * 1000:.1f}ms"
+        )
+
+    for error in errors[:5]:
+        print(f"error={error!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="ws://localhost:8000/v1/query")
+    parser.add_argument("--org-id", required=True)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Latency of the local cross-encoder reranker.
+
+Reranks `--nodes` synthetic chunks of `--words` words for `--runs` questions with each
+runtime/quantization combination and prints the p50/p95 latency per question.
+Needs the same .env as the API since it imports the app's pipeline package.
+
+    python benchmarks/rerank_latency.py --nodes 10 --runs 50
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+from llama_index.indices.query.schema import QueryBundle  # noqa: E402
+from llama_index.schema import NodeWithScore, TextNode  # noqa: E402
+from pipeline.CrossEncoderRerank import CrossEncoderRerank  # noqa: E402
+
+VOCABULARY = (
+    "policy onboarding contract invoice revenue quarter review meeting customer "
+    "engineering roadmap budget hiring security incident report deadline launch"
+).split()
+
+
+def make_nodes(count: int, words: int) -> list[NodeWithScore]:
+    return [
+        NodeWithScore(
+            node=TextNode(text=" ".join(random.choices(VOCABULARY, k=words))),
+            score=1.0,
+        )
+        for _ in range(count)
+    ]
+
+
+def main(args: argparse.Namespace) -> None:
+    random.seed(0)
+    nodes = make_nodes(args.nodes, args.words)
+    query_bundle = QueryBundle(query_str="What was decided in the quarterly review?")
+
+    for runtime, quantize in [
+        ("torch", False),
+        ("torch", True),
+        ("onnx", False),
+        ("onnx", True),
+    ]:
+        try:
+            reranker = CrossEncoderRerank(
+                top_n=3,
+                model=args.model,
+                runtime=runtime,
+                quantize=quantize,
+                batch_size=args.batch_size,
+            )
+        except ImportError as e:
+            print(f"runtime={runtime}, quantize={quantize}, skipped: {e}")
+            continue
+
+        # warm up
+        reranker.postprocess_nodes(list(nodes), query_bundle)
+
+        latencies = []
+
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            reranker.postprocess_nodes(list(nodes), query_bundle)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        print(
+            f"runtime={runtime}, quantize={quantize}: "
+            f"mean={statistics.mean(latencies):.1f}ms, "
+            f"p50={latencies[len(latencies) // 2]:.1f}ms, "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16)
+
+    main(parser.parse_args())
@@ -1 +1,30 @@
-"""Init file."""
+import os
+import sys
+from pathlib import Path
+
+# The modules of the app import each other from the app directory
+sys.path.append(str(Path(__file__).absolute().parents[1] / "app"))
+
+# constants reads the configuration of a deployment, none of the tests reach it
+for name in [
+    "PRISM_ENV",
+    "OPENAI_API_KEY",
+    "OPENAI_ORG_KEY",
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "MERGE_API_KEY",
+    "COHERE_API_KEY",
+    "DEFAULT_OPENAI_MODEL",
+    "DYNAMODB_USER_TABLE",
+    "DYNAMODB_FILE_TABLE",
+    "DYNAMODB_ORGANIZATION_TABLE",
+    "DYNAMODB_WHITELIST_TABLE",
+    "DYNAMODB_FILE_TABLE_INDEX",
+    "COGNITO_USER_POOL_ID",
+    "ZILLIZ_CLOUD_HOST",
+    "ZILLIZ_CLOUD_PORT",
+    "ZILLIZ_CLOUD_USER",
+    "ZILLIZ_CLOUD_PASSWORD",
+    "RAY_ADDRESS",
+]:
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from connection import milvus_connection_manager
+from exceptions import PrismDBException
+from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.vector_stores.types import VectorStoreQuery
+from pipeline import DataIndexingService
+from storage import ChunkReferenceStore, LocalVectorStore, SparseIndex
+from storage.ChunkReferenceStore import CONTENT_HASH_KEY
+
+
+def make_node(node_id: str, doc_id: str, text: str, hashed: bool = True) -> TextNode:
+    node = TextNode(
+        id_=node_id,
+        text=text,
+        embedding=[float(len(text)), 1.0],
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+    if hashed:
+        node.metadata[CONTENT_HASH_KEY] = ChunkReferenceStore.content_hash(text)
+
+    return node
+
+
+class TestChunkDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.vector_store = LocalVectorStore(os.path.join(self.directory.name, "org"))
+        self.service = self.create_service("references")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_service(self, references: str) -> DataIndexingService:
+        with mock.patch.object(
+            milvus_connection_manager,
+            "get_vector_store",
+            return_value=self.vector_store,
+        ):
+            service = DataIndexingService(org_id="org")
+
+        service.chunk_references = ChunkReferenceStore(
+            os.path.join(self.directory.name, references, "org.db")
+        )
+        service.sparse_index = SparseIndex(
+            os.path.join(self.directory.name, "sparse", "org.db")
+        )
+
+        return service
+
+    def stored_ids(self) -> list[str]:
+        return sorted(
+            row["id"] for row in LocalVectorStore(self.vector_store.path).rows
+        )
+
+    def store_shared_documents(self) -> None:
+        self.service.store_nodes(
+            [make_node("a1", "a", "Shared footer"), make_node("a2", "a", "Only in a")]
+        )
+        self.service.store_nodes(
+            [make_node("b1", "b", "Shared footer"), make_node("b2", "b", "Only in b")]
+        )
+
+    def test_stores_shared_chunk_once(self):
+        self.store_shared_documents()
+
+        self.assertEqual(self.stored_ids(), ["a1", "a2", "b2"])
+
+    def test_delete_keeps_chunks_of_other_documents(self):
+        self.store_shared_documents()
+
+        results = self.service.delete_nodes(["a"])
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(self.stored_ids(), ["a1", "b2"])
+
+        self.service.delete_nodes(["b"])
+
+        self.assertEqual(self.stored_ids(), [])
+
+    def test_delete_refused_without_references(self):
+        self.store_shared_documents()
+
+        # e.g. another instance, or the reference directory was lost on redeploy
+        service = self.create_service("empty")
+
+        with self.assertRaises(PrismDBException):
+            service.delete_nodes(["a"])
+
+        self.assertEqual(self.stored_ids(), ["a1", "a2", "b2"])
+
+        result = self.vector_store.query(
+            VectorStoreQuery(query_embedding=[1.0, 0.0], similarity_top_k=3)
+        )
+        self.assertEqual(len(result.ids), 3)
+
+    def test_delete_without_deduplicated_chunks(self):
+        self.service.store_nodes([make_node("c1", "c", "Plain", hashed=False)])
+        service = self.create_service("empty")
+
+        service.delete_nodes(["c"])
+
+        self.assertEqual(self.stored_ids(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from storage import ChunkReferenceStore
+
+
+class TestChunkReferenceStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ChunkReferenceStore(
+            os.path.join(self.directory.name, "org", "chunks.db")
+        )
+        self.shared = ChunkReferenceStore.content_hash("Shared footer")
+        self.only_a = ChunkReferenceStore.content_hash("Only in a")
+        self.store.add(
+            [(self.shared, "n1", "a"), (self.only_a, "n2", "a")],
+            [(self.shared, "a"), (self.only_a, "a")],
+        )
+        # b contains the shared chunk, which keeps the node stored with a
+        self.store.add([(self.shared, "n3", "b")], [(self.shared, "b")])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_content_hash_normalizes_whitespace_and_unicode(self):
+        self.assertEqual(
+            ChunkReferenceStore.content_hash(" Shared\n\tfooter "), self.shared
+        )
+        self.assertEqual(
+            ChunkReferenceStore.content_hash("ﬁle"),
+            ChunkReferenceStore.content_hash("file"),
+        )
+        self.assertNotEqual(
+            ChunkReferenceStore.content_hash("shared footer"), self.shared
+        )
+
+    def test_first_stored_node_is_kept(self):
+        self.assertEqual(
+            self.store.stored_chunks([self.shared, self.only_a, "missing"]),
+            {self.shared: "n1", self.only_a: "n2"},
+        )
+
+    def test_documents(self):
+        documents = self.store.documents([self.shared, self.only_a])
+
+        self.assertEqual(sorted(documents[self.shared]), ["a", "b"])
+        self.assertEqual(documents[self.only_a], ["a"])
+
+    def test_remove_documents_keeps_referenced_nodes(self):
+        kept, orphaned = self.store.remove_documents(["a"])
+
+        self.assertEqual(kept, {"a": ["n1"]})
+        self.assertEqual(orphaned, {"n2"})
+        self.assertEqual(self.store.stored_chunks([self.shared]), {self.shared: "n1"})
+        self.assertEqual(self.store.documents([self.shared]), {self.shared: ["b"]})
+
+        kept, orphaned = self.store.remove_documents(["b"])
+
+        self.assertEqual(kept, {})
+        self.assertEqual(orphaned, {"n1"})
+        self.assertEqual(self.store.stored_chunks([self.shared, self.only_a]), {})
+
+    def test_remove_all_documents_at_once(self):
+        kept, orphaned = self.store.remove_documents(["a", "b"])
+
+        self.assertEqual(kept, {})
+        self.assertEqual(orphaned, {"n1", "n2"})
+
+    def test_remove_unknown_documents(self):
+        self.assertEqual(self.store.remove_documents(["c"]), ({}, set()))
+
+        missing = ChunkReferenceStore(os.path.join(self.directory.name, "missing.db"))
+        self.assertEqual(missing.remove_documents(["a"]), ({}, set()))
+        self.assertEqual(missing.stored_chunks([self.shared]), {})
+
+    def test_batches_large_queries(self):
+        hashes = [ChunkReferenceStore.content_hash(str(i)) for i in range(1200)]
+        self.store.add(
+            [(h, f"node-{i}", "c") for i, h in enumerate(hashes)],
+            [(h, "c") for h in hashes],
+        )
+
+        self.assertEqual(len(self.store.stored_chunks(hashes)), 1200)
+        self.assertEqual(len(self.store.remove_documents(["c"])[1]), 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
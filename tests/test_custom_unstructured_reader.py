@@ -0,0 +1,141 @@
+import io
+import sys
+import types
+import unittest
+from unittest import mock
+
+from pipeline.CustomUnstructuredReader import CustomUnstructuredReader
+
+
+def make_pdf(lines: list[str]) -> bytes:
+    """One page PDF with a text layer holding the lines."""
+    text = " ".join(f"({line}) Tj T*" for line in lines)
+    stream = f"BT /F1 12 Tf 14 TL 72 720 Td {text} ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    pdf += b"startxref\n%d\n%%%%EOF\n" % xref
+
+    return pdf
+
+
+class TestCustomUnstructuredReader(unittest.TestCase):
+    def setUp(self):
+        # the Unstructured.io prerequisites are downloaded from the network
+        with mock.patch("nltk.download"):
+            self.reader = CustomUnstructuredReader()
+
+        # stands in for the element pipeline of Unstructured.io, the tests only check
+        # which files reach it
+        self.partition = mock.Mock(return_value=["Parsed by", "Unstructured"])
+        partition_module = types.ModuleType("unstructured.partition.auto")
+        partition_module.partition = self.partition
+        patcher = mock.patch.dict(
+            sys.modules, {"unstructured.partition.auto": partition_module}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load(self, content: bytes, extension: str, **kwargs) -> list[str]:
+        documents = self.reader.load_data(
+            io.BytesIO(content), extension=extension, **kwargs
+        )
+
+        return [document.text for document in documents]
+
+    def test_text(self):
+        content = "﻿First  paragraph\nwraps.\n\n\nSecond\tone.\fThird".encode()
+
+        self.assertEqual(
+            self.load(content, "txt", split_documents=True),
+            ["First paragraph wraps.", "Second one.", "Third"],
+        )
+        self.assertEqual(
+            self.load(content, "TXT"), ["First paragraph wraps. Second one. Third"]
+        )
+        self.partition.assert_not_called()
+
+    def test_csv(self):
+        content = b'name,team\n"Doe, Jane",Sales\n\nRoe,"Multi\nline"\n'
+
+        self.assertEqual(
+            self.load(content, "csv", split_documents=True),
+            ["name team", "Doe, Jane Sales", "Roe Multi line"],
+        )
+        self.partition.assert_not_called()
+
+    def test_html(self):
+        content = (
+            b"<html><head><title>Title</title><style>p {}</style></head><body>"
+            b"<h1>Handbook</h1><p>Read the <b>whole</b> &amp; thing.</p>"
+            b"<script>alert(1)</script><ul><li>One</li><li>Two</li></ul>"
+            b"</body></html>"
+        )
+
+        self.assertEqual(
+            self.load(content, "html", split_documents=True),
+            ["Handbook", "Read the whole & thing.", "One", "Two"],
+        )
+        self.assertEqual(
+            self.load(content, "htm"), ["Handbook Read the whole & thing. One Two"]
+        )
+        self.partition.assert_not_called()
+
+    def test_pdf(self):
+        text = self.load(make_pdf(["Benefits overview", "Dental plan"]), "pdf")
+
+        self.assertEqual(text, ["Benefits overview Dental plan"])
+        self.partition.assert_not_called()
+
+    def test_pdf_without_text_layer_falls_back(self):
+        self.assertEqual(self.load(make_pdf([]), "pdf"), ["Parsed by Unstructured"])
+        self.partition.assert_called_once()
+
+    def test_unreadable_pdf_falls_back(self):
+        content = b"%PDF-1.4\nnot really a pdf"
+
+        self.assertEqual(self.load(content, "pdf"), ["Parsed by Unstructured"])
+
+        file = self.partition.call_args.kwargs["file"]
+        self.assertEqual(file.tell(), 0)
+
+    def test_non_utf8_text_falls_back(self):
+        for extension in ["txt", "csv", "html"]:
+            with self.subTest(extension=extension):
+                self.partition.reset_mock()
+
+                self.assertEqual(
+                    self.load("caf\xe9".encode("latin-1"), extension),
+                    ["Parsed by Unstructured"],
+                )
+                self.assertEqual(self.partition.call_args.kwargs["file"].tell(), 0)
+
+    def test_other_formats_and_disabled_fast_parsing(self):
+        self.assertEqual(self.load(b"docx", "docx"), ["Parsed by Unstructured"])
+        self.assertEqual(self.load(b"text", None), ["Parsed by Unstructured"])
+
+        with mock.patch("nltk.download"):
+            self.reader = CustomUnstructuredReader(fast_parsing=False)
+
+        self.assertEqual(self.load(b"text", "txt"), ["Parsed by Unstructured"])
+        self.assertEqual(self.partition.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
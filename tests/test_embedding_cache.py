@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from storage import EmbeddingCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "embeddings.db")
+        self.cache = EmbeddingCache(self.path, "model:torch:fp32", max_rows=3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertCached(self, cache: EmbeddingCache, texts: list[str], cached: list[bool]):
+        self.assertEqual(
+            [embedding is not None for embedding in cache.get(texts)], cached
+        )
+
+    def test_get_before_put(self):
+        self.assertEqual(self.cache.get(["a", "b"]), [None, None])
+        self.assertEqual(self.cache.get([]), [])
+
+    def test_put_and_get(self):
+        self.cache.put(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+        a, missing, b, a_again = self.cache.get(["a", "c", "b", "a"])
+
+        np.testing.assert_array_equal(a, [1.0, 2.0])
+        np.testing.assert_array_equal(b, [3.0, 4.0])
+        np.testing.assert_array_equal(a_again, a)
+        self.assertIsNone(missing)
+        self.assertEqual(a.dtype, np.float32)
+
+    def test_keys_by_model(self):
+        self.cache.put(["a"], [[1.0]])
+        other = EmbeddingCache(self.path, "model:onnx:int8", max_rows=3)
+
+        self.assertCached(other, ["a"], [False])
+
+        other.put(["a"], [[2.0]])
+
+        np.testing.assert_array_equal(self.cache.get(["a"])[0], [1.0])
+        np.testing.assert_array_equal(other.get(["a"])[0], [2.0])
+
+    def test_evicts_oldest_rows(self):
+        self.cache.put(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        self.cache.put(["d"], [[4.0]])
+
+        self.assertCached(self.cache, ["a", "b", "c", "d"], [False, True, True, True])
+
+    def test_put_again_refreshes_row(self):
+        self.cache.put(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        self.cache.put(["a"], [[1.0]])
+        self.cache.put(["d"], [[4.0]])
+
+        self.assertCached(self.cache, ["a", "b", "c", "d"], [True, False, True, True])
+
+    def test_batches_large_queries(self):
+        cache = EmbeddingCache(self.path, "model", max_rows=2000)
+        texts = [str(i) for i in range(1200)]
+        cache.put(texts, [[float(i)] for i in range(1200)])
+
+        embeddings = cache.get(texts)
+
+        self.assertEqual(
+            [float(embedding[0]) for embedding in embeddings], list(range(1200))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import tempfile
+import unittest
+
+import numpy as np
+from enums import EmbeddingQuantization
+from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.vector_stores.types import NodeWithEmbedding, VectorStoreQuery
+from storage import LocalVectorStore
+from storage.EmbeddingQuantizer import (
+    encode_rows,
+    quantize_int8,
+    row_width,
+    score_rows,
+    storage_dtype,
+)
+
+
+class TestEmbeddingQuantizer(unittest.TestCase):
+    def setUp(self):
+        embeddings = np.random.default_rng(0).normal(size=(100, 64))
+        self.embeddings = (
+            embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        ).astype(np.float32)
+        self.query = self.embeddings[0]
+        self.expected = self.embeddings @ self.query
+
+    def test_storage_dtype(self):
+        self.assertEqual(storage_dtype(EmbeddingQuantization.NONE), np.float32)
+        self.assertEqual(storage_dtype(EmbeddingQuantization.FLOAT16), np.float16)
+        self.assertEqual(storage_dtype(EmbeddingQuantization.INT8), np.int8)
+
+    def test_row_width(self):
+        self.assertEqual(row_width(64, np.dtype(np.float16)), 64)
+        self.assertEqual(row_width(64, np.dtype(np.int8)), 68)
+
+    def test_quantize_int8(self):
+        codes, scales = quantize_int8(self.embeddings)
+
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(np.abs(codes).max(axis=1).tolist(), [127] * 100)
+        np.testing.assert_allclose(
+            codes * scales[:, None], self.embeddings, atol=scales.max() / 2 + 1e-6
+        )
+
+    def test_quantize_int8_zero_vector(self):
+        codes, scales = quantize_int8(np.zeros((1, 4), dtype=np.float32))
+
+        self.assertEqual(codes.tolist(), [[0, 0, 0, 0]])
+        self.assertEqual(scales.tolist(), [1.0])
+
+    def test_round_trip_scores(self):
+        for dtype, tolerance in [
+            (np.float32, 1e-6),
+            (np.float16, 2e-3),
+            (np.int8, 3e-2),
+        ]:
+            with self.subTest(dtype=dtype):
+                rows = encode_rows(self.embeddings, np.dtype(dtype))
+
+                self.assertEqual(rows.dtype, dtype)
+                self.assertEqual(rows.shape[1], row_width(64, np.dtype(dtype)))
+                np.testing.assert_allclose(
+                    score_rows(rows, self.query), self.expected, atol=tolerance
+                )
+
+    def test_scores_across_blocks(self):
+        embeddings = np.tile(self.embeddings, (30, 1))
+        rows = encode_rows(embeddings, np.dtype(np.int8))
+
+        np.testing.assert_allclose(
+            score_rows(rows, self.query), embeddings @ self.query, atol=3e-2
+        )
+
+
+class TestQuantizedLocalVectorStore(unittest.TestCase):
+    def test_keeps_precision_of_existing_matrix(self):
+        with tempfile.TemporaryDirectory() as path:
+            nodes = [
+                NodeWithEmbedding(
+                    node=TextNode(
+                        id_=node_id,
+                        text=node_id,
+                        relationships={
+                            NodeRelationship.SOURCE: RelatedNodeInfo(node_id="doc")
+                        },
+                    ),
+                    embedding=embedding,
+                )
+                for node_id, embedding in [
+                    ("x", [1.0, 0.0]),
+                    ("y", [0.0, 1.0]),
+                    ("xy", [0.6, 0.8]),
+                ]
+            ]
+
+            LocalVectorStore(path, dtype="int8").add(nodes[:2])
+            store = LocalVectorStore(path, dtype="float16")
+            store.add(nodes[2:])
+
+            self.assertEqual(store.vectors.dtype, np.int8)
+            self.assertEqual(store.dim, 2)
+
+            result = store.query(
+                VectorStoreQuery(query_embedding=[0.0, 1.0], similarity_top_k=3)
+            )
+
+            self.assertEqual(result.ids, ["y", "xy", "x"])
+            np.testing.assert_allclose(result.similarities, [1.0, 0.8, 0.0], atol=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import datetime
+import tempfile
+import unittest
+
+from enums import FileProcessingStatus
+from merge.resources.filestorage.types import File
+from models import FileOutcome
+from storage import IngestionManifest
+
+
+class TestIngestionManifest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest = IngestionManifest(self.directory.name)
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def outcome(file_id: str, status: FileProcessingStatus) -> FileOutcome:
+        return FileOutcome(
+            file_id=file_id,
+            file_name=f"{file_id}.pdf",
+            status=status,
+            file={"id": file_id, "name": f"{file_id}.pdf", "permissions": []},
+        )
+
+    def test_write_and_load(self):
+        path = self.manifest.write(
+            "org",
+            "link",
+            self.started_at,
+            [self.outcome("a", FileProcessingStatus.OK)],
+            complete=False,
+        )
+
+        self.assertEqual(self.manifest.latest("org"), path)
+
+        run, outcomes = self.manifest.load(path)
+
+        self.assertEqual(run["link_id"], "link")
+        self.assertFalse(run["complete"])
+        self.assertEqual([outcome.file_id for outcome in outcomes], ["a"])
+
+    def test_failed_files_include_not_processed(self):
+        outcomes = [
+            self.outcome("ok", FileProcessingStatus.OK),
+            self.outcome("unsupported", FileProcessingStatus.UNSUPPORTED),
+            self.outcome("download", FileProcessingStatus.DOWNLOAD_ERROR),
+            self.outcome("parse", FileProcessingStatus.PARSE_ERROR),
+            self.outcome("not_processed", FileProcessingStatus.NOT_PROCESSED),
+        ]
+
+        files = IngestionManifest.failed_files(outcomes)
+
+        self.assertTrue(all(isinstance(file, File) for file in files))
+        self.assertEqual(
+            [file.id for file in files], ["download", "parse", "not_processed"]
+        )
+
+    def test_latest_without_runs(self):
+        self.assertIsNone(self.manifest.latest("org"))
@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+
+from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.vector_stores.types import NodeWithEmbedding, VectorStoreQuery
+from storage import LocalVectorStore
+
+
+def make_node(node_id: str, doc_id: str, embedding: list[float]) -> NodeWithEmbedding:
+    node = TextNode(
+        id_=node_id,
+        text=f"text of {node_id}",
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+    return NodeWithEmbedding(node=node, embedding=embedding)
+
+
+class TestLocalVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.store = LocalVectorStore(self.path)
+        self.store.add(
+            [
+                make_node("a1", "a", [1.0, 0.0, 0.0]),
+                make_node("a2", "a", [0.0, 1.0, 0.0]),
+                make_node("b1", "b", [0.6, 0.8, 0.0]),
+            ]
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def query(self, store: LocalVectorStore, embedding, top_k=3, doc_ids=None):
+        return store.query(
+            VectorStoreQuery(
+                query_embedding=embedding, similarity_top_k=top_k, doc_ids=doc_ids
+            )
+        )
+
+    def test_query_orders_by_inner_product(self):
+        result = self.query(self.store, [1.0, 0.0, 0.0])
+
+        self.assertEqual(result.ids, ["a1", "b1", "a2"])
+        self.assertAlmostEqual(result.similarities[0], 1.0)
+        self.assertEqual(result.nodes[0].text, "text of a1")
+        self.assertEqual(result.nodes[0].ref_doc_id, "a")
+
+    def test_query_top_k_and_doc_ids(self):
+        self.assertEqual(self.query(self.store, [1.0, 0.0, 0.0], top_k=1).ids, ["a1"])
+        self.assertEqual(
+            self.query(self.store, [1.0, 0.0, 0.0], doc_ids=["b"]).ids, ["b1"]
+        )
+
+    def test_add_checks_dimensions(self):
+        with self.assertRaises(ValueError):
+            self.store.add([make_node("c1", "c", [1.0, 0.0])])
+
+    def test_delete_documents(self):
+        self.assertEqual(self.store.delete_documents(["a"], keep_node_ids={"a2"}), 1)
+        self.assertEqual(self.query(self.store, [1.0, 0.0, 0.0]).ids, ["b1", "a2"])
+
+        self.store.delete("b")
+        self.assertEqual(self.query(self.store, [1.0, 0.0, 0.0]).ids, ["a2"])
+
+        self.assertEqual(self.store.delete_documents([], node_ids=["a2"]), 1)
+        self.assertEqual(self.query(self.store, [1.0, 0.0, 0.0]).ids, [])
+
+    def test_reopen(self):
+        self.store.delete_documents(["b"])
+        self.store.add([make_node("c1", "c", [0.0, 0.0, 1.0])])
+
+        reopened = LocalVectorStore(self.path)
+
+        self.assertEqual(reopened.count, 3)
+        self.assertEqual(self.query(reopened, [0.0, 0.0, 1.0], top_k=1).ids, ["c1"])
+
+    def test_sees_writes_of_another_instance(self):
+        other = LocalVectorStore(self.path)
+        other.add([make_node("c1", "c", [0.0, 0.0, 1.0])])
+
+        self.assertEqual(self.query(self.store, [0.0, 0.0, 1.0], top_k=1).ids, ["c1"])
+
+    def test_ignores_interrupted_write(self):
+        # rows appended without a new meta.json, as if the process died
+        with open(self.store.file("rows.jsonl"), "ab") as f:
+            f.write(b'{"id": "partial"')
+
+        reopened = LocalVectorStore(self.path)
+
+        self.assertEqual(reopened.count, 3)
+        reopened.add([make_node("c1", "c", [0.0, 0.0, 1.0])])
+        self.assertEqual(LocalVectorStore(self.path).count, 4)
+
+    def test_drop(self):
+        self.store.drop()
+
+        self.assertEqual(LocalVectorStore(self.path).count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
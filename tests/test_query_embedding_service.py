@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import unittest
+
+import numpy as np
+from pipeline.QueryEmbeddingService import QueryEmbeddingService
+
+
+class BlockingModel:
+    """Encodes a text as its length, once `release` is set."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches: list[list[str]] = []
+
+    def encode(self, texts: list[str], batch_size: int) -> np.ndarray:
+        self.batches.append(texts)
+        self.started.set()
+        self.release.wait(5)
+
+        return np.array([[float(len(text))] for text in texts])
+
+
+class TestQueryEmbeddingService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.service = QueryEmbeddingService(
+            model_name="model",
+            device="cpu",
+            batch_size=8,
+            batch_wait=0.01,
+            cache_size=2,
+        )
+        self.model = BlockingModel()
+        self.service.model = self.model
+
+    async def test_embeds_and_caches(self):
+        self.model.release.set()
+
+        self.assertEqual(await self.service.aembed_query("abc"), [3.0])
+        self.assertEqual(await self.service.aembed_query("abc"), [3.0])
+        self.assertEqual(self.model.batches, [["abc"]])
+
+    async def test_cancelled_query_does_not_stop_the_worker(self):
+        task = asyncio.create_task(self.service.aembed_query("cancelled"))
+        await asyncio.to_thread(self.model.started.wait, 5)
+
+        # the question is cancelled while its batch is encoded
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.model.release.set()
+
+        embedding = await asyncio.wait_for(self.service.aembed_query("next"), 5)
+
+        self.assertEqual(embedding, [4.0])
+        self.assertTrue(self.service.worker.is_alive())
+
+    async def test_cancelled_before_its_batch_is_skipped(self):
+        self.model.release.set()
+        future = self.service.submit("queued")
+        future.cancel()
+
+        self.assertEqual(await self.service.aembed_query("next"), [4.0])
+        self.assertNotIn(["queued"], self.model.batches)
+
+    async def test_restarts_a_dead_worker(self):
+        self.model.release.set()
+        self.service.worker = threading.Thread(target=lambda: None)
+        self.service.worker.start()
+        self.service.worker.join()
+
+        self.assertEqual(
+            await asyncio.wait_for(self.service.aembed_query("abc"), 5), [3.0]
+        )
+
+    async def test_model_error_fails_the_batch_only(self):
+        self.model.release.set()
+        encode = self.model.encode
+        self.model.encode = lambda texts, batch_size: 1 / 0
+
+        with self.assertRaises(ZeroDivisionError):
+            await self.service.aembed_query("abc")
+
+        self.model.encode = encode
+
+        self.assertEqual(await self.service.aembed_query("abc"), [3.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+from cache.QueryEngineCache import QueryEngineCache
+
+
+class TestQueryEngineCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = QueryEngineCache(max_size=2, ttl=3600)
+
+        patcher = mock.patch("cache.QueryEngineCache.DataIndexingService")
+        self.data_indexing_service = patcher.start()
+        self.data_indexing_service.return_value.generate_query_engine.side_effect = (
+            lambda vector_index, streaming: object()
+        )
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("cache.QueryEngineCache.milvus_connection_manager")
+        self.milvus_connection_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_engine_of_the_same_version(self):
+        engine = self.cache.get("org", version=1)
+
+        self.assertIs(self.cache.get("org", version=1), engine)
+        self.assertIsNot(self.cache.get("org", streaming=True, version=1), engine)
+        self.milvus_connection_manager.invalidate.assert_not_called()
+
+    def test_rebuilds_for_another_version(self):
+        # e.g. another API process removed an integration of the organization
+        engine = self.cache.get("org", version=1)
+
+        self.assertIsNot(self.cache.get("org", version=2), engine)
+        self.milvus_connection_manager.invalidate.assert_called_once_with("org")
+
+    def test_expired_engine_is_rebuilt(self):
+        cache = QueryEngineCache(max_size=2, ttl=0)
+        engine = cache.get("org")
+
+        self.assertIsNot(cache.get("org"), engine)
+
+    def test_invalidate(self):
+        engine = self.cache.get("org", version=1)
+
+        self.cache.invalidate("org")
+
+        self.assertIsNot(self.cache.get("org", version=1), engine)
+
+    def test_evicts_least_recently_used(self):
+        first = self.cache.get("a")
+        self.cache.get("b")
+        self.cache.get("a")
+        self.cache.get("c")
+
+        self.assertIs(self.cache.get("a"), first)
+        self.assertNotIn(("b", False), self.cache.engines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import errno
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from storage import ScratchDirectory
+
+
+class TestScratchDirectory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scratch")
+        self.scratch = ScratchDirectory(self.path, quota=100, max_age=3600)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def files(self) -> list[str]:
+        return sorted(os.listdir(self.path))
+
+    def test_spool_in_memory(self):
+        file = self.scratch.spool([b"abc", b"def"], spill_size=10)
+
+        self.assertIsInstance(file, io.BytesIO)
+        self.assertEqual(file.read(), b"abcdef")
+        self.assertEqual(self.files(), [])
+
+    def test_spool_spills_to_a_file_removed_on_close(self):
+        file = self.scratch.spool([b"abcd", b"efgh", b"ijkl"], spill_size=5)
+
+        self.assertNotIsInstance(file, io.BytesIO)
+        self.assertEqual(file.read(), b"abcdefghijkl")
+        self.assertEqual(self.scratch.usage(), 12)
+
+        file.close()
+
+        self.assertEqual(self.files(), [])
+
+    def test_spool_over_quota(self):
+        with self.assertRaises(OSError) as context:
+            self.scratch.spool([b"x" * 60, b"x" * 60], spill_size=50)
+
+        self.assertEqual(context.exception.errno, errno.EDQUOT)
+        self.assertEqual(self.files(), [])
+
+    def test_quota_counts_other_files(self):
+        path = self.scratch.write([b"x" * 60])
+
+        with self.assertRaises(OSError):
+            self.scratch.write([b"x" * 30, b"x" * 30])
+
+        self.assertEqual(self.files(), [os.path.basename(path)])
+
+        os.remove(path)
+        self.scratch.write([b"x" * 30, b"x" * 30])
+
+    def test_rescans_usage_while_writing(self):
+        def chunks():
+            yield b"x" * 30
+            # another process of the machine fills the directory meanwhile
+            with open(os.path.join(self.path, "other"), "wb") as f:
+                f.write(b"x" * 50)
+            yield b"x" * 30
+
+        with mock.patch("storage.ScratchDirectory.QUOTA_CHECK_BYTES", 10):
+            with self.assertRaises(OSError):
+                self.scratch.write(chunks())
+
+        self.assertEqual(self.files(), ["other"])
+
+    def test_write(self):
+        path = self.scratch.write([b"abc", b"def"])
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"abcdef")
+
+        self.assertEqual(os.path.dirname(path), self.path)
+
+    def test_keep_outlives_closing_the_spooled_file(self):
+        file = self.scratch.spool([b"abcd", b"efgh"], spill_size=5)
+        path = self.scratch.keep(file)
+        file.close()
+
+        self.assertEqual(self.files(), [os.path.basename(path)])
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"abcdefgh")
+
+    def test_sweep_removes_stale_files(self):
+        stale = self.scratch.write([b"stale"])
+        fresh = self.scratch.write([b"fresh"])
+        os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+        ScratchDirectory(self.path, quota=100, max_age=3600)
+
+        self.assertEqual(self.files(), [os.path.basename(fresh)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+from cache.SemanticAnswerCache import SemanticAnswerCache
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticAnswerCache(
+            similarity_threshold=0.9, max_entries_per_org=2, max_orgs=2, ttl=3600
+        )
+
+    def store(
+        self, org_id: str, query: str, embedding: list[float], version: int = 0
+    ) -> None:
+        self.cache.store(org_id, query, embedding, {"response": query}, version)
+
+    def test_hit_on_similar_question(self):
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        payload, similarity = self.cache.lookup("org", [0.99, 0.05, 0.0], 0)
+
+        self.assertEqual(payload, {"response": "vacation policy"})
+        self.assertGreaterEqual(similarity, 0.9)
+
+    def test_miss_below_threshold(self):
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        self.assertIsNone(self.cache.lookup("org", [0.0, 1.0, 0.0], 0))
+
+    def test_miss_for_other_organization(self):
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        self.assertIsNone(self.cache.lookup("other", [1.0, 0.0, 0.0], 0))
+
+    def test_returns_a_copy_of_the_payload(self):
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        payload, _ = self.cache.lookup("org", [1.0, 0.0, 0.0], 0)
+        payload["cache"] = {"hit": True}
+
+        self.assertNotIn("cache", self.cache.lookup("org", [1.0, 0.0, 0.0], 0)[0])
+
+    def test_expired_answer_is_a_miss(self):
+        cache = SemanticAnswerCache(
+            similarity_threshold=0.9, max_entries_per_org=2, max_orgs=2, ttl=0
+        )
+        cache.store("org", "q", [1.0, 0.0], {"response": "a"}, 0)
+
+        self.assertIsNone(cache.lookup("org", [1.0, 0.0], 0))
+
+    def test_expired_best_match_does_not_hide_a_fresh_one(self):
+        self.store("org", "exact", [1.0, 0.0, 0.0])
+        self.store("org", "close", [0.98, 0.2, 0.0])
+        created_at, vector, payload = self.cache.organizations["org"].entries["exact"]
+        self.cache.organizations["org"].entries["exact"] = (
+            created_at - 7200,
+            vector,
+            payload,
+        )
+
+        payload, _ = self.cache.lookup("org", [1.0, 0.0, 0.0], 0)
+
+        self.assertEqual(payload, {"response": "close"})
+        self.assertNotIn("exact", self.cache.organizations["org"].entries)
+
+    def test_invalidate_drops_answers(self):
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        self.cache.invalidate("org")
+
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0, 0.0], 0))
+
+    def test_lookup_with_another_version_drops_answers(self):
+        # e.g. another API process synced the organization
+        self.store("org", "vacation policy", [1.0, 0.0, 0.0])
+
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0, 0.0], 1))
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0, 0.0], 0))
+
+    def test_answer_of_a_stale_version_is_not_served(self):
+        self.store("org", "new", [0.0, 1.0], version=2)
+
+        # answered before the organization changed, stored after
+        self.store("org", "old", [1.0, 0.0], version=1)
+
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0], 2))
+        self.assertIsNotNone(self.cache.lookup("org", [0.0, 1.0], 2))
+
+        self.cache.invalidate("org")
+        self.store("org", "old", [1.0, 0.0], version=1)
+
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0], 2))
+
+    def test_evicts_oldest_entries_and_organizations(self):
+        self.store("org", "first", [1.0, 0.0, 0.0])
+        self.store("org", "second", [0.0, 1.0, 0.0])
+        self.store("org", "third", [0.0, 0.0, 1.0])
+
+        self.assertIsNone(self.cache.lookup("org", [1.0, 0.0, 0.0], 0))
+        self.assertIsNotNone(self.cache.lookup("org", [0.0, 0.0, 1.0], 0))
+
+        self.store("b", "q", [1.0, 0.0, 0.0])
+        self.store("c", "q", [1.0, 0.0, 0.0])
+
+        self.assertIsNone(self.cache.lookup("org", [0.0, 0.0, 1.0], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
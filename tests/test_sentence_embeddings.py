@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+from pipeline.PrecomputedSentenceOptimizer import (
+    decode_sentence_embeddings,
+    encode_sentence_embeddings,
+    normalize,
+)
+
+
+class TestSentenceEmbeddings(unittest.TestCase):
+    def test_round_trip_keeps_similarities(self):
+        embeddings = np.random.default_rng(0).normal(size=(5, 384))
+
+        decoded = decode_sentence_embeddings(encode_sentence_embeddings(embeddings))
+
+        self.assertEqual(decoded.shape, (5, 384))
+        expected = normalize(embeddings.astype(np.float32))
+        similarities = (normalize(decoded) * expected).sum(axis=1)
+        self.assertTrue(np.all(similarities > 0.95))
+
+    def test_odd_dimension(self):
+        embeddings = np.random.default_rng(1).normal(size=(3, 7))
+
+        decoded = decode_sentence_embeddings(encode_sentence_embeddings(embeddings))
+
+        self.assertEqual(decoded.shape, (3, 7))
+
+    def test_zero_embedding(self):
+        decoded = decode_sentence_embeddings(
+            encode_sentence_embeddings(np.zeros((1, 4)))
+        )
+
+        np.testing.assert_array_equal(decoded, np.zeros((1, 4)))
+
+    def test_payload_is_smaller_than_float32(self):
+        embeddings = np.ones((10, 384), dtype=np.float32)
+
+        payload = encode_sentence_embeddings(embeddings)
+
+        self.assertLess(len(payload), embeddings.nbytes / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+
+from llama_index.indices.base_retriever import BaseRetriever
+from llama_index.indices.query.schema import QueryBundle
+from llama_index.schema import (
+    NodeRelationship,
+    NodeWithScore,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.vector_stores.utils import node_to_metadata_dict
+from pipeline import FusionRetriever, SparseRetriever
+from storage import SparseIndex
+
+
+def make_node(node_id: str, doc_id: str, text: str) -> TextNode:
+    return TextNode(
+        id_=node_id,
+        text=text,
+        metadata={"file_name": f"{doc_id}.txt"},
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+
+class StaticRetriever(BaseRetriever):
+    def __init__(self, node_ids: list[str]):
+        self._node_ids = node_ids
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        return [
+            NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=1.0)
+            for node_id in self._node_ids
+        ]
+
+
+class TestSparseIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SparseIndex(os.path.join(self.directory.name, "org", "bm25.db"))
+        self.index.add(
+            [
+                make_node("a1", "a", "The vacation policy grants 25 days of leave."),
+                make_node("a2", "a", "Expense reports are due monthly."),
+                make_node("b1", "b", "Parental leave lasts sixteen weeks."),
+            ]
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def search(self, query: str, top_k: int = 10) -> list[str]:
+        return [node.node_id for node, _ in self.index.search(query, top_k)]
+
+    def test_search(self):
+        results = self.index.search("What is the vacation policy?", 10)
+
+        self.assertEqual([node.node_id for node, _ in results], ["a1"])
+        node, score = results[0]
+        self.assertEqual(node.text, "The vacation policy grants 25 days of leave.")
+        self.assertEqual(node.ref_doc_id, "a")
+        self.assertEqual(node.metadata, {"file_name": "a.txt"})
+        self.assertGreater(score, 0)
+
+    def test_search_stems_and_ranks(self):
+        self.assertEqual(self.search("leaves"), ["b1", "a1"])
+        self.assertEqual(self.search("leaves", top_k=1), ["b1"])
+
+    def test_search_without_terms(self):
+        self.assertEqual(self.search("what is it?"), [])
+        self.assertEqual(
+            SparseIndex(self.directory.name + "/missing.db").search("x", 1), []
+        )
+
+    def test_add_replaces_node(self):
+        self.index.add([make_node("a2", "a", "Expense reports are due weekly.")])
+
+        self.assertEqual(self.search("weekly"), ["a2"])
+        self.assertEqual(self.search("monthly"), [])
+
+    def test_ignores_vector_store_metadata(self):
+        node = make_node("c1", "c", "Security training is mandatory.")
+        node_to_metadata_dict(node)
+
+        self.index.add([node])
+
+        (result, _) = self.index.search("security", 1)[0]
+        self.assertEqual(result.metadata, {"file_name": "c.txt"})
+
+    def test_delete_documents(self):
+        self.index.delete_documents(["a"], keep_node_ids={"a2"})
+
+        self.assertEqual(self.search("vacation"), [])
+        self.assertEqual(self.search("expense"), ["a2"])
+
+        self.index.delete_documents([], node_ids=["a2"])
+
+        self.assertEqual(self.search("expense"), [])
+        self.assertEqual(self.search("parental"), ["b1"])
+
+    def test_drop(self):
+        self.index.drop()
+
+        self.assertEqual(self.search("parental"), [])
+
+    def test_is_empty(self):
+        self.assertFalse(self.index.is_empty())
+
+        self.index.delete_documents(["a", "b"])
+
+        self.assertTrue(self.index.is_empty())
+
+        self.index.drop()
+
+        self.assertTrue(self.index.is_empty())
+
+
+class TestFusionRetriever(unittest.TestCase):
+    def test_reciprocal_rank_fusion(self):
+        retriever = FusionRetriever(
+            [StaticRetriever(["a", "b", "c"]), StaticRetriever(["c", "d", "a"])],
+            top_k=3,
+            rrf_k=60,
+        )
+
+        results = retriever.retrieve("question")
+
+        self.assertEqual([result.node.node_id for result in results], ["a", "c", "b"])
+        self.assertAlmostEqual(results[0].score, 1 / 61 + 1 / 63)
+        self.assertAlmostEqual(results[2].score, 1 / 62)
+
+    def test_fuses_sparse_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index = SparseIndex(os.path.join(directory, "bm25.db"))
+            index.add([make_node("x", "doc", "Onboarding checklist for engineers.")])
+            retriever = FusionRetriever(
+                [StaticRetriever(["y"]), SparseRetriever(index, 10)], top_k=10
+            )
+
+            results = retriever.retrieve("onboarding")
+
+        self.assertEqual({result.node.node_id for result in results}, {"x", "y"})
+        self.assertAlmostEqual(results[0].score, results[1].score)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from llama_index.callbacks import CallbackManager
+from llama_index.callbacks.schema import CBEventType
+from metrics import MetricsRegistry, StageLatencyHandler
+from metrics.StageLatencyHandler import STALE_EVENT_SECONDS
+
+
+class TestStageLatencyHandler(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(max_samples=10)
+        self.handler = StageLatencyHandler(
+            org_id="org", registry=self.registry, tokenizer=str.split
+        )
+        self.callback_manager = CallbackManager([self.handler])
+
+    def test_records_latency_of_ended_events(self):
+        with self.callback_manager.as_trace("query"):
+            with self.callback_manager.event(CBEventType.RETRIEVE):
+                pass
+
+        self.assertEqual(self.handler.started, {})
+        self.assertIn(("org", "latency_ms", "retrieve"), self.registry.histograms)
+
+    def test_drops_events_that_never_end_when_a_trace_ends(self):
+        self.callback_manager.start_trace("query")
+        # e.g. the LLM call of a cancelled stream
+        stale = self.callback_manager.on_event_start(CBEventType.LLM)
+        self.handler.started[stale] -= STALE_EVENT_SECONDS + 1
+        # still running for another question
+        running = self.callback_manager.on_event_start(CBEventType.LLM)
+        self.callback_manager.end_trace("query")
+
+        self.assertEqual(list(self.handler.started), [running])
+
+    def test_starting_a_trace_resets_the_trace_map(self):
+        for _ in range(3):
+            self.callback_manager.start_trace("query")
+            self.callback_manager.on_event_start(CBEventType.RETRIEVE)
+            self.callback_manager.end_trace("query")
+
+        self.assertEqual(sum(map(len, self.callback_manager.trace_map.values())), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()